@@ -6,10 +6,11 @@ from datetime import timedelta
 from ..db.database import get_db
 from ..models.models import User
 from ..schemas.auth import Token, UserCreate, UserInDB, UserResponse
+from ..core.password_hashing import PasswordHashingBusy
 from ..core.security import (
-    get_password_hash,
+    hash_password_bounded,
     create_access_token,
-    authenticate_user,
+    authenticate_user_async,
     get_current_active_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
@@ -21,7 +22,14 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
+    except PasswordHashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop de connexions simultanées, veuillez réessayer.",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,7 +52,14 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_409_CONFLICT,
             detail="Email already registered",
         )
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = hash_password_bounded(user.password)
+    except PasswordHashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop d'inscriptions simultanées, veuillez réessayer.",
+            headers={"Retry-After": "1"},
+        )
     db_user = User(
         full_name=user.full_name,
         email=user.email, 
@@ -1,37 +1,56 @@
+import asyncio
+import json
 import os
-import random
 import shutil
-import string
 import tempfile
+import time
 import uuid
+from io import BytesIO
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 from fastapi import (
-    APIRouter, Depends, File, HTTPException, Path, Request, Response, UploadFile, status
+    APIRouter, Body, Depends, File, HTTPException, Path, Request, Response, UploadFile, status
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse, StreamingResponse
-from jose import jwt
+from jose import JWTError, jwt
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 # Imports de l'application
 from app.core.config import settings
+from app.core.metrics import pdf_render_duration
 from app.core.constants import (
-    EXAM_INACTIVE, EXAM_NOT_FOUND, EXAM_NOT_FOUND_WITH_PASSWORD, INVALID_CREDENTIALS
+    EXAM_FINISHED, EXAM_INACTIVE, EXAM_NOT_FOUND, EXAM_NOT_FOUND_WITH_PASSWORD, INVALID_CREDENTIALS
 )
 from app.core.security import (
-    create_access_token, get_password_hash, get_current_active_user, get_current_teacher_user, get_current_user
+    ALGORITHM, SECRET_KEY, create_access_token, get_password_hash, get_current_active_user,
+    get_current_teacher_user, get_current_user, oauth2_scheme
+)
+from app.db.database import SessionLocal, get_db
+from app.models.models import (
+    Exam, Question, QuestionOption, Submission, Answer, ExamSession, MonitoringInterval, User
 )
-from app.db.database import get_db
-from app.models.models import Exam, Question, QuestionOption, Submission, Answer, ExamSession, User
 from app.schemas.schemas import (
     ExamCreate, ExamUpdate, Exam as ExamSchema,
     QuestionCreate, QuestionOptionCreate, Question as QuestionSchema,
-    ExamSessionCreate, ExamSession as ExamSessionSchema
+    ExamSessionCreate, ExamSession as ExamSessionSchema,
+    QuestionBulkImportResponse
 )
-from app.security.face_recognition_service import FaceRecognitionService
+from app.services import exam_snapshot, question_import, report_cache, results_stats
+from app.services.exam_password_index import exam_password_index
+from app.utils import thumbnail_cache
+from app.utils.range_response import accepts_encoding, etag_matches
+from app.security.face_recognition_service import FaceRecognitionService, face_recognition_service, safe_student_name
 from app.security.exam_security import exam_security
+from app.security.monitor_board import monitor_board
+from app.security.session_store import WORKER_ID, lease_keeper, session_store
 
 
 # Modèles Pydantic pour les requêtes et réponses
@@ -83,6 +102,9 @@ class CombinedVerificationRequest(BaseModel):
     password: str
     student_name: str
 
+class ExamLaunchRequest(CombinedVerificationRequest):
+    start_monitoring: bool = False
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -95,8 +117,36 @@ class ExamDetailsResponse(BaseModel):
 
 router = APIRouter(tags=["exams"])
 
-# Initialiser le service de reconnaissance faciale
-face_recognition_service = FaceRecognitionService()
+def _resolve_exam_password(db: Session, password: str):
+    """Entrée de l'index pour un mot de passe ; 404 si inconnu, 403 si inactif ou expiré."""
+    entry = exam_password_index.resolve(db, password)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=EXAM_NOT_FOUND_WITH_PASSWORD
+        )
+    if not entry.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=EXAM_INACTIVE
+        )
+    if entry.is_expired():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=EXAM_FINISHED
+        )
+    return entry
+
+def _load_indexed_exam(db: Session, entry) -> Exam:
+    """Examen d'une entrée de l'index ; 404 (et entrée retirée) s'il a été supprimé entre-temps."""
+    exam = db.get(Exam, entry.exam_id)
+    if exam is None:
+        exam_password_index.remove(entry.exam_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=EXAM_NOT_FOUND_WITH_PASSWORD
+        )
+    return exam
 
 @router.post("/verify-password", response_model=ExamDetailsResponse)
 async def verify_exam_password(
@@ -107,19 +157,8 @@ async def verify_exam_password(
     Authenticates a student for an exam with a password and returns an access token.
     The token is stored in an HTTPOnly cookie.
     """
-    exam = db.query(Exam).filter(Exam.password == request_data.password).first()
-
-    if not exam:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=EXAM_NOT_FOUND_WITH_PASSWORD
-        )
-
-    if not exam.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=EXAM_INACTIVE
-        )
+    entry = _resolve_exam_password(db, request_data.password)
+    exam = _load_indexed_exam(db, entry)
 
     return {
         "exam_id": exam.id,
@@ -176,52 +215,50 @@ async def verify_password_and_student(
     Si les deux sont valides, génère un token d'accès pour l'examen."""
     
     # 1. Vérifier le mot de passe de l'examen
-    exam = db.query(Exam).filter(Exam.password == request_data.password).first()
-    if not exam:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=EXAM_NOT_FOUND_WITH_PASSWORD
-        )
-
-    if not exam.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=EXAM_INACTIVE
-        )
+    exam_id = _resolve_exam_password(db, request_data.password).exam_id
         
     # 2. Vérifier le nom de l'étudiant dans le fichier de signatures
-    student_authorized = face_service.verify_student(exam_id=exam.id, student_name=request_data.student_name)
+    student_authorized = face_service.verify_student(exam_id=exam_id, student_name=request_data.student_name)
     if not student_authorized:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Étudiant non autorisé à passer cet examen. Nom non trouvé dans la liste des signatures."
         )
     
+    access_token = _create_student_token(exam_id, request_data.student_name)
+    _set_token_cookie(response, access_token)
+
+    # Retourner les informations nécessaires
+    return {
+        "access_token": access_token, 
+        "token_type": "bearer",
+        "exam_id": exam_id
+    }
+
+def _create_student_token(exam_id: int, student_name: str) -> str:
+    """Génère le jeton d'accès d'un étudiant à un examen."""
     # Pour la vérification d'accès à l'examen, nous n'avons pas besoin de créer un utilisateur
     # Nous utilisons directement les informations de l'étudiant pour générer le token
     # Cela évite les problèmes liés à la création d'utilisateurs temporaires
     
     # Générer un ID unique pour cet étudiant basé sur son nom et l'ID de l'examen
     # Cela servira d'identifiant pour le token sans avoir besoin de créer un utilisateur en base
-    student_id = f"temp_{hash(request_data.student_name + str(exam.id))}"
+    student_id = f"temp_{hash(student_name + str(exam_id))}"
     
-    # Nous n'avons pas besoin de récupérer ou créer un utilisateur pour cette simple vérification
-    # Le nom de l'étudiant a déjà été vérifié dans le fichier de signatures
-    
-    # 4. Générer un token d'accès
     student_user = {
         "sub": student_id,
         "role": "student",
-        "exam_id": exam.id,
-        "student_name": request_data.student_name
+        "exam_id": exam_id,
+        "student_name": student_name
     }
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data=student_user, expires_delta=access_token_expires
+    return create_access_token(
+        data=student_user, expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
-    # 5. Stocker le token dans un cookie
+def _set_token_cookie(response: Response, access_token: str) -> None:
+    """Stocke le jeton d'accès dans un cookie HTTPOnly."""
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     response.set_cookie(
         key="access_token",
         value=f"Bearer {access_token}",
@@ -231,13 +268,57 @@ async def verify_password_and_student(
         samesite="lax",
         secure=False, # Mettre à True en production
     )
-    
-    # 6. Retourner les informations nécessaires
-    return {
-        "access_token": access_token, 
+
+@router.post("/launch")
+def launch_exam(
+    request_data: ExamLaunchRequest,
+    face_service: FaceRecognitionService = Depends(lambda: face_recognition_service),
+    db: Session = Depends(get_db)
+):
+    """
+    Démarrage d'un examen par un étudiant en un seul aller-retour : vérifie le
+    mot de passe et la présence de l'étudiant dans la liste des signatures,
+    émet le jeton d'accès et renvoie le contenu publié de l'examen ainsi que
+    l'identifiant de la session de surveillance (démarrée si `start_monitoring`).
+    Un échec du démarrage de la surveillance ne bloque pas l'examen :
+    `monitoring_started` vaut alors false et `monitoring_error` en donne la raison.
+    """
+    entry = _resolve_exam_password(db, request_data.password)
+
+    if not face_service.verify_student(exam_id=entry.exam_id, student_name=request_data.student_name):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Étudiant non autorisé à passer cet examen. Nom non trouvé dans la liste des signatures."
+        )
+
+    snapshot = exam_snapshot.get_snapshot(db, entry.exam_id)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=EXAM_NOT_FOUND)
+
+    session_id = f"exam_{entry.exam_id}_{uuid.uuid4()}"
+    monitoring_error = None
+    if request_data.start_monitoring:
+        monitoring_error = face_service.try_start_monitoring(
+            session_id=session_id,
+            exam_id=entry.exam_id,
+            student_name=request_data.student_name
+        )
+
+    access_token = _create_student_token(entry.exam_id, request_data.student_name)
+    # Le contenu de l'examen est déjà sérialisé : il est inséré tel quel dans la réponse
+    header = json.dumps({
+        "access_token": access_token,
         "token_type": "bearer",
-        "exam_id": exam.id
-    }
+        "exam_id": entry.exam_id,
+        "monitoring_session_id": session_id,
+        "monitoring_started": request_data.start_monitoring and monitoring_error is None,
+        "monitoring_error": monitoring_error,
+        "exam_etag": snapshot.etag
+    }, separators=(",", ":"))
+    body = header[:-1].encode("utf-8") + b',"exam":' + snapshot.body + b"}"
+    response = Response(content=body, media_type="application/json")
+    _set_token_cookie(response, access_token)
+    return response
 
 # Créer un dossier pour stocker les signatures si ce n'est pas déjà fait
 SIGNATURES_DIR = "uploads/signatures"
@@ -247,6 +328,39 @@ def generate_security_session_id(exam_id: int, user_id: int) -> str:
     """Génère un ID unique pour la session de sécurité"""
     return f"exam_{exam_id}_user_{user_id}_{uuid.uuid4()}"
 
+def _exams_with_counts(db: Session):
+    """
+    Requête des examens accompagnés du nombre de questions et de soumissions.
+    Les comptes sont calculés par des sous-requêtes COUNT corrélées : aucune
+    question ni soumission n'est chargée en mémoire.
+    """
+    questions_count = (
+        select(func.count(Question.id))
+        .where(Question.exam_id == Exam.id)
+        .correlate(Exam)
+        .scalar_subquery()
+    )
+    submissions_count = (
+        select(func.count(Submission.id))
+        .where(Submission.exam_id == Exam.id)
+        .correlate(Exam)
+        .scalar_subquery()
+    )
+    return db.query(Exam, questions_count, submissions_count)
+
+def _dashboard_response(exam: Exam, questions_count: int, submissions_count: int) -> ExamDashboardResponse:
+    return ExamDashboardResponse(
+        id=exam.id,
+        title=exam.title,
+        description=exam.description,
+        created_at=exam.created_at,
+        is_active=exam.is_active,
+        password=exam.password,
+        duration_minutes=exam.duration_minutes,
+        questions_count=questions_count,
+        submissions_count=submissions_count
+    )
+
 @router.get("/me/", response_model=List[ExamDashboardResponse])
 async def get_my_exams_for_dashboard(
     current_user: User = Depends(get_current_teacher_user),
@@ -259,27 +373,10 @@ async def get_my_exams_for_dashboard(
             detail="Accès refusé"
         )
 
-    exams = db.query(Exam).filter(Exam.teacher_id == current_user.id).options(
-        joinedload(Exam.questions),
-        joinedload(Exam.submissions)
-    ).all()
-
-    response_data = []
-    for exam in exams:
-        response_data.append(
-            ExamDashboardResponse(
-                id=exam.id,
-                title=exam.title,
-                description=exam.description,
-                created_at=exam.created_at,
-                is_active=exam.is_active,
-                password=exam.password,
-                duration_minutes=exam.duration_minutes,
-                questions_count=len(exam.questions),
-                submissions_count=len(exam.submissions)
-            )
-        )
-    return response_data
+    rows = _exams_with_counts(db).filter(Exam.teacher_id == current_user.id).all()
+
+    return [_dashboard_response(exam, questions_count, submissions_count)
+            for exam, questions_count, submissions_count in rows]
 
 @router.post("/{exam_id}/signatures", status_code=status.HTTP_201_CREATED)
 def upload_facial_signatures(
@@ -378,22 +475,27 @@ async def create_exam(
             detail="Un examen avec ce titre existe déjà."
         )
 
-    # Générer un mot de passe aléatoire pour l'examen
-    password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-    
-    # Créer l'examen
-    db_exam = Exam(
-        title=exam_data.title,
-        description=exam_data.description,
-        password=password,
-        is_active=True,
-        teacher_id=current_user.id,
-        duration_minutes=exam_data.duration_minutes
-    )
-    
-    db.add(db_exam)
-    db.commit()
+    # Générer un mot de passe aléatoire et unique pour l'examen. L'index unique
+    # sur la colonne tranche les (rares) collisions entre requêtes concurrentes.
+    for attempt in range(3):
+        db_exam = Exam(
+            title=exam_data.title,
+            description=exam_data.description,
+            password=exam_password_index.generate_unique_password(db),
+            is_active=True,
+            teacher_id=current_user.id,
+            duration_minutes=exam_data.duration_minutes
+        )
+        db.add(db_exam)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt == 2:
+                raise
     db.refresh(db_exam)
+    exam_password_index.put(db_exam)
     
     return db_exam
 
@@ -418,7 +520,7 @@ async def get_exam(
         # Vérifier si l'utilisateur a une session active pour cet examen
         session = db.query(ExamSession).filter(
             ExamSession.exam_id == exam_id,
-            ExamSession.user_id == current_user.id,
+            ExamSession.student_id == current_user.id,
             ExamSession.is_active == True
         ).first()
         
@@ -430,11 +532,92 @@ async def get_exam(
     
     return exam
 
-def generate_exam_password():
-    """Génère un mot de passe aléatoire pour un examen"""
-    length = 8
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
+async def _authorize_exam_reader(
+    exam_id: int,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> None:
+    """
+    Accès au contenu d'un examen : jeton étudiant émis pour cet examen (sans
+    requête SQL), enseignant propriétaire ou utilisateur ayant une session active.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("role") == "student":
+        if payload.get("exam_id") != exam_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Vous n'avez pas accès à cet examen")
+        return
+
+    current_user = await get_current_user(token, db)
+    exam = db.get(Exam, exam_id)
+    if exam is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=EXAM_NOT_FOUND)
+    if exam.teacher_id != current_user.id:
+        session = db.query(ExamSession.id).filter(
+            ExamSession.exam_id == exam_id,
+            ExamSession.student_id == current_user.id,
+            ExamSession.is_active == True
+        ).first()
+        if not session:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Vous n'avez pas accès à cet examen")
+
+def _snapshot_response(request: Request, snapshot: exam_snapshot.ExamSnapshot) -> Response:
+    """
+    Réponse JSON pré-sérialisée ; 304 si le client possède déjà cette version.
+    Les corps gzip et non compressé diffèrent octet par octet : chacun a son
+    propre ETag fort. L'une ou l'autre variante (dont exam_etag de /join)
+    suffit pour le 304, le contenu JSON étant le même.
+    """
+    gzipped = accepts_encoding(request, "gzip")
+    gzip_etag = f'{snapshot.etag[:-1]}-gzip"'
+    etag = gzip_etag if gzipped else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, snapshot.etag) or etag_matches(request, gzip_etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.post("/{exam_id}/publish")
+def publish_exam(
+    exam_id: int,
+    current_user: User = Depends(get_current_teacher_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Fige le contenu de l'examen vu par les étudiants (questions et options, sans
+    les bonnes réponses). Toute modification ultérieure invalide l'instantané.
+    """
+    exam = db.query(Exam.id).filter(Exam.id == exam_id, Exam.teacher_id == current_user.id).first()
+    if exam is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=EXAM_NOT_FOUND)
+
+    snapshot = exam_snapshot.publish(db, exam_id)
+    return {
+        "exam_id": exam_id,
+        "etag": snapshot.etag,
+        "size": len(snapshot.body),
+        "compressed_size": len(snapshot.gzip_body),
+        "published_at": snapshot.published_at
+    }
+
+@router.get("/{exam_id}/snapshot", dependencies=[Depends(_authorize_exam_reader)])
+def get_exam_snapshot(exam_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Contenu publié de l'examen pour les étudiants, servi depuis la mémoire.
+    Prend en charge If-None-Match (304) et la compression gzip.
+    """
+    snapshot = exam_snapshot.get_snapshot(db, exam_id)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=EXAM_NOT_FOUND)
+    return _snapshot_response(request, snapshot)
 
 @router.get("/by-password/{password}", 
            response_model=ExamSchema, 
@@ -446,18 +629,18 @@ def generate_exam_password():
            })
 async def read_exam_by_password(password: str, db: Session = Depends(get_db)):
     """Récupère un examen par son mot de passe."""
-    exam = db.query(Exam).filter(Exam.password == password).first()
-    if not exam:
+    entry = exam_password_index.resolve(db, password)
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Examen non trouvé avec ce mot de passe"
         )
-    if not exam.is_active:
+    if not entry.is_active or entry.is_expired():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Examen inactif"
         )
-    return exam
+    return _load_indexed_exam(db, entry)
 
 @router.post("/{exam_id}/questions/", response_model=QuestionSchema)
 def create_question(
@@ -492,80 +675,135 @@ def create_question(
     
     db.commit()
     db.refresh(db_question)
+    results_stats.invalidate_exam_results(exam_id)
+    exam_snapshot.invalidate(exam_id)
     return db_question
 
+def _import_questions(
+    exam_id: int,
+    rows: List[Any],
+    skip_invalid: bool,
+    current_user: User,
+    db: Session
+) -> Dict[str, Any]:
+    """Valide puis insère en une seule transaction les questions importées."""
+    db_exam = db.query(Exam).filter(Exam.id == exam_id, Exam.teacher_id == current_user.id).first()
+    if not db_exam:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Examen non trouvé ou vous n'avez pas les droits pour le modifier."
+        )
+
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Aucune question fournie.")
+
+    if len(rows) > settings.BULK_IMPORT_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Un import est limité à {settings.BULK_IMPORT_MAX_QUESTIONS} questions."
+        )
+
+    questions, errors = question_import.validate_rows(rows)
+
+    # Par défaut, une seule ligne invalide annule tout l'import
+    if errors and not skip_invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Certaines lignes sont invalides, aucune question n'a été importée.", "errors": errors}
+        )
+
+    try:
+        question_ids = question_import.bulk_insert_questions(db, exam_id, questions)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    results_stats.invalidate_exam_results(exam_id)
+    exam_snapshot.invalidate(exam_id)
+
+    return {
+        "exam_id": exam_id,
+        "created": len(question_ids),
+        "question_ids": question_ids,
+        "errors": errors
+    }
+
+@router.post(
+    "/{exam_id}/questions/bulk",
+    response_model=QuestionBulkImportResponse,
+    status_code=status.HTTP_201_CREATED
+)
+def bulk_create_questions(
+    exam_id: int,
+    rows: List[Dict[str, Any]] = Body(...),
+    skip_invalid: bool = False,
+    current_user: User = Depends(get_current_teacher_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Importe une liste de questions (avec leurs options) au format JSON.
+    Avec `skip_invalid=true`, les lignes valides sont importées et les autres signalées.
+    """
+    return _import_questions(exam_id, rows, skip_invalid, current_user, db)
+
+@router.post(
+    "/{exam_id}/questions/bulk/csv",
+    response_model=QuestionBulkImportResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def bulk_create_questions_from_csv(
+    exam_id: int,
+    file: UploadFile = File(...),
+    skip_invalid: bool = False,
+    current_user: User = Depends(get_current_teacher_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Importe des questions depuis un fichier CSV
+    (colonnes: question_text, question_type, points, options).
+    """
+    try:
+        rows = question_import.parse_csv_rows(await file.read())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Fichier CSV invalide: {str(e)}")
+
+    return _import_questions(exam_id, rows, skip_invalid, current_user, db)
+
 @router.get("/{exam_id}/questions/", response_model=List[QuestionSchema])
 def read_questions(exam_id: int, db: Session = Depends(get_db)):
-    print(f"Début de la récupération des questions pour l'examen ID: {exam_id}")
-    
     # Vérifier si l'examen existe
-    db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
-    if not db_exam:
-        error_msg = f"Examen avec ID {exam_id} non trouvé"
-        print(error_msg)
+    if db.get(Exam, exam_id) is None:
         raise HTTPException(status_code=404, detail=EXAM_NOT_FOUND)
-    
-    print(f"Examen trouvé: ID={db_exam.id}, Titre={db_exam.title}")
-    
+
     # Récupérer toutes les questions avec leurs options
-    questions = (
+    return (
         db.query(Question)
         .filter(Question.exam_id == exam_id)
-        .options(joinedload(Question.options))
+        .options(selectinload(Question.options))
         .all()
     )
-    
-    print(f"Nombre de questions trouvées: {len(questions)}")
-    for i, q in enumerate(questions, 1):
-        print(f"Question {i}: ID={q.id}, Texte={q.text[:50]}..., Options={len(q.options)}")
-    
-    # S'assurer que les relations sont chargées correctement
-    for q in questions:
-        if not hasattr(q, 'options'):
-            print(f"Attention: la question ID={q.id} n'a pas d'options chargées")
-    
-    return questions
 
 @router.get("/{exam_id}/results/", response_model=List[Dict[str, Any]])
 async def get_exam_results(exam_id: int, db: Session = Depends(get_db)):
+    """Résultats par soumission (réponses correctes, total, pourcentage) calculés en SQL."""
     # Vérifier si l'examen existe
     db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if not db_exam:
         raise HTTPException(status_code=404, detail=EXAM_NOT_FOUND)
-    
-    # Récupérer toutes les soumissions avec leurs réponses
-    submissions = (
-        db.query(Submission)
-        .filter(Submission.exam_id == exam_id)
-        .options(joinedload(Submission.answers))
-        .all()
-    )
-    
-    # Préparer les résultats
-    results = []
-    for submission in submissions:
-        # Calculer les statistiques
-        correct_answers = sum(1 for answer in submission.answers if answer.is_correct)
-        total_questions = len(submission.answers)
-        percentage = round((correct_answers / total_questions * 100), 2) if total_questions > 0 else 0
-        
-        # Créer un dictionnaire pour la réponse
-        result = {
-            "submission": {
-                "id": submission.id,
-                "exam_id": submission.exam_id,
-                "student_name": submission.student_name,
-                "submitted_at": submission.submitted_at.isoformat(),
-                "score": submission.score,
-                "max_score": submission.max_score
-            },
-            "correct_answers": correct_answers,
-            "total_questions": total_questions,
-            "percentage": percentage
-        }
-        results.append(result)
-    
-    return results
+
+    return results_stats.get_exam_results(db, exam_id)["submissions"]
+
+@router.get("/{exam_id}/results/stats", response_model=Dict[str, Any])
+async def get_exam_results_stats(exam_id: int, db: Session = Depends(get_db)):
+    """
+    Statistiques globales de l'examen : moyenne, médiane, percentiles des
+    pourcentages obtenus et taux de réussite par question.
+    """
+    db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not db_exam:
+        raise HTTPException(status_code=404, detail=EXAM_NOT_FOUND)
+
+    return results_stats.get_exam_results(db, exam_id)["stats"]
 
 @router.post("/{exam_id}/signatures", status_code=status.HTTP_200_OK)
 async def upload_exam_signatures(
@@ -631,23 +869,12 @@ def update_exam(
 
     db.add(db_exam)
     db.commit()
-    db.refresh(db_exam)
-    
-    # Recharger les relations pour obtenir les comptes à jour
-    db.refresh(db_exam, attribute_names=['questions', 'submissions'])
+    exam_password_index.put(db_exam)
+    exam_snapshot.invalidate(exam_id)
 
-    # Retourner la réponse complète pour mettre à jour l'UI
-    return ExamDashboardResponse(
-        id=db_exam.id,
-        title=db_exam.title,
-        description=db_exam.description,
-        created_at=db_exam.created_at,
-        is_active=db_exam.is_active,
-        password=db_exam.password,
-        duration_minutes=db_exam.duration_minutes,
-        questions_count=len(db_exam.questions),
-        submissions_count=len(db_exam.submissions)
-    )
+    # Recharger l'examen avec les comptes à jour pour mettre à jour l'UI
+    exam, questions_count, submissions_count = _exams_with_counts(db).filter(Exam.id == db_exam.id).one()
+    return _dashboard_response(exam, questions_count, submissions_count)
 
 @router.delete("/{exam_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_exam(
@@ -669,13 +896,29 @@ def delete_exam(
     # Sinon, il faudrait supprimer manuellement les questions, soumissions, etc.
     db.delete(db_exam)
     db.commit()
+    results_stats.invalidate_exam_results(exam_id)
+    report_cache.invalidate_reports(exam_id)
+    exam_password_index.remove(exam_id)
+    exam_snapshot.invalidate(exam_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+def _student_photos(exam_id: int) -> Dict[str, str]:
+    """Photos téléversées pour l'examen, par nom d'étudiant nettoyé (comme pour l'extraction des signatures)."""
+    photos_dir = os.path.join(SIGNATURES_DIR, str(exam_id))
+    if not os.path.isdir(photos_dir):
+        return {}
+    return {
+        safe_student_name(os.path.splitext(filename)[0]): os.path.join(photos_dir, filename)
+        for filename in os.listdir(photos_dir)
+        if filename.lower().endswith(('.png', '.jpg', '.jpeg'))
+    }
+
 @router.get("/{exam_id}/generate-signatures", response_model=None)
 def generate_signatures_sheet(exam_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Génère une feuille d'émargement en PDF pour un examen donné.
-    Inclut le nom et la photo de chaque étudiant ayant soumis une photo.
+    Inclut le nom de chaque étudiant ayant soumis l'examen et sa photo si elle
+    a été téléversée avec les signatures (uploads/signatures/{exam_id}).
     """
     db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
 
@@ -685,14 +928,23 @@ def generate_signatures_sheet(exam_id: int, db: Session = Depends(get_db), curre
     if db_exam.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Vous n'êtes pas autorisé à accéder à cet examen")
 
-    submissions = db.query(Submission).filter(
-        Submission.exam_id == exam_id,
-        Submission.student_photo_path.isnot(None)
-    ).order_by(Submission.student_name).all()
+    student_names = [
+        name or "" for (name,) in db.query(User.full_name)
+        .join(Submission, Submission.student_id == User.id)
+        .filter(Submission.exam_id == exam_id)
+        .distinct()
+        .order_by(User.full_name)
+    ]
+
+    if not student_names:
+        raise HTTPException(status_code=404, detail="Aucune soumission trouvée pour cet examen.")
 
-    if not submissions:
-        raise HTTPException(status_code=404, detail="Aucune soumission avec photo trouvée pour cet examen.")
+    photos = _student_photos(exam_id)
+    students = [
+        (name, photos.get(safe_student_name(name))) for name in student_names
+    ]
 
+    render_start = time.perf_counter()
     buffer = BytesIO()
     p = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
@@ -715,22 +967,25 @@ def generate_signatures_sheet(exam_id: int, db: Session = Depends(get_db), curre
     y_position -= 0.5 * inch
     p.setFont("Helvetica", 11)
 
-    for sub in submissions:
+    # Miniatures générées (en parallèle) une seule fois par photo : les originaux
+    # ne sont ni décodés ni embarqués dans le PDF
+    thumbnails = thumbnail_cache.get_thumbnails(photo_path for _, photo_path in students)
+
+    for student_name, photo_path in students:
         if y_position < 2 * inch:
             p.showPage()
             p.setFont("Helvetica", 11)
             y_position = height - inch
 
-        p.drawString(inch, y_position, sub.student_name)
+        p.drawString(inch, y_position, student_name)
 
         # Draw photo
-        if sub.student_photo_path and os.path.exists(sub.student_photo_path):
-            try:
-                img = Image.open(sub.student_photo_path)
-                img_width, img_height = img.size
-                aspect = img_height / float(img_width)
-                p.drawImage(sub.student_photo_path, inch * 3, y_position - 0.5 * inch, width=1.5*inch, height=(1.5*aspect)*inch, preserveAspectRatio=True, mask='auto')
-            except Exception:
+        if photo_path:
+            thumbnail = thumbnails.get(photo_path)
+            if thumbnail:
+                thumb_path, aspect = thumbnail
+                p.drawImage(thumb_path, inch * 3, y_position - 0.5 * inch, width=1.5*inch, height=(1.5*aspect)*inch, preserveAspectRatio=True)
+            else:
                 p.drawString(inch * 3, y_position, "(Image invalide)")
 
         # Signature line
@@ -739,6 +994,7 @@ def generate_signatures_sheet(exam_id: int, db: Session = Depends(get_db), curre
         y_position -= 1.5 * inch
 
     p.save()
+    pdf_render_duration.observe(time.perf_counter() - render_start, "signatures")
     buffer.seek(0)
 
     return StreamingResponse(
@@ -749,6 +1005,139 @@ def generate_signatures_sheet(exam_id: int, db: Session = Depends(get_db), curre
 
 # --- Routes pour la surveillance par caméra --- 
 
+@router.get("/monitor/reaped")
+def get_reaped_monitoring_sessions(current_user: User = Depends(get_current_teacher_user)):
+    """Dernières sessions de surveillance arrêtées faute de heartbeat (par ce worker)."""
+    return list(lease_keeper.reaped)
+
+def _require_exam_owner(db: Session, exam_id: int, current_user: User) -> None:
+    exam = db.query(Exam.id).filter(Exam.id == exam_id, Exam.teacher_id == current_user.id).first()
+    if exam is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=EXAM_NOT_FOUND)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/{exam_id}/monitor/statuses")
+def get_exam_monitoring_statuses(
+    exam_id: int,
+    current_user: User = Depends(get_current_teacher_user),
+    db: Session = Depends(get_db)
+):
+    """
+    États de toutes les sessions de surveillance de l'examen en un seul appel,
+    lus sur le tableau des surveillants (sans verrou ni accès aux moniteurs).
+    """
+    _require_exam_owner(db, exam_id, current_user)
+    version, sessions = monitor_board.snapshot(exam_id)
+    return {"exam_id": exam_id, "version": version, "sessions": list(sessions.values())}
+
+@router.get("/{exam_id}/monitor/timeline")
+def get_exam_monitoring_timeline(
+    exam_id: int,
+    session_id: str,
+    current_user: User = Depends(get_current_teacher_user),
+    db: Session = Depends(get_db),
+    face_service: FaceRecognitionService = Depends(lambda: face_recognition_service)
+):
+    """
+    Historique d'une session de surveillance en intervalles (face_status,
+    émotion et identité constants sur chaque intervalle). Session en cours :
+    historique en mémoire du worker qui l'exécute ; session terminée :
+    intervalles écrits en base à son arrêt. Session en cours sur un autre
+    worker : 409 avec l'identifiant de ce worker (l'historique n'est pas
+    publié dans le magasin de sessions).
+    """
+    _require_exam_owner(db, exam_id, current_user)
+
+    timeline = face_service.get_timeline(session_id)
+    if timeline is not None:
+        return {
+            "session_id": session_id,
+            "exam_id": exam_id,
+            "source": "live",
+            "samples": timeline.recorded,
+            "dropped_samples": timeline.dropped,
+            "intervals": timeline.intervals(),
+        }
+
+    record = session_store.get(face_service.kind, session_id)
+    if record is not None and record.is_live() and record.owner != WORKER_ID \
+            and record.data.get("exam_id") == exam_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Session en cours sur un autre worker : son historique n'est disponible que sur ce worker.",
+                "owner": record.owner,
+            }
+        )
+
+    rows = db.query(MonitoringInterval).filter(
+        MonitoringInterval.session_id == session_id,
+        MonitoringInterval.exam_id == exam_id
+    ).order_by(MonitoringInterval.started_at).all()
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Aucun historique pour cette session.")
+    return {
+        "session_id": session_id,
+        "exam_id": exam_id,
+        "source": "stored",
+        "samples": sum(row.samples for row in rows),
+        "intervals": [
+            {
+                "face_status": row.face_status,
+                "emotion": row.emotion,
+                "identity_confirmed": row.identity_confirmed,
+                "started_at": row.started_at,
+                "ended_at": row.ended_at,
+                "samples": row.samples,
+            }
+            for row in rows
+        ],
+    }
+
+@router.get("/{exam_id}/monitor/stream")
+async def stream_exam_monitoring(exam_id: int, token: str = Depends(oauth2_scheme)):
+    """
+    Flux SSE pour le tableau de bord des surveillants : un événement `snapshot`
+    avec l'état de toutes les sessions, puis des événements `changes` ne
+    contenant que les sessions dont face_status, identity_confirmed ou emotion a
+    changé (au plus un événement par MONITOR_FEED_COALESCE_SECONDS). Une session
+    arrêtée apparaît avec `removed: true`.
+
+    Pas de get_db : la session serait gardée (avec sa connexion) tant que le
+    flux reste ouvert. Les vérifications utilisent une session refermée avant
+    le début du flux.
+    """
+    db = SessionLocal()
+    try:
+        current_user = await get_current_teacher_user(await get_current_user(token, db))
+        await run_in_threadpool(_require_exam_owner, db, exam_id, current_user)
+    finally:
+        db.close()
+
+    async def events():
+        subscription = monitor_board.subscribe(exam_id)
+        try:
+            version, sessions = monitor_board.snapshot(exam_id)
+            yield _sse("snapshot", {"version": version, "sessions": list(sessions.values())})
+            while True:
+                changes = await subscription.next_changes(settings.MONITOR_FEED_KEEPALIVE_SECONDS)
+                if not changes:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse("changes", {"version": monitor_board.version, "changes": changes})
+                # Les changements survenus pendant ce délai partent dans le même événement
+                await asyncio.sleep(settings.MONITOR_FEED_COALESCE_SECONDS)
+        finally:
+            monitor_board.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/{exam_id}/monitor/start", status_code=status.HTTP_200_OK)
 def start_exam_monitoring(
     exam_id: int,
@@ -756,16 +1145,13 @@ def start_exam_monitoring(
     face_service: FaceRecognitionService = Depends(lambda: face_recognition_service)
 ):
     """Démarre la surveillance par caméra pour une session d'examen."""
-    success = face_service.start_monitoring(
+    error = face_service.try_start_monitoring(
         session_id=request_data.session_id,
         exam_id=exam_id,
         student_name=request_data.student_name
     )
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Impossible de démarrer la surveillance. Assurez-vous que la session n'est pas déjà active."
-        )
+    if error is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
     return {"message": "La surveillance a démarré avec succès."}
 
 @router.post("/{exam_id}/monitor/stop", status_code=status.HTTP_200_OK)
@@ -782,11 +1168,28 @@ def stop_exam_monitoring(
         )
     return {"message": "La surveillance a été arrêtée."}
 
+@router.post("/{exam_id}/monitor/heartbeat", status_code=status.HTTP_200_OK)
+def monitoring_heartbeat(
+    request_data: MonitorStopRequest,
+    face_service: FaceRecognitionService = Depends(lambda: face_recognition_service)
+):
+    """
+    Signale que l'étudiant est toujours présent. Sans heartbeat (ni consultation
+    du statut) pendant MONITOR_HEARTBEAT_TIMEOUT_SECONDS, la surveillance est arrêtée.
+    """
+    if not face_service.heartbeat(request_data.session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session de surveillance non trouvée ou déjà arrêtée."
+        )
+    return {"session_id": request_data.session_id, "timeout_seconds": settings.MONITOR_HEARTBEAT_TIMEOUT_SECONDS}
+
 @router.get("/{exam_id}/monitor/status", status_code=status.HTTP_200_OK)
 def get_exam_monitoring_status(
     session_id: str,
     face_service: FaceRecognitionService = Depends(lambda: face_recognition_service)
 ):
-    """Récupère le statut en temps réel de la surveillance par caméra."""
+    """Récupère le statut en temps réel de la surveillance par caméra (vaut heartbeat)."""
+    face_service.heartbeat(session_id)
     status = face_service.get_monitoring_status(session_id=session_id)
     return status
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.db.database import get_db
 from app.models import models
 from app.schemas.schemas import SecurityViolation
 from app.core.security import get_current_active_user
 from app.security.exam_security import exam_security
+from app.services.violation_buffer import violation_buffer, violation_row
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, stream_ndjson
+)
 
 router = APIRouter(tags=["security"])
 
@@ -33,7 +39,8 @@ class SecurityViolationCreate(BaseModel):
     user_agent: Optional[str] = None
     ip_address: Optional[str] = None
     additional_info: dict = {}
-    exam_session_id: Optional[int] = None
+    exam_session_id: Optional[str] = None
+    exam_id: Optional[int] = None
 
 @router.post("/violations/", response_model=SecurityViolation, status_code=status.HTTP_201_CREATED)
 async def log_security_violation(
@@ -51,7 +58,8 @@ async def log_security_violation(
             user_agent=violation.user_agent,
             ip_address=violation.ip_address,
             additional_info=violation.additional_info,
-            exam_session_id=violation.exam_session_id
+            exam_session_id=violation.exam_session_id,
+            exam_id=violation.exam_id
         )
         
         db.add(db_violation)
@@ -67,6 +75,51 @@ async def log_security_violation(
             detail=f"Erreur lors de l'enregistrement de la violation: {str(e)}"
         )
 
+class SecurityViolationBatchResponse(BaseModel):
+    accepted: int
+    coalesced: int
+    dropped: int = 0
+
+@router.post(
+    "/violations/batch",
+    response_model=SecurityViolationBatchResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def log_security_violations_batch(violations: List[SecurityViolationCreate]):
+    """
+    Enregistre un lot de violations de sécurité.
+    Les violations sont placées dans un tampon écrit en base par INSERT groupés ;
+    en surcharge, les événements mineurs d'une même session sont fusionnés, et
+    au-delà de la limite mémoire du tampon les événements sont abandonnés (`dropped`).
+    """
+    if len(violations) > settings.VIOLATION_BUFFER_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Un lot est limité à {settings.VIOLATION_BUFFER_MAX_BATCH} violations."
+        )
+
+    try:
+        rows = [
+            violation_row(
+                violation_type=violation.violation_type,
+                timestamp=datetime.fromisoformat(violation.timestamp),
+                url=violation.url,
+                user_agent=violation.user_agent,
+                ip_address=violation.ip_address,
+                additional_info=violation.additional_info,
+                exam_session_id=violation.exam_session_id,
+                exam_id=violation.exam_id
+            )
+            for violation in violations
+        ]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Horodatage invalide: {str(e)}"
+        )
+
+    return violation_buffer.add(rows)
+
 @router.post("/exam/start", response_model=SecurityStatus, status_code=status.HTTP_200_OK)
 async def start_exam_security(session: ExamSecuritySession):
     """
@@ -112,22 +165,58 @@ async def stop_exam_security(session: ExamSecuritySession):
 async def get_exam_security_status(session_id: str):
     """
     Récupère l'état actuel des services de sécurité pour une session d'examen
+    (vaut heartbeat)
     """
+    exam_security.heartbeat(session_id)
     return exam_security.get_security_status(session_id)
 
+def _serialize_violation(violation: models.SecurityViolation) -> dict:
+    return SecurityViolation.model_validate(violation).model_dump(mode="json")
+
 @router.get("/violations/", response_model=List[SecurityViolation])
 async def get_security_violations(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    exam_id: Optional[int] = None,
+    exam_session_id: Optional[str] = None,
+    violation_type: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
     db: Session = Depends(get_db)
 ):
     """
-    Récupère l'historique des violations de sécurité
+    Récupère l'historique des violations de sécurité, des plus récentes aux plus
+    anciennes, paginé par curseur sur (timestamp, id) : le curseur de la page
+    suivante est renvoyé dans l'en-tête X-Next-Cursor.
+    Avec format=ndjson, l'historique filtré est exporté en flux NDJSON.
     (Accès restreint aux administrateurs)
     """
-    violations = db.query(models.SecurityViolation)\
-                 .order_by(models.SecurityViolation.timestamp.desc())\
-                 .offset(skip)\
-                 .limit(limit)\
-                 .all()
+    def build_query(session: Session):
+        query = session.query(models.SecurityViolation)
+        if exam_id is not None:
+            query = query.filter(models.SecurityViolation.exam_id == exam_id)
+        if exam_session_id is not None:
+            query = query.filter(models.SecurityViolation.exam_session_id == exam_session_id)
+        if violation_type is not None:
+            query = query.filter(models.SecurityViolation.violation_type == violation_type)
+        return query
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(
+                build_query, models.SecurityViolation.timestamp, models.SecurityViolation.id, _serialize_violation
+            ),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": "attachment; filename=violations.ndjson"}
+        )
+
+    try:
+        violations, next_cursor = keyset_page(
+            build_query(db), models.SecurityViolation.timestamp, models.SecurityViolation.id, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return violations
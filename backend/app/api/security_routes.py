@@ -4,7 +4,8 @@ Routes pour la gestion de la sécurité des examens.
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.core.security import get_current_user, get_password_hash
+from app.core.password_hashing import PasswordHashingBusy
+from app.core.security import get_current_user, hash_password_bounded
 from app.db.database import get_db
 from app.models import ExamSession, User
 from app.security.exam_security import exam_security
@@ -24,7 +25,7 @@ async def get_security_status(
     # Trouver la session d'examen active
     session = db.query(ExamSession).filter(
         ExamSession.exam_id == exam_id,
-        ExamSession.user_id == current_user.id,
+        ExamSession.student_id == current_user.id,
         ExamSession.status == "in_progress"
     ).first()
     
@@ -34,6 +35,7 @@ async def get_security_status(
             detail="Aucune session de sécurité active trouvée"
         )
     
+    exam_security.heartbeat(session.security_session_id)
     return exam_security.get_security_status(session.security_session_id)
 
 @router.post("/emergency_stop/{exam_id}")
@@ -49,7 +51,7 @@ async def emergency_stop(
     # Trouver la session d'examen active
     session = db.query(ExamSession).filter(
         ExamSession.exam_id == exam_id,
-        ExamSession.user_id == current_user.id,
+        ExamSession.student_id == current_user.id,
         ExamSession.status == "in_progress"
     ).first()
     
@@ -128,5 +130,12 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Hacher le mot de passe et créer l'utilisateur
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = hash_password_bounded(user.password)
+    except PasswordHashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop d'inscriptions simultanées, veuillez réessayer.",
+            headers={"Retry-After": "1"},
+        )
     new_user = User(email=user.email, hashed_password=hashed_password, full_name=user.full_name, is_teacher=user.is_teacher)
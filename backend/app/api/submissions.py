@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Any, Dict, List, Literal, Optional
 
 from app.models import Exam, Submission, User, Answer, Question
-from app.schemas.schemas import SubmissionCreate, SubmissionResponse
+from app.schemas.schemas import SubmissionCreate, SubmissionResponse, SubmissionSummary
+from app.core.config import settings
 from app.core.security import get_current_user
 from app.db.database import get_db
-from app.services.pdf_service import generate_results_pdf
+from app.services import report_cache, results_export, results_stats
+from app.services.exam_password_index import exam_password_index
+from app.utils.range_response import etag_matches, file_response
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, stream_ndjson
+)
 
 router = APIRouter(tags=["submissions"])
 
-@router.post("/", response_model=SubmissionResponse)
+@router.post("/", response_model=Dict[str, Any])
 def submit_exam(submission: SubmissionCreate, db: Session = Depends(get_db)):
     print("Données de soumission reçues:", submission.model_dump())
     
@@ -25,21 +35,29 @@ def submit_exam(submission: SubmissionCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Aucune réponse fournie")
     
     # Vérifier si l'examen existe avec le mot de passe fourni
-    db_exam = db.query(Exam).filter(
-        Exam.password == submission.exam_password,
-        Exam.is_active == True
-    ).first()
+    entry = exam_password_index.resolve(db, submission.exam_password)
+    db_exam = None
+    if entry and entry.is_active and not entry.is_expired():
+        db_exam = db.get(Exam, entry.exam_id)
+        if db_exam is None:
+            # Examen supprimé par un autre processus : l'entrée de l'index est périmée
+            exam_password_index.remove(entry.exam_id)
     
     if not db_exam:
         print(f"Examen non trouvé avec le mot de passe: {submission.exam_password}")
         raise HTTPException(status_code=404, detail="Examen non trouvé ou inactif")
         
     print(f"Examen trouvé: ID={db_exam.id}, Titre={db_exam.title}")
+
+    # Les soumissions sont rattachées à l'utilisateur (comme pour /exams/verify-student)
+    student = db.query(User).filter(User.full_name == submission.student_name).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Étudiant non trouvé avec ce nom.")
     
     # Vérifier si l'étudiant a déjà soumis cet examen
-    existing_submission = db.query(Submission).filter(
+    existing_submission = db.query(Submission.id).filter(
         Submission.exam_id == db_exam.id,
-        Submission.student_name == submission.student_name
+        Submission.student_id == student.id
     ).first()
     
     if existing_submission:
@@ -50,72 +68,70 @@ def submit_exam(submission: SubmissionCreate, db: Session = Depends(get_db)):
         )
     
     # Récupérer toutes les questions de l'examen avec leurs bonnes réponses
-    questions = db.query(Question).filter(
+    # Les options sont chargées en une seule requête (pas de requête par question)
+    questions = db.query(Question).options(selectinload(Question.options)).filter(
         Question.exam_id == db_exam.id
     ).all()
+    questions_by_id = {q.id: q for q in questions}
     
     if not questions:
         raise HTTPException(status_code=400, detail="Aucune question trouvée pour cet examen")
     
-    # Créer une soumission
-    db_submission = Submission(
-        exam_id=db_exam.id,
-        student_name=submission.student_name,
-        score=0,
-        max_score=sum(q.points for q in questions)
-    )
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
-    
-    # Traiter chaque réponse
+    # Noter chaque réponse
     correct_answers = 0
     total_questions = len(questions)
+    answer_rows = []
     
     for answer in submission.answers:
         # Trouver la question correspondante
-        question = next((q for q in questions if q.id == answer.question_id), None)
+        question = questions_by_id.get(answer.question_id)
         if not question:
             continue  # Ignorer les réponses à des questions qui n'existent pas
         
         # Vérifier si la réponse est correcte
-        is_correct = False
         points_earned = 0
         
         if question.question_type == "true_false":
             # Pour les questions vrai/faux, vérifier si la réponse correspond à l'option correcte
             correct_option = next((opt for opt in question.options if opt.is_correct), None)
-            if correct_option and correct_option.option_text.lower() == answer.answer_text.lower():
-                is_correct = True
+            if correct_option and correct_option.text.lower() == answer.answer_text.lower():
                 points_earned = question.points
                 correct_answers += 1
         else:
             # Pour les questions à choix multiples, vérifier si toutes les options sélectionnées sont correctes
             selected_options = [opt.strip() for opt in answer.answer_text.split(",") if opt.strip()]
-            correct_options = [opt.option_text for opt in question.options if opt.is_correct]
+            correct_options = [opt.text for opt in question.options if opt.is_correct]
             
             if set(selected_options) == set(correct_options):
-                is_correct = True
                 points_earned = question.points
                 correct_answers += 1
         
-        # Enregistrer la réponse
-        db_answer = Answer(
-            submission_id=db_submission.id,
-            question_id=answer.question_id,
-            answer_text=answer.answer_text,
-            is_correct=is_correct,
-            points_earned=points_earned
-        )
-        db.add(db_answer)
-        db_submission.score += points_earned
+        answer_rows.append({
+            "question_id": answer.question_id,
+            "answer_text": answer.answer_text,
+            "points_awarded": points_earned
+        })
     
-    # Mettre à jour le score final de la soumission
+    # Créer la soumission avec son score final, puis ses réponses en un INSERT groupé
+    exam_id = db_exam.id
+    student_name = student.full_name
+    max_score = sum(q.points for q in questions)
+    db_submission = Submission(
+        exam_id=exam_id,
+        student_id=student.id,
+        score=sum(row["points_awarded"] for row in answer_rows),
+        total_points_possible=max_score
+    )
+    db.add(db_submission)
+    db.flush()
+    if answer_rows:
+        db.execute(insert(Answer), [{**row, "submission_id": db_submission.id} for row in answer_rows])
     db.commit()
     db.refresh(db_submission)
+    results_stats.invalidate_exam_results(exam_id)
     
     # Préparer la réponse
-    percentage = (db_submission.score / db_submission.max_score) * 100 if db_submission.max_score > 0 else 0
+    percentage = (db_submission.score / max_score) * 100 if max_score > 0 else 0
     
     # Récupérer les réponses pour cette soumission
     db_answers = db.query(Answer).filter(
@@ -127,18 +143,19 @@ def submit_exam(submission: SubmissionCreate, db: Session = Depends(get_db)):
         "id": answer.id,
         "question_id": answer.question_id,
         "answer_text": answer.answer_text,
-        "is_correct": answer.is_correct,
-        "points_earned": answer.points_earned
+        # Le modèle ne stocke que les points : une réponse est correcte si elle en rapporte
+        "is_correct": answer.points_awarded > 0,
+        "points_earned": answer.points_awarded
     } for answer in db_answers]
     
     # Créer le dictionnaire de soumission
     submission_data = {
         "id": db_submission.id,
         "exam_id": db_submission.exam_id,
-        "student_name": db_submission.student_name,
+        "student_name": student_name,
         "submitted_at": db_submission.submitted_at.isoformat(),
         "score": db_submission.score,
-        "max_score": db_submission.max_score,
+        "max_score": max_score,
         "answers": answers_data
     }
     
@@ -163,41 +180,122 @@ def get_submission(submission_id: int, db: Session = Depends(get_db)):
 @router.get("/exam/{exam_id}/results-pdf", response_class=Response)
 async def download_exam_results_pdf(
     exam_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Génère et télécharge les résultats de toutes les soumissions pour un examen au format PDF.
+    Télécharge les résultats de toutes les soumissions pour un examen au format PDF.
+    Le rapport est rendu en arrière-plan et mis en cache sur disque : il n'est
+    régénéré que si les données de l'examen ont changé. Les en-têtes ETag /
+    If-None-Match et Range sont pris en charge.
     """
-    exam = db.query(Exam).options(joinedload(Exam.teacher)).filter(Exam.id == exam_id).first()
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if not exam:
         raise HTTPException(status_code=404, detail="Examen non trouvé.")
 
     if not current_user.is_teacher or exam.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Accès non autorisé.")
 
-    submissions = db.query(Submission).options(joinedload(Submission.answers)).filter(Submission.exam_id == exam_id).all()
-    
-    # Même s'il n'y a pas de soumissions, générer un PDF avec un message informatif
-    # au lieu de renvoyer une erreur 404
-    pdf_bytes = generate_results_pdf(exam=exam, submissions=submissions)
-    
-    return Response(
-        content=pdf_bytes,
-        media_type='application/pdf',
-        headers={"Content-Disposition": f"attachment; filename=resultats_examen_{exam.id}.pdf"}
-    )
+    key = report_cache.report_key(exam.id, report_cache.report_version(db, exam))
+    etag = report_cache.report_etag(key)
+    filename = f"resultats_examen_{exam.id}.pdf"
+
+    # Le client possède déjà cette version : inutile de toucher au fichier
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Même s'il n'y a pas de soumissions, un PDF avec un message informatif est généré
+    future = report_cache.ensure_report(exam.id, exam.title, key)
+    try:
+        path = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)),
+            timeout=settings.REPORT_RENDER_WAIT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse(
+            status_code=202,
+            content={"message": "Le rapport est en cours de génération, veuillez réessayer."},
+            headers={"Retry-After": "2"}
+        )
+
+    return file_response(request, path, media_type="application/pdf", etag=etag, filename=filename)
+
+def _serialize_submission(submission: Submission) -> dict:
+    return SubmissionSummary.model_validate(submission).model_dump(mode="json")
 
-@router.get("/exam/{exam_id}", response_model=List[SubmissionResponse])
-def get_submissions_by_exam(exam_id: int, db: Session = Depends(get_db)):
+@router.get("/exam/{exam_id}", response_model=List[SubmissionSummary])
+def get_submissions_by_exam(
+    exam_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    student_id: Optional[int] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Liste les soumissions d'un examen, des plus récentes aux plus anciennes,
+    paginées par curseur sur (submitted_at, id). Le curseur de la page suivante
+    est renvoyé dans l'en-tête X-Next-Cursor.
+    Avec format=ndjson, toutes les soumissions sont exportées en flux NDJSON.
+    """
     # Vérifier si l'examen existe
     db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if not db_exam:
         raise HTTPException(status_code=404, detail="Examen non trouvé")
-    
-    # Récupérer toutes les soumissions pour cet examen
-    submissions = db.query(Submission).filter(
-        Submission.exam_id == exam_id
-    ).all()
-    
+
+    def build_query(session: Session):
+        query = session.query(Submission).filter(Submission.exam_id == exam_id)
+        if student_id is not None:
+            query = query.filter(Submission.student_id == student_id)
+        return query
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(build_query, Submission.submitted_at, Submission.id, _serialize_submission),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename=soumissions_examen_{exam_id}.ndjson"}
+        )
+
+    try:
+        submissions, next_cursor = keyset_page(
+            build_query(db), Submission.submitted_at, Submission.id, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return submissions
+
+@router.get("/exam/{exam_id}/export", response_class=StreamingResponse)
+def export_exam_results(
+    exam_id: int,
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    granularity: Literal["submission", "answer"] = "submission",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Exporte les résultats d'un examen pour un import dans un LMS : une ligne par
+    soumission (granularity=submission) ou par réponse (granularity=answer),
+    au format CSV, NDJSON ou Parquet. L'export est envoyé en flux.
+    """
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Examen non trouvé.")
+
+    if not current_user.is_teacher or exam.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Accès non autorisé.")
+
+    if format == "parquet" and not results_export.parquet_available():
+        raise HTTPException(status_code=501, detail="L'export Parquet nécessite le paquet pyarrow.")
+
+    media_type, extension = results_export.FORMATS[format]
+    filename = f"resultats_examen_{exam_id}_{granularity}.{extension}"
+    return StreamingResponse(
+        results_export.export_results(exam_id, format, granularity),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -3,12 +3,22 @@ from typing import Optional
 import os
 from pathlib import Path
 
+# Données produites à l'exécution (caches, état partagé) : hors du paquet app
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(Path(__file__).parent.parent.parent, "data"))
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Online Exam Platform"
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    USER_CACHE_TTL_SECONDS: float = 30.0  # cache des utilisateurs authentifiés
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Pool borné pour bcrypt (connexion, inscription)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # au-delà, réponse 503 immédiate
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
@@ -28,6 +38,42 @@ class Settings(BaseSettings):
     UPLOAD_FOLDER: str = os.path.join(Path(__file__).parent.parent, "uploads")
     MAX_CONTENT_LENGTH: int = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS: set = {"pdf", "png", "jpg", "jpeg", "gif"}
+
+    # Cache disque des rapports PDF de résultats
+    REPORTS_CACHE_DIR: str = os.path.join(DATA_DIR, "report_cache")
+    REPORT_RENDER_WORKERS: int = 2
+    REPORT_RENDER_WAIT_SECONDS: float = 20.0  # au-delà, on répond 202 et le client réessaie
+
+    # Journalisation des requêtes HTTP
+    REQUEST_LOG_SAMPLE_RATE: float = 1.0  # fraction des requêtes journalisées (erreurs et lentes : toujours)
+    REQUEST_LOG_SLOW_MS: float = 1000.0
+    LOG_REDACTED_FIELDS: set = {
+        "password", "exam_password", "token", "access_token", "refresh_token",
+        "authorization", "secret", "api_key", "session_id"
+    }
+
+    # Mode profilage SQL (développement) : en-têtes X-DB-* et détection des motifs N+1
+    QUERY_PROFILING: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 5  # exécutions d'une même requête au cours d'une requête HTTP
+
+    # Miniatures des photos d'étudiants (feuille d'émargement)
+    THUMBNAILS_CACHE_DIR: str = os.path.join(DATA_DIR, "thumbnail_cache")
+    THUMBNAIL_MAX_SIZE: int = 300  # pixels, ~200 dpi pour un emplacement de 1,5 pouce
+    THUMBNAIL_JPEG_QUALITY: int = 80
+    THUMBNAIL_WORKERS: int = 4
+
+    # Index des mots de passe d'examen : durée avant revérification en base d'une
+    # entrée connue, et cache négatif des mots de passe inconnus
+    EXAM_PASSWORD_TTL_SECONDS: float = 30.0
+    EXAM_PASSWORD_NEGATIVE_TTL_SECONDS: float = 5.0
+    EXAM_PASSWORD_NEGATIVE_MAX_ENTRIES: int = 10000
+
+    # Instantanés du contenu des examens : durée avant revérification de leur
+    # version en base (modifications faites par un autre processus)
+    EXAM_SNAPSHOT_TTL_SECONDS: float = 5.0
+
+    # Import en masse de questions
+    BULK_IMPORT_MAX_QUESTIONS: int = 1000
     
     # Email settings
     SMTP_TLS: bool = True
@@ -41,6 +87,34 @@ class Settings(BaseSettings):
     # Anti-cheat settings
     ENABLE_ANTI_CHEAT: bool = True
     SCREENSHOT_INTERVAL: int = 30  # seconds
+
+    # Surveillance caméra : "process" (analyse dans des workers dédiés) ou "thread" (dans l'API)
+    PROCTORING_MODE: str = "process"
+    PROCTORING_WORKERS: int = 2
+    PROCTORING_RING_SLOTS: int = 4
+    PROCTORING_FRAME_MAX_BYTES: int = 1920 * 1080 * 3  # taille d'un emplacement du tampon partagé
+    PROCTORING_CAPTURE_INTERVAL: float = 0.5  # seconds entre deux images analysées (la capture est continue)
+    PROCTORING_POLL_INTERVAL: float = 0.05  # seconds, attente d'un worker sans nouvelle image
+
+    # État partagé des sessions de surveillance : "memory" (un worker) ou "sqlite" (plusieurs workers)
+    SESSION_STORE: str = "memory"
+    SESSION_STORE_PATH: str = os.path.join(DATA_DIR, "session_state", "sessions.db")
+    SESSION_LEASE_SECONDS: float = 15.0
+    SESSION_LEASE_RENEW_INTERVAL: float = 5.0  # seconds, doit rester bien inférieur à la durée du bail
+    MONITOR_HEARTBEAT_TIMEOUT_SECONDS: float = 90.0  # sans heartbeat, la session est arrêtée et libérée
+    MONITOR_BOARD_INTERVAL: float = 0.5  # seconds entre deux relevés des états pour les surveillants
+    MONITOR_FEED_COALESCE_SECONDS: float = 1.0  # délai minimal entre deux événements du flux SSE
+    MONITOR_FEED_KEEPALIVE_SECONDS: float = 15.0
+    MONITOR_TIMELINE_SLOTS: int = 14400  # analyses conservées par session (2 h à une image toutes les 0,5 s)
+    MONITOR_TIMELINE_FLUSH_BATCH: int = 500  # intervalles par INSERT groupé en fin de session
+
+    # Tampon d'écriture des violations de sécurité
+    VIOLATION_BUFFER_MAX_BATCH: int = 200  # lignes par INSERT groupé
+    VIOLATION_BUFFER_FLUSH_INTERVAL: float = 1.0  # seconds
+    VIOLATION_BUFFER_MAX_PENDING: int = 5000  # au-delà, les événements mineurs sont fusionnés
+    VIOLATION_BUFFER_HARD_LIMIT: int = 20000  # au-delà (en attente + en cours d'écriture), tout est abandonné
+    VIOLATION_BUFFER_MAX_RETRIES: int = 5  # échecs consécutifs avant d'isoler les lignes fautives
+    VIOLATION_LOW_SEVERITY_TYPES: set = {"blur", "focus_lost", "tab_switch", "visibility_change", "copy", "paste"}
     
     class Config:
         case_sensitive = True
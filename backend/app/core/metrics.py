@@ -0,0 +1,226 @@
+"""
+Métriques en mémoire (compteurs, jauges et histogrammes) exposées au format
+texte de Prometheus par l'endpoint /metrics.
+
+Implémentation volontairement minimale, sans dépendance : chaque métrique
+garde ses valeurs par combinaison d'étiquettes, protégées par un verrou.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Bornes (en secondes) adaptées aux latences HTTP et base de données
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+REGISTRY: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{self._labels(labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Jauge sans étiquette dont la valeur est lue au moment de l'export."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._function: Callable[[], float] = lambda: 0
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self._function())
+        except Exception:
+            value = float("nan")
+        return super().render() + [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par étiquettes : [compte par intervalle (+Inf en dernier), somme, nombre]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Dict[LabelValues, Tuple[list, float, int]]:
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total, count) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._labels(labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Toutes les métriques enregistrées, au format texte de Prometheus."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP",
+    ("method", "route", "status"),
+)
+
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "Nombre de requêtes SQL exécutées par requête HTTP",
+    ("route",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+db_time_per_request = Histogram(
+    "db_time_per_request_seconds",
+    "Temps passé en base de données par requête HTTP",
+    ("route",),
+)
+
+signature_extraction_image_duration = Histogram(
+    "signature_extraction_image_seconds",
+    "Durée d'extraction de la signature faciale d'une image",
+    ("outcome",),
+)
+
+frame_analysis_stage_duration = Histogram(
+    "frame_analysis_stage_seconds",
+    "Durée de chaque étape de l'analyse d'une image de la caméra",
+    ("stage",),
+)
+
+security_microservice_duration = Histogram(
+    "security_microservice_request_seconds",
+    "Latence des appels au microservice de sécurité",
+    ("action", "outcome"),
+)
+
+pdf_render_duration = Histogram(
+    "pdf_render_seconds",
+    "Durée de rendu des documents PDF",
+    ("document",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+
+camera_frame_age = Histogram(
+    "camera_frame_age_seconds",
+    "Délai entre la capture d'une image de la caméra et le début de son analyse",
+    ("mode",),
+)
+
+proctoring_frame_duration = Histogram(
+    "proctoring_frame_analysis_seconds",
+    "Durée d'analyse d'une image dans un worker de surveillance",
+)
+
+proctoring_worker_restarts = Counter(
+    "proctoring_worker_restarts_total",
+    "Workers de surveillance redémarrés après un arrêt inattendu",
+)
+
+monitoring_sessions_reaped = Counter(
+    "monitoring_sessions_reaped_total",
+    "Sessions de surveillance arrêtées faute de heartbeat",
+    ("kind",),
+)
+
+violations_dropped = Counter(
+    "security_violations_dropped_total",
+    "Violations de sécurité abandonnées sans être écrites",
+    ("reason",),
+)
+
+monitor_feed_subscribers = Gauge(
+    "monitor_feed_subscribers",
+    "Flux SSE de surveillance ouverts par des surveillants",
+)
+
+active_monitors = Gauge(
+    "face_recognition_active_monitors",
+    "Nombre de surveillances caméra actives",
+)
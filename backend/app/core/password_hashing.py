@@ -0,0 +1,67 @@
+"""
+Vérification et hachage bcrypt dans un pool de threads borné.
+
+bcrypt est volontairement coûteux en CPU : exécuté directement dans la boucle
+d'événements (route async), il bloque toutes les autres requêtes pendant une
+vague de connexions. Les opérations passent donc par un pool dédié (bcrypt
+libère le GIL pendant le calcul) dont la file d'attente est bornée : au-delà
+de PASSWORD_HASH_MAX_PENDING opérations en attente, ou après
+PASSWORD_HASH_TIMEOUT_SECONDS d'attente, PasswordHashingBusy est levée et la
+route répond 503 au lieu d'accumuler du retard.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable
+
+from app.core.config import settings
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Trop d'opérations de mot de passe en attente."""
+
+
+def _release(_: Future) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _submit(function: Callable, *args) -> Future:
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashingBusy()
+        _pending += 1
+    future = _executor.submit(function, *args)
+    future.add_done_callback(_release)
+    return future
+
+
+async def run_async(function: Callable, *args):
+    """Exécute `function(*args)` dans le pool et attend son résultat sans bloquer la boucle."""
+    future = _submit(function, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Une opération encore en file est annulée ; une opération en cours se termine seule
+        future.cancel()
+        raise PasswordHashingBusy()
+
+
+def run_blocking(function: Callable, *args):
+    """Variante pour les routes synchrones (déjà exécutées hors de la boucle)."""
+    future = _submit(function, *args)
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashingBusy()
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,80 @@
+"""
+Cache court des utilisateurs authentifiés, indexé par le sujet du jeton (email).
+
+Évite une requête SQL par appel authentifié : get_current_user ne lit la base
+que si l'utilisateur n'est pas en cache ou si son entrée a expiré. Le cache
+contient une copie en lecture seule des colonnes de l'utilisateur (jamais un
+objet attaché à une session), et toute modification ou suppression d'un
+utilisateur via l'ORM invalide son entrée immédiatement. Les UPDATE en masse
+(query.update) contournent ces événements : appeler invalidate_user dans ce cas.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import event, inspect
+
+from app.core.config import settings
+from app.models import User
+
+
+class UserPrincipal(BaseModel):
+    """Colonnes de l'utilisateur utilisées par les routes protégées."""
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_active: bool = True
+    is_teacher: bool = False
+
+    @property
+    def username(self) -> str:
+        return self.full_name or self.email
+
+
+_entries: "OrderedDict[str, Tuple[UserPrincipal, float]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_principal(email: str) -> Optional[UserPrincipal]:
+    with _lock:
+        entry = _entries.get(email)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at < time.monotonic():
+            del _entries[email]
+            return None
+        return principal
+
+
+def cache_principal(user: User) -> UserPrincipal:
+    principal = UserPrincipal.model_validate(user)
+    with _lock:
+        _entries[principal.email] = (principal, time.monotonic() + settings.USER_CACHE_TTL_SECONDS)
+        _entries.move_to_end(principal.email)
+        while len(_entries) > settings.USER_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return principal
+
+
+def invalidate_user(email: Optional[str] = None) -> None:
+    """Retire un utilisateur du cache (ou vide le cache si email est None)."""
+    with _lock:
+        if email is None:
+            _entries.clear()
+        else:
+            _entries.pop(email, None)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    # Désactivation, changement de rôle, suppression : l'entrée ne doit plus servir
+    invalidate_user(target.email)
+    # Si l'email a changé, l'ancienne clé doit aussi disparaître
+    for old_email in inspect(target).attrs.email.history.deleted or ():
+        invalidate_user(old_email)
@@ -0,0 +1,156 @@
+"""
+Journalisation des requêtes HTTP.
+
+Middleware ASGI pur : le corps des requêtes n'est jamais lu ni mis en mémoire,
+seules la méthode, la route, le statut et la durée sont journalisés, sous forme
+d'une ligne JSON. Les valeurs sensibles des paramètres de requête sont masquées
+et le chemin journalisé est le modèle de la route (par exemple
+/api/exams/by-password/{password}) plutôt que l'URL réelle.
+
+L'écriture se fait dans un thread dédié (QueueHandler / QueueListener) pour ne
+jamais bloquer la boucle d'événements. Les requêtes en erreur serveur ou lentes
+sont toujours journalisées ; les autres selon REQUEST_LOG_SAMPLE_RATE.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from app.core.config import settings
+from app.core.metrics import db_queries_per_request, db_time_per_request, http_request_duration
+from app.db import query_stats
+
+REDACTED = "***"
+
+logger = logging.getLogger("app.requests")
+_listener: Optional[QueueListener] = None
+
+
+def start_request_logging() -> None:
+    """Branche le logger sur un thread d'écriture dédié (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def stop_request_logging() -> None:
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def redact_query(query_string: bytes) -> str:
+    if not query_string:
+        return ""
+    params = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode([
+        (key, REDACTED if key.lower() in settings.LOG_REDACTED_FIELDS else value)
+        for key, value in params
+    ], safe="*")
+
+
+def route_template(scope) -> Optional[str]:
+    """Modèle de la route appelée, ou None si aucune route de l'API n'a correspondu."""
+    return getattr(scope.get("route"), "path", None)
+
+
+def _profiling_headers(stats: query_stats.QueryStats) -> list:
+    """
+    En-têtes du mode profilage. Ils sont envoyés avec le début de la réponse :
+    pour une réponse en flux, les requêtes faites pendant l'envoi du corps
+    n'apparaissent que dans le journal.
+    """
+    repeated = stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD)
+    return [
+        (b"x-db-queries", str(stats.count).encode()),
+        (b"x-db-time-ms", f"{stats.duration * 1000:.2f}".encode()),
+        (b"x-db-n-plus-one", str(len(repeated)).encode()),
+    ]
+
+
+def _log_repeated_statements(method: str, route: str, stats: query_stats.QueryStats) -> None:
+    for statement, count in stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD):
+        logger.warning(json.dumps({
+            "event": "n_plus_one",
+            "method": method,
+            "route": route,
+            "executions": count,
+            "statement": " ".join(statement.split())[:500],
+        }))
+
+
+class RequestLoggingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        start_request_logging()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        profile = settings.QUERY_PROFILING
+        stats_token = query_stats.begin_request(profile)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", f"{elapsed:.6f}".encode()))
+                if profile:
+                    headers.extend(_profiling_headers(query_stats.current()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            stats = query_stats.end_request(stats_token)
+            route = route_template(scope)
+            # Étiquette bornée pour les métriques : pas de chemin brut (fichiers, 404)
+            label = route or "unmatched"
+            http_request_duration.observe(duration, scope["method"], label, str(status_code))
+            if stats.count:
+                db_queries_per_request.observe(stats.count, label)
+                db_time_per_request.observe(stats.duration, label)
+            self._log(scope, route or scope.get("path", ""), status_code, duration, stats)
+            if profile:
+                _log_repeated_statements(scope["method"], route or scope.get("path", ""), stats)
+
+    def _log(self, scope, route: str, status_code: int, duration: float, stats: query_stats.QueryStats) -> None:
+        duration_ms = duration * 1000
+        always = status_code >= 500 or duration_ms >= settings.REQUEST_LOG_SLOW_MS
+        if not always and random.random() >= settings.REQUEST_LOG_SAMPLE_RATE:
+            return
+        client = scope.get("client")
+        logger.info(json.dumps({
+            "event": "request",
+            "method": scope["method"],
+            "route": route,
+            "query": redact_query(scope.get("query_string", b"")),
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_queries": stats.count,
+            "db_ms": round(stats.duration * 1000, 2),
+            "client": client[0] if client else None,
+        }))
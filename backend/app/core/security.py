@@ -3,6 +3,7 @@ from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
@@ -10,6 +11,7 @@ from pydantic import BaseModel
 from app.db.database import get_db
 from app.models import User
 from app.core.config import settings
+from app.core import password_hashing, principal_cache
 
 # Token data model
 class TokenData(BaseModel):
@@ -38,6 +40,19 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """authenticate_user pour les routes async : ni la requête SQL ni bcrypt ne bloquent la boucle."""
+    user = await run_in_threadpool(get_user, db, email)
+    if not user:
+        return None
+    if not await password_hashing.run_async(verify_password, password, user.hashed_password):
+        return None
+    return user
+
+def hash_password_bounded(password: str) -> str:
+    """get_password_hash exécuté dans le pool borné (routes synchrones)."""
+    return password_hashing.run_blocking(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -63,10 +78,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = get_user(db, email=token_data.email)
+    # Utilisateur en cache : aucune requête SQL pour cet appel
+    principal = principal_cache.get_principal(token_data.email)
+    if principal is not None:
+        return principal
+
+    user = await run_in_threadpool(get_user, db, token_data.email)
     if user is None:
         raise credentials_exception
-    return user
+    return principal_cache.cache_principal(user)
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
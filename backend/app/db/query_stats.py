@@ -0,0 +1,108 @@
+"""
+Comptage des requêtes SQL et du temps passé en base, par requête HTTP.
+
+Les événements before/after_cursor_execute de SQLAlchemy alimentent l'objet
+QueryStats de la requête HTTP courante, transmis par une ContextVar (qui suit
+aussi les handlers synchrones exécutés dans le pool de threads). En dehors
+d'une requête HTTP, les événements ne font rien.
+
+En mode profilage (QUERY_PROFILING), chaque requête SQL est aussi comptée par
+texte de requête : une même requête paramétrée exécutée de nombreuses fois au
+cours d'une requête HTTP est le signe d'un motif N+1.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self, profile: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        # Nombre d'exécutions par texte de requête (mode profilage uniquement)
+        self.statements: Optional[Dict[str, int]] = {} if profile else None
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Requêtes exécutées au moins `threshold` fois : candidates N+1."""
+        if not self.statements:
+            return []
+        return sorted(
+            ((statement, count) for statement, count in self.statements.items() if count >= threshold),
+            key=lambda item: -item[1]
+        )
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def begin_request(profile: bool = False) -> Token:
+    return _current.set(QueryStats(profile))
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def end_request(token: Token) -> Optional[QueryStats]:
+    stats = _current.get()
+    _current.reset(token)
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start_time")
+    if starts:
+        stats.duration += time.perf_counter() - starts.pop()
+    stats.count += 1
+    if stats.statements is not None:
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def install() -> None:
+    """Branche les écouteurs sur tous les moteurs (idempotent)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[List[str]]:
+    """
+    Vérifie qu'un bloc de code n'exécute pas plus de `max_queries` requêtes SQL,
+    tous threads confondus (utilisable avec le TestClient de FastAPI) :
+
+        with query_budget(5):
+            client.get("/api/exams/me/", headers=headers)
+
+    Lève AssertionError en listant les requêtes exécutées si le budget est dépassé.
+    """
+    statements: List[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "after_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "after_cursor_execute", _record)
+
+    if len(statements) > max_queries:
+        details = "\n".join(f"  {statement}" for statement in statements)
+        raise AssertionError(
+            f"{len(statements)} requêtes SQL exécutées pour un budget de {max_queries}:\n{details}"
+        )
@@ -1,25 +1,86 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-import time
 import os
 
 # Importe tous les modèles pour s'assurer qu'ils sont enregistrés par SQLAlchemy
 from app.models import models 
 
-from app.db.database import engine, Base
+from app.db.database import engine, Base, SessionLocal
+from app.db import query_stats
 from app.core.config import settings
+from app.core import password_hashing
+from app.core.metrics import render_metrics
+from app.core.request_logging import RequestLoggingMiddleware, stop_request_logging
 from app.api import router as api_router
+from app.services import report_cache
+from app.services.exam_password_index import exam_password_index
+from app.services.violation_buffer import violation_buffer
+from app.security.exam_security import exam_security
+from app.security.face_recognition_service import face_recognition_service
+from app.security.monitor_board import monitor_board
+from app.security.proctoring_workers import proctoring_pool
+from app.security.session_store import lease_keeper
+
+# Comptage des requêtes SQL par requête HTTP (métriques)
+query_stats.install()
+
+
+def prepare_database():
+    # Crée toutes les tables dans la base de données
+    # Cette ligne doit être exécutée après l'importation des modèles
+    Base.metadata.create_all(bind=engine)
+
+    # create_all ne crée pas les index ajoutés depuis sur des tables existantes
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"[STARTUP] Index {index.name} non créé: {e}")
+
+
+def warm_exam_password_index():
+    # Index des mots de passe d'examen chargé avant la première requête
+    db = SessionLocal()
+    try:
+        count = exam_password_index.warm(db)
+        print(f"[STARTUP] Index des mots de passe d'examen: {count} examens")
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Démarrage : exécuté par le serveur, pas à l'import du module
+    prepare_database()
+    warm_exam_password_index()
+    # Baux, reprise et récupération des sessions sans heartbeat
+    lease_keeper.register(face_recognition_service)
+    lease_keeper.register(exam_security)
+    # États de surveillance par examen pour les surveillants (statuts groupés, flux SSE)
+    monitor_board.register(face_recognition_service)
+    yield
+    # Arrêt : écrire les violations encore en attente avant l'arrêt du serveur
+    violation_buffer.stop()
+    lease_keeper.stop()
+    monitor_board.stop()
+    face_recognition_service.stop_all_monitoring()
+    exam_security.stop_all()
+    proctoring_pool.shutdown()
+    report_cache.shutdown()
+    stop_request_logging()
+    password_hashing.shutdown()
 
-# Crée toutes les tables dans la base de données
-# Cette ligne doit être exécutée après l'importation des modèles
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API pour la gestion des examens et des résultats",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuration CORS
@@ -32,39 +93,8 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# Middleware pour logger les requêtes et les réponses
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    body = await request.body()
-    
-    # Pour permettre au corps d'être lu à nouveau, nous devons recréer le scope de la requête.
-    # C'est une manière plus sûre de gérer le corps de la requête.
-    async def receive():
-        return {"type": "http.request", "body": body}
-    
-    request = Request(request.scope, receive)
-
-    response = await call_next(request)
-    
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    # Log des détails
-    print(f"[REQUEST] {request.method} {request.url}")
-    print(f"[HEADERS] {dict(request.headers)}")
-    if body:
-        try:
-            print(f"[BODY] {body.decode('utf-8')}")
-        except UnicodeDecodeError:
-            print("[BODY] (non-decodable content, likely binary)")
-    else:
-        print("[BODY] (empty)")
-
-    print(f"[RESPONSE] Status: {response.status_code}, Time: {process_time * 1000:.2f}ms")
-
-    return response
+# Journalisation des requêtes (sans lecture du corps, secrets masqués)
+app.add_middleware(RequestLoggingMiddleware)
 
 # Inclure le routeur API centralisé
 app.include_router(
@@ -78,6 +108,11 @@ if not os.path.exists("uploads"):
     os.makedirs("uploads")
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métriques de l'application au format texte de Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Bienvenue sur l'API de gestion d'examens"}
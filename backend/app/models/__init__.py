@@ -9,5 +9,7 @@ from .models import (
     Submission,
     Answer,
     ExamSession,
-    FacialSignature
+    SecurityViolation,
+    FacialSignature,
+    MonitoringInterval
 )
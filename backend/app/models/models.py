@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Table, Text, Float
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Table, Text, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base # Utiliser la Base centrale
@@ -28,7 +28,7 @@ class Exam(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String, nullable=True)
-    password = Column(String, nullable=True)
+    password = Column(String, nullable=True, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=True)
@@ -84,6 +84,11 @@ class Submission(Base):
     student = relationship("User", back_populates="submissions")
     answers = relationship("Answer", back_populates="submission", cascade="all, delete-orphan")
 
+    # Index composite pour la pagination par curseur (submitted_at, id) par examen
+    __table_args__ = (
+        Index("ix_submissions_exam_submitted_at_id", "exam_id", "submitted_at", "id"),
+    )
+
 # --- Modèle Réponse ---
 class Answer(Base):
     __tablename__ = "answers"
@@ -113,6 +118,46 @@ class ExamSession(Base):
     exam = relationship("Exam", back_populates="sessions")
     student = relationship("User", back_populates="exam_sessions")
 
+# --- Modèle de Violation de Sécurité ---
+class SecurityViolation(Base):
+    __tablename__ = "security_violations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    violation_type = Column(String, nullable=False, index=True)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    url = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
+    ip_address = Column(String, nullable=True)
+    additional_info = Column(JSON, default=dict)
+    # Identifiant de session côté client (pas forcément une ExamSession en base)
+    exam_session_id = Column(String, nullable=True, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=True, index=True)
+
+    # Index composite pour la pagination par curseur (timestamp, id)
+    __table_args__ = (
+        Index("ix_security_violations_timestamp_id", "timestamp", "id"),
+    )
+
+# --- Modèle d'Intervalle de Surveillance ---
+class MonitoringInterval(Base):
+    __tablename__ = "monitoring_intervals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Identifiant de session de surveillance côté client
+    session_id = Column(String, nullable=False)
+    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=False, index=True)
+    student_name = Column(String, nullable=True)
+    face_status = Column(String, nullable=False)
+    emotion = Column(String, nullable=False)
+    identity_confirmed = Column(Boolean, default=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    samples = Column(Integer, default=1)
+
+    __table_args__ = (
+        Index("ix_monitoring_intervals_session_started_at", "session_id", "started_at"),
+    )
+
 # --- Modèle de Signature Faciale ---
 class FacialSignature(Base):
     __tablename__ = "facial_signatures"
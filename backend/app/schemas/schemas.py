@@ -12,6 +12,9 @@ class QuestionOptionBase(BaseModel):
     text: str = Field(..., alias='option_text')
     is_correct: bool = False
 
+    class Config:
+        populate_by_name = True
+
 class QuestionOptionCreate(QuestionOptionBase):
     pass
 
@@ -28,9 +31,23 @@ class QuestionBase(BaseModel):
     points: int = 1
     options: List[QuestionOptionCreate] = []
 
+    class Config:
+        populate_by_name = True
+
 class QuestionCreate(QuestionBase):
     pass
 
+# Schémas pour l'import en masse de questions
+class QuestionImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+class QuestionBulkImportResponse(BaseModel):
+    exam_id: int
+    created: int
+    question_ids: List[int] = []
+    errors: List[QuestionImportError] = []
+
 class Question(QuestionBase):
     id: int
     exam_id: int
@@ -146,6 +163,17 @@ class Submission(SubmissionBase):
         data.pop('exam_password', None)
         return data
 
+class SubmissionSummary(BaseModel):
+    id: int
+    exam_id: int
+    student_id: int
+    score: Optional[float] = None
+    total_points_possible: Optional[int] = None
+    submitted_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class SubmissionResult(BaseModel):
     submission: dict
     correct_answers: int
@@ -204,7 +232,8 @@ class SecurityViolationCreate(SecurityViolationBase):
 
 class SecurityViolation(SecurityViolationBase):
     id: int
-    exam_session_id: Optional[int] = None
+    exam_session_id: Optional[str] = None
+    exam_id: Optional[int] = None
 
     class Config:
         from_attributes = True
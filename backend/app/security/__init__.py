@@ -1,10 +1,19 @@
 """
 Module d'initialisation du package de sécurité.
 Exporte les classes et fonctions principales pour une utilisation simplifiée.
+
+Les exports sont résolus à la demande : importer un sous-module du package
+(par exemple app.security.exam_security) ne charge pas cv2, dlib ni DeepFace.
 """
 
-from .camera_monitor import CameraMonitor
+__all__ = ['CameraMonitor','ExamSecurityService']
 
-from .exam_security import ExamSecurityService
 
-__all__ = ['CameraMonitor','ExamSecurityService']
+def __getattr__(name):
+    if name == 'CameraMonitor':
+        from .camera_monitor import CameraMonitor
+        return CameraMonitor
+    if name == 'ExamSecurityService':
+        from .exam_security import ExamSecurityService
+        return ExamSecurityService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
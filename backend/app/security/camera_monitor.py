@@ -1,3 +1,4 @@
+import os
 import cv2
 import numpy as np
 import threading
@@ -5,12 +6,20 @@ import time
 import face_recognition
 from deepface import DeepFace
 
+from app.core.config import settings
+from app.core.metrics import camera_frame_age, frame_analysis_stage_duration
+from app.security.frame_grabber import FrameGrabber, LatestFrameBuffer
+from app.security.status_timeline import StatusTimeline
+
 class CameraMonitor:
     def __init__(self):
         self.running = False
         self.thread = None
         self.cap = None
         self.lock = threading.Lock()
+        # Capture continue dans son propre thread, analyse de l'image la plus récente
+        self.frames = LatestFrameBuffer()
+        self.grabber = None
 
         # State for Facial Recognition
         self.exam_id = None
@@ -22,6 +31,8 @@ class CameraMonitor:
         self.face_status = "pending"  # e.g., pending, confirmed, mismatch, no_face, multiple_faces
         self.emotion_status = "neutral"
         self.detected_objects = [] # Kept for API consistency, but will remain empty
+        # Historique des analyses, créé au démarrage (inutile dans les workers d'analyse)
+        self.timeline = None
 
     def initialize_camera(self):
         """Initialise la caméra."""
@@ -65,15 +76,18 @@ class CameraMonitor:
 
     def analyze_frame(self, frame):
         """Analyse une seule image pour la reconnaissance faciale et l'analyse d'émotions."""
-        rgb_small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb_small_frame = cv2.cvtColor(rgb_small_frame, cv2.COLOR_BGR2RGB)
+        with frame_analysis_stage_duration.time("detect"):
+            rgb_small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+            rgb_small_frame = cv2.cvtColor(rgb_small_frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(rgb_small_frame)
 
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        with frame_analysis_stage_duration.time("encode"):
+            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
 
         if len(face_encodings) == 1:
             # Un seul visage détecté
-            matches = face_recognition.compare_faces([self.student_signature], face_encodings[0])
+            with frame_analysis_stage_duration.time("compare"):
+                matches = face_recognition.compare_faces([self.student_signature], face_encodings[0])
             if matches[0]:
                 self.face_status = "confirmed"
                 self.identity_confirmed = True
@@ -81,7 +95,8 @@ class CameraMonitor:
                 try:
                     (x, y, w, h) = face_locations[0]
                     face_img = frame[y*2:y*2+h*2, x*2:x*2+w*2] # Coordonnées sur l'image originale
-                    emotion_result = DeepFace.analyze(face_img, actions=['emotion'], enforce_detection=False)
+                    with frame_analysis_stage_duration.time("emotion"):
+                        emotion_result = DeepFace.analyze(face_img, actions=['emotion'], enforce_detection=False)
                     self.emotion_status = emotion_result[0]['dominant_emotion']
                 except Exception as e:
                     self.emotion_status = "error_analysis"
@@ -110,21 +125,38 @@ class CameraMonitor:
             print("Arrêt du moniteur en raison d'une erreur de chargement des signatures.")
             return
 
+        if not self.running:
+            # Caméra indisponible
+            return
+
+        self.grabber = FrameGrabber(self.cap, self.frames)
+        self.grabber.start()
+        last_seq = 0
         while self.running:
-            ret, frame = self.cap.read()
-            if ret:
+            started = time.monotonic()
+            latest = self.frames.acquire(last_seq, timeout=1.0)
+            if latest is None:
+                continue
+            last_seq, frame, captured_at = latest
+            try:
+                camera_frame_age.observe(time.monotonic() - captured_at, "thread")
                 self.analyze_frame(frame)
-                
-                # Log des statuts pour le débogage
-                # print(f"Face: {self.face_status}, Emotion: {self.emotion_status}, Identity: {self.identity_confirmed}")
+            finally:
+                self.frames.release()
+            self.timeline.record(self.face_status, self.emotion_status, self.identity_confirmed)
 
-            time.sleep(0.5) # Ralentir la boucle pour ne pas surcharger le CPU
+            # Log des statuts pour le débogage
+            # print(f"Face: {self.face_status}, Emotion: {self.emotion_status}, Identity: {self.identity_confirmed}")
+
+            # Au plus une analyse par intervalle pour ne pas surcharger le CPU
+            time.sleep(max(0.0, settings.PROCTORING_CAPTURE_INTERVAL - (time.monotonic() - started)))
 
     def start(self, exam_id: int, student_name: str):
         """Démarre la surveillance pour un examen et un étudiant spécifiques."""
         if not self.running:
             self.exam_id = exam_id
             self.student_name = student_name
+            self.timeline = StatusTimeline()
             self.running = True
             self.thread = threading.Thread(target=self.monitor_loop)
             self.thread.daemon = True
@@ -137,12 +169,16 @@ class CameraMonitor:
         if self.thread:
             self.thread.join(timeout=1)
             self.thread = None
-            
+
+        # La capture doit être arrêtée avant de libérer la caméra
+        if self.grabber:
+            self.grabber.stop()
+            self.grabber = None
+
         if self.cap:
             self.cap.release()
             self.cap = None
             
-        self.unlock_input()
         cv2.destroyAllWindows()
 
     def get_status(self):
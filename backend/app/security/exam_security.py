@@ -3,10 +3,12 @@ Service de gestion de la sécurité pendant les examens.
 Gère le cycle de vie des composants de sécurité et l'intégration avec le microservice de sécurité.
 """
 import threading
+import time
 import requests
 from typing import Optional
 
-from .camera_monitor import CameraMonitor
+from app.core.metrics import security_microservice_duration
+from .session_store import SessionRecord, lease_keeper, session_store
 # Les imports suivants ont été supprimés car les modules n'existent plus
 # from .remote_control import RemoteControlDetector
 # from .screen_protector import ScreenProtector
@@ -14,7 +16,24 @@ from .camera_monitor import CameraMonitor
 # Configuration du microservice de sécurité
 SECURITY_MICROSERVICE_URL = "http://localhost:8001"
 
+
+def _call_microservice(action: str) -> requests.Response:
+    """POST sur le microservice de sécurité, avec mesure de la latence."""
+    debut = time.perf_counter()
+    outcome = "error"
+    try:
+        response = requests.post(f"{SECURITY_MICROSERVICE_URL}/{action}", timeout=5)
+        outcome = str(response.status_code)
+        return response
+    finally:
+        security_microservice_duration.observe(time.perf_counter() - debut, action, outcome)
+
 class ExamSecurityService:
+    """
+    Sessions de sécurité : le worker qui démarre une session en prend le bail
+    (session_store) ; les autres workers répondent à partir de l'état publié.
+    """
+    kind = "security"
     _instance = None
     _lock = threading.Lock()
     
@@ -30,17 +49,27 @@ class ExamSecurityService:
             return
             
         self._initialized = True
-        self.camera_monitor = CameraMonitor()  # Conservé pour la reconnaissance faciale
-       
+        self._camera_monitor = None  # Conservé pour la reconnaissance faciale
 
         self.active_sessions = {}
         self._lock = threading.Lock()
+
+    @property
+    def camera_monitor(self):
+        # Import et création différés : CameraMonitor charge cv2, dlib et DeepFace
+        if self._camera_monitor is None:
+            from .camera_monitor import CameraMonitor
+            self._camera_monitor = CameraMonitor()
+        return self._camera_monitor
     
     def start_security(self, session_id: str):
         """Démarre les services de sécurité pour une session d'examen"""
         with self._lock:
             if session_id in self.active_sessions:
                 return False
+            if not session_store.claim(self.kind, session_id, {}, touch=True):
+                # Session déjà active sur un autre worker
+                return False
                 
             # Démarrer uniquement le service de caméra pour la reconnaissance faciale
             try:
@@ -52,7 +81,7 @@ class ExamSecurityService:
                 # Appel au microservice de sécurité pour démarrer la protection
                 try:
                     print(f"[SECURITY] Tentative d'appel au microservice à {SECURITY_MICROSERVICE_URL}/start")
-                    response = requests.post(f"{SECURITY_MICROSERVICE_URL}/start", timeout=5)
+                    response = _call_microservice("start")
                     print(f"[SECURITY] Réponse du microservice: {response.status_code} - {response.text}")
                     if response.status_code == 200:
                         print(f"[SECURITY] Microservice de sécurité démarré avec succès pour la session {session_id}")
@@ -67,26 +96,27 @@ class ExamSecurityService:
                     'remote': True, 
                     'screen': True 
                 }
+                lease_keeper.register(self)
                 return True
                 
             except Exception as e:
-                self.stop_security(session_id)
+                # stop_security prendrait self._lock, déjà détenu ici
+                session_store.release(self.kind, session_id)
                 print(f"[ERROR] Échec du démarrage de la sécurité: {str(e)}")
                 raise RuntimeError(f"Échec du démarrage de la sécurité: {str(e)}")
     
     def stop_security(self, session_id: str):
         """Arrête les services de sécurité pour une session d'examen"""
+        # Une session démarrée sur un autre worker y est arrêtée au prochain renouvellement de bail
+        released = session_store.release(self.kind, session_id)
         with self._lock:
-            if session_id in self.active_sessions:
-                try:
-                    self.camera_monitor.stop()
-                except Exception as e:
-                    print(f"Erreur lors de l'arrêt du moniteur de caméra: {str(e)}")
-                # Les autres services ne sont pas démarrés, donc pas besoin de les arrêter.
-                
+            local = self.active_sessions.pop(session_id, None) is not None
+            if local:
+                self._stop_camera()
+            if local or released:
                 # Appel au microservice de sécurité pour arrêter la protection
                 try:
-                    response = requests.post(f"{SECURITY_MICROSERVICE_URL}/stop", timeout=5)
+                    response = _call_microservice("stop")
                     if response.status_code == 200:
                         print(f"[SECURITY] Microservice de sécurité arrêté avec succès pour la session {session_id}")
                     else:
@@ -96,25 +126,71 @@ class ExamSecurityService:
                     # On continue même si le microservice n'est pas disponible
                 
                 print(f"[SECURITY] Arrêt des services de sécurité pour la session {session_id}")
-                del self.active_sessions[session_id]
+
+    def _stop_camera(self):
+        if self._camera_monitor is None:
+            return
+        try:
+            self._camera_monitor.stop()
+        except Exception as e:
+            print(f"Erreur lors de l'arrêt du moniteur de caméra: {str(e)}")
+        # Les autres services ne sont pas démarrés, donc pas besoin de les arrêter.
     
+    def heartbeat(self, session_id: str) -> bool:
+        """Signale que le client de la session est toujours présent."""
+        return session_store.heartbeat(self.kind, session_id)
+
+    def stop_all(self) -> None:
+        """Arrête les sessions de ce worker (à l'arrêt de l'API)."""
+        with self._lock:
+            session_ids = list(self.active_sessions)
+            self.active_sessions.clear()
+            self._stop_camera()
+        for session_id in session_ids:
+            session_store.release(self.kind, session_id)
+
     def get_security_status(self, session_id: str) -> dict:
         """Retourne l'état actuel de la sécurité pour une session"""
         with self._lock:
-            if session_id not in self.active_sessions:
+            if session_id in self.active_sessions:
                 return {
-                    'active': False,
-                    'camera': False,
-                    'remote': False,
-                    'screen': False
+                    'active': True,
+                    **self._local_status()
                 }
-                
-            return {
-                'active': True,
-                'camera': self.camera_monitor.running,
-                'remote': True, 
-                'screen': True 
-            }
+
+        # Session exécutée par un autre worker : dernier état publié
+        record = session_store.get(self.kind, session_id)
+        if record is not None and record.is_live():
+            return {'active': True, 'camera': False, 'remote': True, 'screen': True, **record.status}
+        return {
+            'active': False,
+            'camera': False,
+            'remote': False,
+            'screen': False
+        }
+
+    def _local_status(self) -> dict:
+        return {
+            'camera': self._camera_monitor is not None and self._camera_monitor.running,
+            'remote': True, 
+            'screen': True 
+        }
+
+    # --- Suivi des baux (LeaseKeeper) ---
+
+    def local_statuses(self) -> dict:
+        with self._lock:
+            return {session_id: self._local_status() for session_id in self.active_sessions}
+
+    def stop_local(self, session_id: str) -> None:
+        with self._lock:
+            if self.active_sessions.pop(session_id, None) is not None:
+                self._stop_camera()
+
+    def adopt(self, record: SessionRecord) -> None:
+        # La protection (microservice) est déjà active : la session est simplement suivie ici
+        with self._lock:
+            self.active_sessions.setdefault(record.session_id, {'camera': False, 'remote': True, 'screen': True})
 
 # Instance globale du service de sécurité
 exam_security = ExamSecurityService()
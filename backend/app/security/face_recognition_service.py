@@ -1,15 +1,28 @@
 """
 Service de reconnaissance faciale pour la sécurité des examens.
 Permet de vérifier l'identité des étudiants pendant les examens.
+
+cv2, face_recognition (dlib) et la surveillance par caméra (DeepFace /
+TensorFlow) ne sont importés qu'à la première extraction de signatures ou au
+premier démarrage d'une surveillance : les workers qui ne servent que les
+connexions et les soumissions ne les chargent jamais.
 """
 import os
-import cv2
 import numpy as np
-import face_recognition
 from typing import List, Dict, Optional, Tuple
 import threading
 import time
-from .camera_monitor import CameraMonitor
+from app.core.config import settings
+from app.core.metrics import active_monitors, signature_extraction_image_duration
+from .monitor_board import monitor_board
+from .session_store import SessionRecord, lease_keeper, session_store
+from .status_timeline import StatusTimeline, save_timeline
+
+
+def safe_student_name(student_name: str) -> str:
+    """Nettoie le nom de l'étudiant pour correspondre au format du nom de fichier."""
+    return student_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
+
 
 class FaceRecognitionService:
     """Service de reconnaissance faciale pour les examens"""
@@ -18,14 +31,12 @@ class FaceRecognitionService:
         self.signatures_path = os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', 'signatures')
         self.active_monitors = {}
         self._lock = threading.Lock()
+        # Noms autorisés par examen, avec la date de modification du fichier lu
+        self._rosters: Dict[int, Tuple[float, frozenset]] = {}
         
         # Créer le répertoire de signatures s'il n'existe pas
         os.makedirs(self.signatures_path, exist_ok=True)
     
-    def _get_safe_student_name(self, student_name: str) -> str:
-        """Nettoie le nom de l'étudiant pour correspondre au format du nom de fichier."""
-        return student_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
-
     def get_signature_file_path(self, exam_id: int) -> str:
         """Retourne le chemin du fichier de signatures pour un examen donné."""
         # Correction du nom de fichier pour correspondre à ce qui est généré
@@ -37,6 +48,9 @@ class FaceRecognitionService:
         Le nom de l'étudiant est dérivé du nom du fichier image.
         Traite tous les fichiers d'images fournis et génère un fichier de signatures unique.
         """
+        import cv2
+        import face_recognition
+
         try:
             if not os.path.exists(images_folder):
                 print(f"Le dossier {images_folder} n'existe pas")
@@ -58,7 +72,7 @@ class FaceRecognitionService:
                         list_image.append(image)
                         # Extraction et nettoyage du nom pour correspondre à la logique de sauvegarde
                         nom_sans_ext = os.path.splitext(nom_fichier)[0]
-                        nom_nettoye = self._get_safe_student_name(nom_sans_ext)
+                        nom_nettoye = safe_student_name(nom_sans_ext)
                         list_nom.append(nom_nettoye)
                         processed_files.append(nom_fichier)
                         print(f"Fichier ajouté pour traitement: {nom_fichier}")
@@ -81,6 +95,7 @@ class FaceRecognitionService:
             successful_images = []
             
             for image, nom, fichier in zip(list_image, list_nom, processed_files):
+                debut = time.perf_counter()
                 try:
                     print(f"Traitement de l'image {compteur}/{len(list_image)}: {fichier}")
                     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -90,6 +105,7 @@ class FaceRecognitionService:
                     if not face_locations:
                         print(f"⚠️ Aucun visage détecté dans l'image {fichier}")
                         failed_images.append(fichier)
+                        signature_extraction_image_duration.observe(time.perf_counter() - debut, "no_face")
                         continue
                         
                     if len(face_locations) > 1:
@@ -99,6 +115,7 @@ class FaceRecognitionService:
                     encodage_list = encodage.tolist() + [nom]
                     liste_caracteristiques.append(encodage_list)
                     successful_images.append(fichier)
+                    signature_extraction_image_duration.observe(time.perf_counter() - debut, "ok")
                     
                     progression = (compteur / len(list_image)) * 100
                     print(f"Progression: {progression:.2f}% - Signature extraite pour {nom}")
@@ -107,6 +124,7 @@ class FaceRecognitionService:
                 except Exception as e:
                     print(f"❌ Erreur lors du traitement de l'image {fichier}: {str(e)}")
                     failed_images.append(fichier)
+                    signature_extraction_image_duration.observe(time.perf_counter() - debut, "error")
             
             if not liste_caracteristiques:
                 print("❌ Aucune caractéristique faciale n'a pu être extraite")
@@ -138,67 +156,189 @@ class FaceRecognitionService:
             print(f"Erreur lors de l'extraction des signatures: {str(e)}")
             return False
     
+    def _roster(self, exam_id: int) -> Optional[frozenset]:
+        """
+        Noms présents dans le fichier de signatures de l'examen. Le fichier n'est
+        relu que s'il a été modifié depuis la dernière lecture.
+        """
+        signature_file = self.get_signature_file_path(exam_id)
+        try:
+            mtime = os.stat(signature_file).st_mtime
+        except FileNotFoundError:
+            print(f"Aucune signature trouvée pour l'examen {exam_id}")
+            return None
+
+        cached = self._rosters.get(exam_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        signatures = np.load(signature_file, allow_pickle=True)
+        roster = frozenset(str(name) for name in signatures[:, -1])
+        self._rosters[exam_id] = (mtime, roster)
+        return roster
+
     def verify_student(self, exam_id: int, student_name: str) -> bool:
         """
         Vérifie si un étudiant est autorisé à passer un examen
         en comparant son nom avec les signatures enregistrées
         """
         try:
-            signature_file = self.get_signature_file_path(exam_id)
-            
-            if not os.path.exists(signature_file):
-                print(f"Aucune signature trouvée pour l'examen {exam_id}")
-                return False
-                
-            signatures = np.load(signature_file, allow_pickle=True)
-            noms = signatures[:, -1]
-            
+            roster = self._roster(exam_id)
             # Vérifier si le nom de l'étudiant est dans la liste
-            return student_name in noms
+            return roster is not None and student_name in roster
             
         except Exception as e:
             print(f"Erreur lors de la vérification de l'étudiant: {str(e)}")
             return False
     
+    kind = "monitor"
+
+    def _create_monitor(self, session_id: str):
+        if settings.PROCTORING_MODE == "process":
+            # Capture dans l'API, analyse dans le pool de workers dédiés
+            from .proctoring_workers import RemoteCameraMonitor
+            return RemoteCameraMonitor(session_id)
+        from .camera_monitor import CameraMonitor
+        return CameraMonitor()
+
+    def _start_local(self, session_id: str, exam_id: int, student_name: str) -> Optional[str]:
+        """
+        Démarre le moniteur d'une session dont ce worker détient le bail. En cas
+        d'échec (dépendances absentes, mémoire partagée indisponible...), le
+        moniteur est retiré, le bail libéré et la raison retournée.
+        """
+        # Appelé avec self._lock
+        try:
+            monitor = self._create_monitor(session_id)
+            self.active_monitors[session_id] = monitor
+            # Le démarrage du moniteur se fait dans un thread séparé
+            monitor.start(exam_id=exam_id, student_name=student_name)
+        except Exception as e:
+            print(f"Échec du démarrage de la surveillance pour la session {session_id}: {e}")
+            monitor = self.active_monitors.pop(session_id, None)
+            if monitor is not None:
+                monitor.stop()
+            session_store.release(self.kind, session_id)
+            return f"Impossible de démarrer la surveillance: {e}"
+        lease_keeper.register(self)
+        monitor_board.register(self)
+        return None
+
     def start_monitoring(self, session_id: str, exam_id: int, student_name: str) -> bool:
-        """Démarre un CameraMonitor pour une session d'examen spécifique."""
+        """
+        Démarre un CameraMonitor pour une session d'examen spécifique. Le worker
+        qui prend le bail de la session exécute la surveillance.
+        """
+        return self.try_start_monitoring(session_id, exam_id, student_name) is None
+
+    def try_start_monitoring(self, session_id: str, exam_id: int, student_name: str) -> Optional[str]:
+        """Comme start_monitoring, mais retourne la raison de l'échec (None si la surveillance tourne)."""
         with self._lock:
             if session_id in self.active_monitors:
                 print(f"Le moniteur pour la session {session_id} est déjà actif.")
-                return True
+                return None
+
+            data = {"exam_id": exam_id, "student_name": student_name}
+            if not session_store.claim(self.kind, session_id, data, touch=True):
+                # Aucun moniteur local : le bail est détenu par un autre worker encore actif
+                print(f"Le moniteur pour la session {session_id} est déjà actif sur un autre worker.")
+                return "La surveillance de cette session est déjà active sur un autre worker."
 
             print(f"Démarrage de la surveillance pour la session {session_id}...")
-            monitor = CameraMonitor()
-            self.active_monitors[session_id] = monitor
-            
-            # Le démarrage du moniteur se fait dans un thread séparé
-            monitor.start(exam_id=exam_id, student_name=student_name)
-            return True
+            return self._start_local(session_id, exam_id, student_name)
     
+    def _finish(self, session_id: str, monitor) -> None:
+        """Arrête un moniteur retiré de active_monitors et écrit son historique en base."""
+        monitor.stop()
+        if monitor.timeline is not None:
+            save_timeline(monitor.timeline, session_id, monitor.exam_id, monitor.student_name)
+
     def stop_monitoring(self, session_id: str) -> bool:
-        """Arrête le CameraMonitor pour une session donnée."""
+        """
+        Arrête le CameraMonitor pour une session donnée. Si la surveillance tourne
+        sur un autre worker, celui-ci l'arrête au prochain renouvellement de bail.
+        """
+        released = session_store.release(self.kind, session_id)
         with self._lock:
-            if session_id in self.active_monitors:
-                print(f"Arrêt de la surveillance pour la session {session_id}.")
-                monitor = self.active_monitors.pop(session_id)
-                monitor.stop()
-                return True
-            print(f"Aucun moniteur actif trouvé pour la session {session_id}.")
-            return False
+            monitor = self.active_monitors.pop(session_id, None)
+        if monitor is not None:
+            print(f"Arrêt de la surveillance pour la session {session_id}.")
+            self._finish(session_id, monitor)
+            return True
+        if released:
+            print(f"Arrêt demandé pour la session {session_id} (surveillance sur un autre worker).")
+            return True
+        print(f"Aucun moniteur actif trouvé pour la session {session_id}.")
+        return False
+    
+    def heartbeat(self, session_id: str) -> bool:
+        """Signale que le client de la session est toujours présent. Faux si la session est inconnue."""
+        return session_store.heartbeat(self.kind, session_id)
+    
+    def stop_all_monitoring(self) -> None:
+        """Arrête toutes les surveillances de ce worker (à l'arrêt de l'API)."""
+        with self._lock:
+            monitors = dict(self.active_monitors)
+            self.active_monitors.clear()
+        for session_id, monitor in monitors.items():
+            session_store.release(self.kind, session_id)
+            try:
+                self._finish(session_id, monitor)
+            except Exception as e:
+                print(f"Erreur lors de l'arrêt d'un moniteur: {str(e)}")
     
+    def get_timeline(self, session_id: str) -> Optional[StatusTimeline]:
+        """Historique en mémoire d'une surveillance exécutée par ce worker, ou None."""
+        with self._lock:
+            monitor = self.active_monitors.get(session_id)
+        return monitor.timeline if monitor is not None else None
+
     def get_monitoring_status(self, session_id: str) -> Dict:
         """Récupère le statut du CameraMonitor pour une session donnée."""
         with self._lock:
-            if session_id in self.active_monitors:
-                monitor = self.active_monitors[session_id]
-                return monitor.get_status()
-            return {
-                'running': False, 
-                'face_status': 'inactive', 
-                'identity_confirmed': False, 
-                'emotion': 'unknown',
-                'detected_objects': []
-            }
+            monitor = self.active_monitors.get(session_id)
+        if monitor is not None:
+            return monitor.get_status()
+
+        # Surveillance exécutée par un autre worker : dernier état publié
+        record = session_store.get(self.kind, session_id)
+        if record is not None and record.is_live():
+            return {'running': True, 'face_status': 'pending', 'identity_confirmed': False,
+                    'emotion': 'unknown', 'detected_objects': [], **record.status}
+        return {
+            'running': False, 
+            'face_status': 'inactive', 
+            'identity_confirmed': False, 
+            'emotion': 'unknown',
+            'detected_objects': []
+        }
+
+    def board_entries(self) -> Dict[str, Tuple[int, Dict]]:
+        """(examen, état) des surveillances de ce worker, pour le tableau des surveillants."""
+        with self._lock:
+            monitors = dict(self.active_monitors)
+        return {session_id: (monitor.exam_id, monitor.get_status()) for session_id, monitor in monitors.items()}
+
+    # --- Suivi des baux (LeaseKeeper) ---
+
+    def local_statuses(self) -> Dict[str, Dict]:
+        with self._lock:
+            monitors = dict(self.active_monitors)
+        return {session_id: monitor.get_status() for session_id, monitor in monitors.items()}
+
+    def stop_local(self, session_id: str) -> None:
+        with self._lock:
+            monitor = self.active_monitors.pop(session_id, None)
+        if monitor is not None:
+            self._finish(session_id, monitor)
+
+    def adopt(self, record: SessionRecord) -> None:
+        with self._lock:
+            if record.session_id not in self.active_monitors:
+                # En cas d'échec, le bail est libéré : la session n'apparaît plus active
+                self._start_local(record.session_id, record.data["exam_id"], record.data["student_name"])
+
 # Créer une instance unique du service de reconnaissance faciale
 face_recognition_service = FaceRecognitionService()
+active_monitors.set_function(lambda: len(face_recognition_service.active_monitors))
 
@@ -0,0 +1,107 @@
+"""
+Capture de la caméra découplée de l'analyse.
+
+Lire la caméra dans la boucle d'analyse, avec une pause entre deux images,
+laisse les images s'accumuler dans le tampon interne d'OpenCV : l'image
+analysée a souvent plusieurs images de retard, et une analyse lente ralentit
+la capture. Ici, un thread de capture lit la caméra en continu et publie
+chaque image dans LatestFrameBuffer ; l'analyse prend toujours la plus
+récente, sans copie.
+
+Le tampon compte trois emplacements préalloués (remplis en place par
+cap.read) : la dernière image publiée, celle en cours d'analyse et celle en
+cours de capture. Ni la capture ni l'analyse n'attendent l'autre ; avec deux
+emplacements seulement, la capture devrait attendre la fin de l'analyse ou
+copier l'image.
+"""
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+_SLOTS = 3
+
+
+class LatestFrameBuffer:
+    def __init__(self):
+        self._frames: List[Optional[np.ndarray]] = [None] * _SLOTS
+        self._seqs = [0] * _SLOTS
+        self._captured_at = [0.0] * _SLOTS
+        self._latest: Optional[int] = None
+        self._reading: Optional[int] = None
+        self._seq = 0
+        self._ready = threading.Condition()
+
+    @property
+    def latest_seq(self) -> int:
+        return self._seq
+
+    def write_slot(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Emplacement libre pour la prochaine capture et son tableau préalloué (None au départ)."""
+        with self._ready:
+            slot = next(i for i in range(_SLOTS) if i != self._latest and i != self._reading)
+            return slot, self._frames[slot]
+
+    def publish(self, slot: int, frame: np.ndarray, captured_at: float) -> None:
+        """Publie l'image écrite dans `slot` (horodatage time.monotonic() de la capture)."""
+        with self._ready:
+            self._seq += 1
+            self._frames[slot] = frame
+            self._seqs[slot] = self._seq
+            self._captured_at[slot] = captured_at
+            self._latest = slot
+            self._ready.notify_all()
+
+    def acquire(self, after_seq: int, timeout: float) -> Optional[Tuple[int, np.ndarray, float]]:
+        """
+        Image la plus récente postérieure à `after_seq` : (séquence, image,
+        horodatage de capture), ou None après `timeout` secondes. L'image reste
+        réservée, sans être réécrite, jusqu'à release().
+        """
+        with self._ready:
+            if not self._ready.wait_for(
+                lambda: self._latest is not None and self._seqs[self._latest] > after_seq, timeout
+            ):
+                return None
+            self._reading = slot = self._latest
+            return self._seqs[slot], self._frames[slot], self._captured_at[slot]
+
+    def release(self) -> None:
+        with self._ready:
+            self._reading = None
+
+
+class FrameGrabber:
+    """Thread qui lit la caméra `cap` en continu et publie chaque image dans `buffer`."""
+
+    def __init__(self, cap, buffer: LatestFrameBuffer):
+        self.cap = cap
+        self.buffer = buffer
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        failures = 0
+        while self.running:
+            slot, target = self.buffer.write_slot()
+            ret, frame = self.cap.read(target) if target is not None else self.cap.read()
+            if not ret:
+                # Caméra momentanément indisponible : ne pas boucler à vide
+                failures += 1
+                time.sleep(min(0.5, 0.01 * failures))
+                continue
+            failures = 0
+            self.buffer.publish(slot, frame, time.monotonic())
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """Arrête la capture ; la caméra peut ensuite être libérée."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
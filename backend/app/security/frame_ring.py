@@ -0,0 +1,133 @@
+"""
+Tampon circulaire d'images en mémoire partagée (multiprocessing.shared_memory).
+
+Un producteur unique (la capture, dans le processus de l'API) écrit les
+images dans des emplacements fixes ; un consommateur (un worker de
+surveillance) lit la plus récente sans copie intermédiaire par pickle ni
+passage par un tube. Chaque emplacement porte un numéro de séquence, mis à -1
+pendant l'écriture puis au numéro de l'image : le lecteur vérifie ce numéro
+avant et après la copie et ignore une image réécrite entre-temps.
+
+Chaque emplacement conserve aussi l'instant de capture (time.monotonic(),
+commun aux processus d'une même machine) pour mesurer le délai entre la
+capture et l'analyse.
+
+Disposition du segment : [séquence courante (64 octets)][en-têtes des
+emplacements][données des emplacements].
+"""
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+HEAD_BYTES = 64
+SLOT_HEADER = np.dtype([
+    ("seq", np.int64),
+    ("captured_at", np.float64),
+    ("height", np.int32),
+    ("width", np.int32),
+    ("channels", np.int32),
+    ("nbytes", np.int32),
+])
+
+
+class FrameRing:
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, slot_bytes: int, owner: bool):
+        self._shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._owner = owner
+        buffer = shm.buf
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=0)
+        self._headers = np.ndarray((slots,), dtype=SLOT_HEADER, buffer=buffer, offset=HEAD_BYTES)
+        data_offset = HEAD_BYTES + slots * SLOT_HEADER.itemsize
+        self._data = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=buffer, offset=data_offset)
+
+    @staticmethod
+    def _size(slots: int, slot_bytes: int) -> int:
+        return HEAD_BYTES + slots * (SLOT_HEADER.itemsize + slot_bytes)
+
+    @classmethod
+    def create(cls, slots: int, slot_bytes: int) -> "FrameRing":
+        """Crée le segment (côté producteur, qui le supprimera à la fermeture)."""
+        shm = shared_memory.SharedMemory(create=True, size=cls._size(slots, slot_bytes))
+        ring = cls(shm, slots, slot_bytes, owner=True)
+        ring._head[0] = 0
+        ring._headers["seq"] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_bytes: int) -> "FrameRing":
+        """
+        Ouvre un segment existant (côté consommateur). Le consommateur doit être
+        lancé par le producteur (spawn) : il partage alors son resource_tracker
+        et ne supprime pas le segment en s'arrêtant.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, slot_bytes, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._head[0])
+
+    def write(self, frame: np.ndarray, captured_at: Optional[float] = None) -> int:
+        """
+        Copie une image (uint8, HxW ou HxWxC) dans l'emplacement suivant. Retourne sa séquence.
+        `captured_at` : instant de capture (time.monotonic()), maintenant par défaut.
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Image de {frame.nbytes} octets, emplacement de {self.slot_bytes} octets")
+
+        seq = int(self._head[0]) + 1
+        slot = seq % self.slots
+        header = self._headers[slot]
+        header["seq"] = -1
+        self._data[slot, :frame.nbytes] = frame.reshape(-1)
+        header["height"] = frame.shape[0]
+        header["width"] = frame.shape[1]
+        header["channels"] = frame.shape[2] if frame.ndim == 3 else 0
+        header["nbytes"] = frame.nbytes
+        header["captured_at"] = captured_at if captured_at is not None else time.monotonic()
+        header["seq"] = seq
+        self._head[0] = seq
+        return seq
+
+    def read_latest(self, after_seq: int = 0) -> Optional[Tuple[int, np.ndarray, float]]:
+        """
+        (séquence, copie de l'image, instant de capture) de l'image la plus
+        récente si elle est plus récente que `after_seq`, sinon None.
+        """
+        seq = int(self._head[0])
+        if seq <= after_seq:
+            return None
+
+        slot = seq % self.slots
+        header = self._headers[slot].copy()
+        if header["seq"] != seq:
+            return None
+        shape = (int(header["height"]), int(header["width"]))
+        if header["channels"]:
+            shape += (int(header["channels"]),)
+        frame = self._data[slot, :int(header["nbytes"])].copy().reshape(shape)
+
+        # Emplacement réécrit pendant la copie : l'image est incohérente
+        if self._headers[slot]["seq"] != seq:
+            return None
+        return seq, frame, float(header["captured_at"])
+
+    def close(self) -> None:
+        """Détache le segment ; le producteur le supprime également."""
+        # Les vues numpy doivent disparaître avant la fermeture du segment
+        del self._head, self._headers, self._data
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,202 @@
+"""
+Tableau des états de surveillance par examen, pour les surveillants.
+
+Un thread relève périodiquement l'état des surveillances de ce worker (et,
+toutes les SESSION_LEASE_RENEW_INTERVAL secondes, celles publiées par les
+autres workers dans le magasin de sessions) et le compare au précédent. Pour
+chaque examen, le tableau est un dictionnaire remplacé à chaque changement et
+jamais modifié sur place : la lecture d'un examen complet ne prend aucun
+verrou et ne touche pas aux moniteurs.
+
+Seuls les changements de face_status, identity_confirmed ou emotion sont
+diffusés aux abonnés (flux SSE). Chaque abonné accumule les changements en
+attente par session : un client lent ne reçoit que le dernier état de chaque
+session, en un seul événement.
+"""
+import asyncio
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Protocol, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import monitor_feed_subscribers
+from .session_store import WORKER_ID, session_store
+
+TRACKED_FIELDS = ("face_status", "identity_confirmed", "emotion")
+
+_EMPTY: Mapping[str, dict] = MappingProxyType({})
+
+
+class BoardSource(Protocol):
+    """Service dont les surveillances locales alimentent le tableau."""
+    kind: str
+
+    def board_entries(self) -> Dict[str, Tuple[int, dict]]: ...
+
+
+def _entry(session_id: str, status: dict, now: float) -> dict:
+    return {
+        "session_id": session_id,
+        "running": status.get("running", True),
+        "face_status": status.get("face_status", "pending"),
+        "identity_confirmed": status.get("identity_confirmed", False),
+        "emotion": status.get("emotion", "unknown"),
+        "updated_at": now,
+    }
+
+
+class BoardSubscription:
+    """Changements en attente pour un abonné, regroupés par session."""
+
+    def __init__(self, exam_id: int, loop: asyncio.AbstractEventLoop):
+        self.exam_id = exam_id
+        self._loop = loop
+        self._pending: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._event = asyncio.Event()
+
+    def push(self, changes: Dict[str, dict]) -> None:
+        # Appelé depuis le thread du tableau
+        with self._lock:
+            self._pending.update(changes)
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Boucle fermée : l'abonné est en cours de désinscription
+            pass
+
+    async def next_changes(self, timeout: float) -> List[dict]:
+        """Changements accumulés depuis le dernier appel ; liste vide après `timeout` secondes sans changement."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._event.clear()
+        with self._lock:
+            changes, self._pending = self._pending, {}
+        return list(changes.values())
+
+
+class MonitorBoard:
+    def __init__(self):
+        self._sources: List[BoardSource] = []
+        # exam_id -> (version, {session_id: état}) ; remplacé, jamais modifié
+        self._exams: Dict[int, Tuple[int, Mapping[str, dict]]] = {}
+        self._session_exams: Dict[str, int] = {}
+        # Par type de session : états publiés par les autres workers et date de leur lecture
+        self._remote: Dict[str, Dict[str, Tuple[int, dict]]] = {}
+        self._remote_read_at: Dict[str, float] = {}
+        self._subscribers: Dict[int, Set[BoardSubscription]] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, source: BoardSource) -> None:
+        with self._lock:
+            if source not in self._sources:
+                self._sources.append(source)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="monitor-board", daemon=True)
+                self._thread.start()
+
+    def snapshot(self, exam_id: int) -> Tuple[int, Mapping[str, dict]]:
+        """(version, états par session) de l'examen, sans verrou."""
+        return self._exams.get(exam_id, (0, _EMPTY))
+
+    def subscribe(self, exam_id: int) -> BoardSubscription:
+        """À appeler depuis la boucle asyncio qui consommera les changements."""
+        subscription = BoardSubscription(exam_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[exam_id] = self._subscribers.get(exam_id, set()) | {subscription}
+        return subscription
+
+    def unsubscribe(self, subscription: BoardSubscription) -> None:
+        with self._lock:
+            remaining = self._subscribers.get(subscription.exam_id, set()) - {subscription}
+            if remaining:
+                self._subscribers[subscription.exam_id] = remaining
+            else:
+                self._subscribers.pop(subscription.exam_id, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _collect(self, source: BoardSource, now: float) -> Dict[str, Tuple[int, dict]]:
+        entries = source.board_entries()
+        # Les autres workers ne publient leur état qu'au renouvellement des baux
+        if now - self._remote_read_at.get(source.kind, 0.0) >= settings.SESSION_LEASE_RENEW_INTERVAL:
+            self._remote_read_at[source.kind] = now
+            self._remote[source.kind] = {
+                record.session_id: (record.data["exam_id"], record.status)
+                for record in session_store.live(source.kind)
+                if record.owner != WORKER_ID
+            }
+        for session_id, remote in self._remote[source.kind].items():
+            entries.setdefault(session_id, remote)
+        return entries
+
+    def tick(self) -> None:
+        """Relève les états, met à jour le tableau et notifie les abonnés des changements."""
+        with self._lock:
+            sources = list(self._sources)
+        now = time.time()
+        current: Dict[str, Tuple[int, dict]] = {}
+        for source in sources:
+            current.update(self._collect(source, now))
+
+        changes: Dict[int, Dict[str, dict]] = {}
+        for session_id, (exam_id, status) in current.items():
+            previous = self.snapshot(exam_id)[1].get(session_id)
+            entry = _entry(session_id, status, now)
+            if previous is None or any(previous[f] != entry[f] for f in TRACKED_FIELDS + ("running",)):
+                changes.setdefault(exam_id, {})[session_id] = entry
+        for session_id, exam_id in self._session_exams.items():
+            if session_id not in current:
+                changes.setdefault(exam_id, {})[session_id] = {
+                    **_entry(session_id, {"running": False, "face_status": "inactive"}, now),
+                    "removed": True,
+                }
+        if not changes:
+            return
+
+        with self._lock:
+            self.version += 1
+            for exam_id, exam_changes in changes.items():
+                sessions = dict(self.snapshot(exam_id)[1])
+                for session_id, entry in exam_changes.items():
+                    if entry.get("removed"):
+                        sessions.pop(session_id, None)
+                        self._session_exams.pop(session_id, None)
+                    else:
+                        sessions[session_id] = entry
+                        self._session_exams[session_id] = exam_id
+                if sessions:
+                    self._exams[exam_id] = (self.version, MappingProxyType(sessions))
+                else:
+                    self._exams.pop(exam_id, None)
+            subscribers = {exam_id: set(self._subscribers.get(exam_id, ())) for exam_id in changes}
+
+        for exam_id, exam_subscribers in subscribers.items():
+            for subscription in exam_subscribers:
+                subscription.push(changes[exam_id])
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.MONITOR_BOARD_INTERVAL):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[MONITOR] Erreur lors de la mise à jour du tableau de surveillance: {e}")
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=2)
+
+
+monitor_board = MonitorBoard()
+monitor_feed_subscribers.set_function(monitor_board.subscriber_count)
@@ -0,0 +1,407 @@
+"""
+Analyse des images de surveillance dans un groupe de processus dédiés.
+
+La reconnaissance faciale (dlib) et l'analyse d'émotions (TensorFlow) sont
+coûteuses en CPU : exécutées dans des threads de l'API, elles se disputent le
+GIL avec le traitement des requêtes. Ici, le processus de l'API ne fait que
+capturer les images et les déposer dans un tampon circulaire en mémoire
+partagée (FrameRing), un par session ; un pool de PROCTORING_WORKERS processus
+lit ces images, les analyse et renvoie l'état de chaque session par un tube.
+
+La caméra est lue en continu par un thread de capture (FrameGrabber) : seule
+l'image la plus récente est déposée dans le tampon, toutes les
+PROCTORING_CAPTURE_INTERVAL secondes.
+
+Chaque worker a ses propres tubes de commandes et d'états. Un thread de l'API
+reçoit les états et surveille les workers : un worker arrêté de façon
+inattendue (plantage de dlib, mémoire...) est relancé et ses sessions lui sont
+réattribuées, sans effet sur le reste de l'API (soumissions, connexions).
+
+Le tampon étant en mémoire partagée, les workers tournent sur la même machine
+que l'API ; leur nombre est indépendant de celui des workers de l'API.
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import camera_frame_age, proctoring_frame_duration, proctoring_worker_restarts
+from app.security.frame_grabber import FrameGrabber, LatestFrameBuffer
+from app.security.frame_ring import FrameRing
+from app.security.status_timeline import StatusTimeline
+
+_mp = multiprocessing.get_context("spawn")
+
+# Délai minimal entre deux redémarrages d'un même worker
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+# --- Côté worker -------------------------------------------------------------
+
+class _WorkerSession:
+    __slots__ = ("ring", "monitor", "last_seq")
+
+    def __init__(self, ring: FrameRing, monitor):
+        self.ring = ring
+        self.monitor = monitor
+        # Seules les images déposées après l'attachement sont analysées : après un
+        # redémarrage, l'image qui a fait tomber le worker n'est pas relue
+        self.last_seq = ring.latest_seq
+
+
+def _attach(sessions: Dict[str, _WorkerSession], statuses: Connection, message: tuple) -> None:
+    """
+    Prend en charge une session. En cas d'échec (dépendances absentes, tampon
+    disparu, signatures introuvables), un état d'erreur est renvoyé avec
+    attached=False : l'API retire la session du worker et ne la renverra pas
+    au redémarrage.
+    """
+    _, session_id, shm_name, slots, slot_bytes, exam_id, student_name = message
+    try:
+        from app.security.camera_monitor import CameraMonitor
+
+        monitor = CameraMonitor()
+        monitor.exam_id = exam_id
+        monitor.student_name = student_name
+        if not monitor.load_signatures():
+            statuses.send((session_id, monitor.get_status(), 0.0, None, False))
+            return
+        sessions[session_id] = _WorkerSession(FrameRing.attach(shm_name, slots, slot_bytes), monitor)
+    except Exception as e:
+        print(f"[PROCTORING] Impossible de prendre en charge la session {session_id}: {e}")
+        statuses.send((session_id, {
+            "face_status": "error_attach",
+            "identity_confirmed": False,
+            "emotion": "unknown",
+            "detected_objects": []
+        }, 0.0, None, False))
+
+
+def _detach(sessions: Dict[str, _WorkerSession], session_id: str) -> None:
+    session = sessions.pop(session_id, None)
+    if session is not None:
+        session.ring.close()
+
+
+def _analyze(session_id: str, session: _WorkerSession, statuses: Connection) -> bool:
+    """Analyse la dernière image de la session si elle est nouvelle. Vrai si une image a été traitée."""
+    latest = session.ring.read_latest(session.last_seq)
+    if latest is None:
+        return False
+    session.last_seq, frame, captured_at = latest
+
+    frame_age = time.monotonic() - captured_at
+    start = time.perf_counter()
+    try:
+        session.monitor.analyze_frame(frame)
+    except Exception as e:
+        print(f"[PROCTORING] Erreur d'analyse pour la session {session_id}: {e}")
+        session.monitor.face_status = "error_analysis"
+    statuses.send((session_id, session.monitor.get_status(), time.perf_counter() - start, frame_age, True))
+    return True
+
+
+def _worker_main(commands: Connection, statuses: Connection) -> None:
+    """Boucle d'un worker : commandes attach/detach/stop et analyse des images."""
+    sessions: Dict[str, _WorkerSession] = {}
+    try:
+        while True:
+            # Sans session, le worker attend simplement une commande
+            while commands.poll(0 if sessions else 0.5):
+                message = commands.recv()
+                if message[0] == "stop":
+                    return
+                if message[0] == "attach":
+                    _attach(sessions, statuses, message)
+                elif message[0] == "detach":
+                    _detach(sessions, message[1])
+
+            processed = False
+            for session_id, session in list(sessions.items()):
+                processed = _analyze(session_id, session, statuses) or processed
+            if sessions and not processed:
+                time.sleep(settings.PROCTORING_POLL_INTERVAL)
+    except (EOFError, BrokenPipeError, KeyboardInterrupt):
+        # Processus de l'API arrêté
+        pass
+    finally:
+        for session_id in list(sessions):
+            _detach(sessions, session_id)
+
+
+# --- Côté API ----------------------------------------------------------------
+
+class _WorkerHandle:
+    def __init__(self, index: int):
+        self.index = index
+        self.sessions: Dict[str, tuple] = {}  # session_id -> message attach
+        self.send_lock = threading.Lock()
+        self._spawn()
+
+    def _spawn(self) -> None:
+        self.started_at = time.monotonic()
+        command_reader, self.commands = _mp.Pipe(duplex=False)
+        self.statuses, status_writer = _mp.Pipe(duplex=False)
+        self.process = _mp.Process(
+            target=_worker_main,
+            args=(command_reader, status_writer),
+            name=f"proctoring-worker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        # Les extrémités du worker ne doivent rester ouvertes que dans le worker
+        command_reader.close()
+        status_writer.close()
+
+    def _send(self, message: tuple) -> None:
+        # Appelé avec send_lock
+        try:
+            self.commands.send(message)
+        except (BrokenPipeError, OSError):
+            # Worker arrêté : la supervision le relance avec ses sessions
+            pass
+
+    def send(self, message: tuple) -> None:
+        with self.send_lock:
+            self._send(message)
+
+    def restart(self) -> None:
+        with self.send_lock:
+            self.commands.close()
+            self.statuses.close()
+            self._spawn()
+            for message in self.sessions.values():
+                self._send(message)
+
+
+class ProctoringPool:
+    def __init__(self):
+        self._workers: List[_WorkerHandle] = []
+        self._statuses: Dict[str, dict] = {}
+        self._listeners: Dict[str, Callable[[dict], None]] = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._supervisor: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        # Appelé avec self._lock : les workers ne sont lancés qu'à la première session
+        if self._running:
+            return
+        self._workers = [_WorkerHandle(index) for index in range(max(1, settings.PROCTORING_WORKERS))]
+        self._running = True
+        self._supervisor = threading.Thread(target=self._supervise, name="proctoring-supervisor", daemon=True)
+        self._supervisor.start()
+        print(f"[PROCTORING] {len(self._workers)} workers de surveillance démarrés")
+
+    def attach(
+        self,
+        session_id: str,
+        ring: FrameRing,
+        exam_id: int,
+        student_name: str,
+        on_status: Optional[Callable[[dict], None]] = None
+    ) -> None:
+        """
+        Confie l'analyse des images de `ring` au worker le moins chargé.
+        `on_status` est appelé (thread de supervision) à chaque état reçu.
+        """
+        message = ("attach", session_id, ring.name, ring.slots, ring.slot_bytes, exam_id, student_name)
+        with self._lock:
+            self._ensure_started()
+            worker = min(self._workers, key=lambda w: len(w.sessions))
+            worker.sessions[session_id] = message
+            self._statuses.pop(session_id, None)
+            if on_status is not None:
+                self._listeners[session_id] = on_status
+        worker.send(message)
+
+    def detach(self, session_id: str) -> None:
+        with self._lock:
+            self._statuses.pop(session_id, None)
+            self._listeners.pop(session_id, None)
+            worker = next((w for w in self._workers if session_id in w.sessions), None)
+            if worker is None:
+                return
+            del worker.sessions[session_id]
+        worker.send(("detach", session_id))
+
+    def status(self, session_id: str) -> Optional[dict]:
+        """Dernier état reçu d'un worker pour la session, ou None."""
+        with self._lock:
+            return self._statuses.get(session_id)
+
+    def _receive(self, connection: Connection) -> bool:
+        """Traite un état reçu d'un worker. Faux si le tube est fermé (worker arrêté)."""
+        try:
+            session_id, status, duration, frame_age, attached = connection.recv()
+        except (EOFError, OSError):
+            # Fin du tube : le worker s'est arrêté, la supervision s'en charge
+            return False
+        if duration:
+            proctoring_frame_duration.observe(duration)
+        if frame_age is not None:
+            camera_frame_age.observe(frame_age, "process")
+        with self._lock:
+            worker = next((w for w in self._workers if session_id in w.sessions), None)
+            if worker is None:
+                return True
+            if not attached:
+                # Session refusée par le worker : ne pas la lui renvoyer à son redémarrage
+                del worker.sessions[session_id]
+            self._statuses[session_id] = status
+            listener = self._listeners.get(session_id)
+        if listener is not None:
+            try:
+                listener(status)
+            except Exception as e:
+                print(f"[PROCTORING] Erreur lors du traitement de l'état de la session {session_id}: {e}")
+        return True
+
+    def _supervise(self) -> None:
+        # Tubes arrivés en fin de fichier : toujours « prêts » pour wait(), ils
+        # en sont exclus jusqu'au redémarrage du worker pour ne pas boucler à vide
+        finished: Set[Connection] = set()
+        while self._running:
+            # Une erreur imprévue (redémarrage impossible, tube corrompu...) ne
+            # doit pas arrêter la supervision : les états ne seraient plus reçus
+            try:
+                self._supervise_once(finished)
+            except Exception as e:
+                print(f"[PROCTORING] Erreur de supervision des workers: {e}")
+                time.sleep(0.5)
+
+    def _supervise_once(self, finished: Set[Connection]) -> None:
+        with self._lock:
+            workers = list(self._workers)
+        connections = [w.statuses for w in workers if not w.statuses.closed and w.statuses not in finished]
+        ready = wait(connections, timeout=0.5)
+        for connection in ready:
+            if not self._receive(connection):
+                finished.add(connection)
+
+        for worker in workers:
+            if not self._running or worker.process.is_alive():
+                continue
+            if time.monotonic() - worker.started_at >= RESTART_BACKOFF_SECONDS:
+                print(f"[PROCTORING] Worker {worker.index} arrêté (code {worker.process.exitcode}), redémarrage")
+                proctoring_worker_restarts.inc()
+                with self._lock:
+                    finished.discard(worker.statuses)
+                    worker.restart()
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        """Arrête les workers (à l'arrêt de l'API)."""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            workers = list(self._workers)
+        for worker in workers:
+            worker.send(("stop",))
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=timeout)
+        for worker in workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+
+proctoring_pool = ProctoringPool()
+
+
+class RemoteCameraMonitor:
+    """
+    Même interface que CameraMonitor (start/stop/get_status) : capture la caméra
+    dans le processus de l'API et délègue l'analyse au pool de workers.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.exam_id: Optional[int] = None
+        self.student_name: Optional[str] = None
+        self.timeline: Optional[StatusTimeline] = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.cap = None
+        self.frames = LatestFrameBuffer()
+        self.grabber: Optional[FrameGrabber] = None
+        self.ring: Optional[FrameRing] = None
+        self.face_status = "pending"
+
+    def initialize_camera(self) -> bool:
+        import cv2
+
+        # Essayer plusieurs index de caméra si celui par défaut échoue
+        for i in range(2, -1, -1):
+            self.cap = cv2.VideoCapture(i)
+            if self.cap.isOpened():
+                print(f"Caméra initialisée avec l'index {i}")
+                return True
+        print("ERREUR: Impossible d'ouvrir la caméra.")
+        self.face_status = "error_no_camera"
+        return False
+
+    def capture_loop(self) -> None:
+        if not self.initialize_camera():
+            self.running = False
+            return
+        self.grabber = FrameGrabber(self.cap, self.frames)
+        self.grabber.start()
+        last_seq = 0
+        while self.running:
+            started = time.monotonic()
+            latest = self.frames.acquire(last_seq, timeout=1.0)
+            if latest is None:
+                continue
+            last_seq, frame, captured_at = latest
+            try:
+                self.ring.write(frame, captured_at)
+            except ValueError as e:
+                print(f"[PROCTORING] Image ignorée: {e}")
+            finally:
+                self.frames.release()
+            time.sleep(max(0.0, settings.PROCTORING_CAPTURE_INTERVAL - (time.monotonic() - started)))
+
+    def start(self, exam_id: int, student_name: str) -> None:
+        if self.running:
+            return
+        self.exam_id = exam_id
+        self.student_name = student_name
+        self.timeline = StatusTimeline()
+        self.ring = FrameRing.create(settings.PROCTORING_RING_SLOTS, settings.PROCTORING_FRAME_MAX_BYTES)
+        proctoring_pool.attach(self.session_id, self.ring, exam_id, student_name, on_status=self._record)
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self.thread.start()
+        print(f"Capture démarrée pour l'examen {exam_id}, étudiant {student_name} (analyse hors processus).")
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+            self.thread = None
+        # La capture doit être arrêtée avant de libérer la caméra
+        if self.grabber:
+            self.grabber.stop()
+            self.grabber = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+        proctoring_pool.detach(self.session_id)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def _record(self, status: dict) -> None:
+        self.timeline.record(status.get("face_status"), status.get("emotion"), status.get("identity_confirmed", False))
+
+    def get_status(self) -> dict:
+        status = proctoring_pool.status(self.session_id) or {
+            "face_status": self.face_status,
+            "identity_confirmed": False,
+            "emotion": "unknown",
+            "detected_objects": []
+        }
+        return {**status, "running": self.running}
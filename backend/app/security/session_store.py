@@ -0,0 +1,369 @@
+"""
+État partagé des sessions de surveillance, avec baux de propriété.
+
+Les surveillances caméra et les sessions de sécurité tournent dans le
+processus (worker uvicorn) qui les a démarrées. Pour que start/stop/status
+fonctionnent quel que soit le worker qui reçoit la requête, chaque session est
+enregistrée dans un magasin commun, sous la clé (type, identifiant) : une
+surveillance caméra ("monitor") et une session de sécurité ("security") peuvent
+partager le même identifiant côté client sans se remplacer :
+  - "memory" : dictionnaire du processus (un seul worker, comportement historique) ;
+  - "sqlite" : fichier SQLite partagé par les workers de la machine (SESSION_STORE_PATH).
+
+Le worker qui démarre une session en prend le bail (owner, échéance) et le
+renouvelle périodiquement en publiant l'état courant de la session ; les autres
+workers lisent cet état. Arrêter une session depuis n'importe quel worker
+supprime l'enregistrement : le propriétaire le constate au renouvellement
+suivant et libère ses ressources locales. Si le propriétaire disparaît, son
+bail expire et un autre worker reprend la session.
+
+Le client signale qu'il est toujours là par des heartbeats (appel explicite ou
+consultation de l'état). Une session sans heartbeat depuis
+MONITOR_HEARTBEAT_TIMEOUT_SECONDS (onglet fermé, /monitor/stop jamais appelé)
+est récupérée par le LeaseKeeper : surveillance arrêtée, caméra libérée,
+enregistrement supprimé.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Protocol, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import monitoring_sessions_reaped
+
+# Identifiant de ce processus en tant que propriétaire de baux
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionRecord(NamedTuple):
+    session_id: str
+    kind: str
+    owner: str
+    lease_expires_at: float
+    data: dict
+    status: dict
+    heartbeat_at: float = 0.0
+
+    def is_live(self, now: Optional[float] = None) -> bool:
+        return self.lease_expires_at > (now if now is not None else time.time())
+
+
+class MemorySessionStore:
+    """Magasin en mémoire : valable pour un seul processus."""
+
+    def __init__(self):
+        self._records: Dict[Tuple[str, str], SessionRecord] = {}
+        self._lock = threading.Lock()
+
+    def claim(
+        self,
+        kind: str,
+        session_id: str,
+        data: dict,
+        owner: str = WORKER_ID,
+        ttl: Optional[float] = None,
+        touch: bool = False
+    ) -> bool:
+        """
+        Prend le bail de la session, sauf si un autre propriétaire détient un bail valide.
+        `touch` : démarrage demandé par le client, qui compte comme un heartbeat
+        (une reprise par le LeaseKeeper conserve le dernier heartbeat connu).
+        """
+        now = time.time()
+        with self._lock:
+            record = self._records.get((kind, session_id))
+            if record is not None and record.owner != owner and record.is_live(now):
+                return False
+            status = record.status if record is not None else {}
+            heartbeat_at = record.heartbeat_at if record is not None and not touch else now
+            self._records[(kind, session_id)] = SessionRecord(
+                session_id, kind, owner, now + (ttl or settings.SESSION_LEASE_SECONDS), data, status, heartbeat_at
+            )
+            return True
+
+    def renew(self, kind: str, owner: str, statuses: Dict[str, dict], ttl: Optional[float] = None) -> Set[str]:
+        """
+        Prolonge les baux de `owner` sur les sessions `kind` et publie leur état.
+        Retourne les sessions qui lui appartiennent encore (les autres ont été arrêtées ailleurs).
+        """
+        expires_at = time.time() + (ttl or settings.SESSION_LEASE_SECONDS)
+        with self._lock:
+            owned = set()
+            for session_id, status in statuses.items():
+                record = self._records.get((kind, session_id))
+                if record is not None and record.owner == owner:
+                    self._records[(kind, session_id)] = record._replace(lease_expires_at=expires_at, status=status)
+                    owned.add(session_id)
+            return owned
+
+    def heartbeat(self, kind: str, session_id: str) -> bool:
+        """Note que le client de la session est toujours actif. Faux si la session n'existe pas."""
+        with self._lock:
+            record = self._records.get((kind, session_id))
+            if record is None:
+                return False
+            self._records[(kind, session_id)] = record._replace(heartbeat_at=time.time())
+            return True
+
+    def release(self, kind: str, session_id: str) -> bool:
+        with self._lock:
+            return self._records.pop((kind, session_id), None) is not None
+
+    def get(self, kind: str, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            return self._records.get((kind, session_id))
+
+    def live(self, kind: str) -> List[SessionRecord]:
+        now = time.time()
+        with self._lock:
+            return [r for r in self._records.values() if r.kind == kind and r.is_live(now)]
+
+    def expired(self, kind: str) -> List[SessionRecord]:
+        now = time.time()
+        with self._lock:
+            return [r for r in self._records.values() if r.kind == kind and not r.is_live(now)]
+
+    def stale(self, kind: str, cutoff: float) -> List[SessionRecord]:
+        """Sessions sans heartbeat depuis `cutoff` (horodatage)."""
+        with self._lock:
+            return [r for r in self._records.values() if r.kind == kind and r.heartbeat_at < cutoff]
+
+
+class SqliteSessionStore:
+    """Magasin SQLite partagé par les workers d'une même machine (baux atomiques par UPSERT)."""
+    _COLUMNS = "session_id, kind, owner, lease_expires_at, data, status, heartbeat_at"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Ancien schéma (clé sur session_id seul, sans heartbeat_at) : les baux
+        # sont éphémères, la table est simplement recréée
+        primary_key = {row[1] for row in connection.execute("PRAGMA table_info(sessions)") if row[5]}
+        if primary_key and primary_key != {"kind", "session_id"}:
+            connection.execute("DROP TABLE sessions")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " kind TEXT NOT NULL, session_id TEXT NOT NULL, owner TEXT NOT NULL,"
+            " lease_expires_at REAL NOT NULL, data TEXT NOT NULL, status TEXT NOT NULL DEFAULT '{}',"
+            " heartbeat_at REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (kind, session_id))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_sessions_owner ON sessions (owner)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread, en autocommit : chaque instruction est une transaction courte
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _record(row) -> SessionRecord:
+        session_id, kind, owner, lease_expires_at, data, status, heartbeat_at = row
+        return SessionRecord(
+            session_id, kind, owner, lease_expires_at, json.loads(data), json.loads(status), heartbeat_at
+        )
+
+    def claim(
+        self,
+        kind: str,
+        session_id: str,
+        data: dict,
+        owner: str = WORKER_ID,
+        ttl: Optional[float] = None,
+        touch: bool = False
+    ) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO sessions (session_id, kind, owner, lease_expires_at, data, heartbeat_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (kind, session_id) DO UPDATE SET"
+            "  owner = excluded.owner,"
+            "  lease_expires_at = excluded.lease_expires_at, data = excluded.data,"
+            "  heartbeat_at = CASE WHEN ? THEN excluded.heartbeat_at ELSE sessions.heartbeat_at END"
+            " WHERE sessions.owner = excluded.owner OR sessions.lease_expires_at <= ?",
+            (session_id, kind, owner, now + (ttl or settings.SESSION_LEASE_SECONDS), json.dumps(data), now,
+             touch, now)
+        )
+        return cursor.rowcount == 1
+
+    def renew(self, kind: str, owner: str, statuses: Dict[str, dict], ttl: Optional[float] = None) -> Set[str]:
+        if not statuses:
+            return set()
+        expires_at = time.time() + (ttl or settings.SESSION_LEASE_SECONDS)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "UPDATE sessions SET lease_expires_at = ?, status = ?"
+                " WHERE kind = ? AND session_id = ? AND owner = ?",
+                [(expires_at, json.dumps(status, default=str), kind, session_id, owner)
+                 for session_id, status in statuses.items()]
+            )
+            owned = {row[0] for row in connection.execute(
+                "SELECT session_id FROM sessions WHERE kind = ? AND owner = ?", (kind, owner)
+            )}
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return owned & set(statuses)
+
+    def heartbeat(self, kind: str, session_id: str) -> bool:
+        cursor = self._connection().execute(
+            "UPDATE sessions SET heartbeat_at = ? WHERE kind = ? AND session_id = ?", (time.time(), kind, session_id)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, kind: str, session_id: str) -> bool:
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE kind = ? AND session_id = ?", (kind, session_id)
+        )
+        return cursor.rowcount == 1
+
+    def get(self, kind: str, session_id: str) -> Optional[SessionRecord]:
+        row = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM sessions WHERE kind = ? AND session_id = ?",
+            (kind, session_id)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def live(self, kind: str) -> List[SessionRecord]:
+        rows = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM sessions WHERE kind = ? AND lease_expires_at > ?",
+            (kind, time.time())
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def expired(self, kind: str) -> List[SessionRecord]:
+        rows = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM sessions WHERE kind = ? AND lease_expires_at <= ?",
+            (kind, time.time())
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def stale(self, kind: str, cutoff: float) -> List[SessionRecord]:
+        rows = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM sessions WHERE kind = ? AND heartbeat_at < ?",
+            (kind, cutoff)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+
+def _create_store():
+    if settings.SESSION_STORE == "sqlite":
+        return SqliteSessionStore(settings.SESSION_STORE_PATH)
+    if settings.SESSION_STORE != "memory":
+        raise ValueError(f"SESSION_STORE inconnu: {settings.SESSION_STORE!r} (attendu: memory ou sqlite)")
+    return MemorySessionStore()
+
+
+session_store = _create_store()
+
+
+class LeasedSessions(Protocol):
+    """Service dont les sessions locales sont suivies par le LeaseKeeper."""
+    kind: str
+
+    def local_statuses(self) -> Dict[str, dict]: ...
+
+    def stop_local(self, session_id: str) -> None: ...
+
+    def adopt(self, record: SessionRecord) -> None: ...
+
+
+class LeaseKeeper:
+    """
+    Thread de fond : renouvelle les baux des sessions locales en publiant leur
+    état, arrête localement celles supprimées par un autre worker, récupère
+    celles dont le client a cessé d'envoyer des heartbeats et reprend celles
+    dont le propriétaire a disparu (bail expiré).
+    """
+
+    def __init__(self):
+        self._services: List[LeasedSessions] = []
+        # Dernières sessions récupérées faute de heartbeat (les plus récentes à la fin)
+        self.reaped: Deque[dict] = deque(maxlen=100)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def register(self, service: LeasedSessions) -> None:
+        with self._lock:
+            if service not in self._services:
+                self._services.append(service)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="session-lease-keeper", daemon=True)
+                self._thread.start()
+
+    def tick(self) -> None:
+        with self._lock:
+            services = list(self._services)
+        for service in services:
+            # Une erreur sur un service ne doit pas priver les suivants de leur renouvellement
+            try:
+                self._tick_service(service)
+            except Exception as e:
+                print(f"[SESSIONS] Erreur lors du renouvellement des baux {service.kind}: {e}")
+
+    def _tick_service(self, service: LeasedSessions) -> None:
+        statuses = service.local_statuses()
+        owned = session_store.renew(service.kind, WORKER_ID, statuses)
+        for session_id in set(statuses) - owned:
+            print(f"[SESSIONS] Session {service.kind} {session_id} arrêtée par un autre worker")
+            service.stop_local(session_id)
+
+        self._reap(service)
+
+        for record in session_store.expired(service.kind):
+            if session_store.claim(record.kind, record.session_id, record.data):
+                print(f"[SESSIONS] Reprise de la session {service.kind} {record.session_id} (bail de {record.owner} expiré)")
+                service.adopt(record)
+
+    def _reap(self, service: LeasedSessions) -> None:
+        now = time.time()
+        for record in session_store.stale(service.kind, now - settings.MONITOR_HEARTBEAT_TIMEOUT_SECONDS):
+            # Les sessions d'un autre propriétaire encore actif sont récupérées par celui-ci
+            if record.owner != WORKER_ID and record.is_live(now):
+                continue
+            if not session_store.release(record.kind, record.session_id):
+                continue
+            service.stop_local(record.session_id)
+            idle_seconds = round(now - record.heartbeat_at, 1)
+            monitoring_sessions_reaped.inc(service.kind)
+            self.reaped.append({
+                "session_id": record.session_id,
+                "kind": service.kind,
+                "owner": record.owner,
+                "idle_seconds": idle_seconds,
+                "reaped_at": now,
+            })
+            print(f"[SESSIONS] Session {service.kind} {record.session_id} récupérée: "
+                  f"aucun heartbeat depuis {idle_seconds} s")
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.SESSION_LEASE_RENEW_INTERVAL):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[SESSIONS] Erreur lors du renouvellement des baux: {e}")
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=2)
+
+
+lease_keeper = LeaseKeeper()
@@ -0,0 +1,140 @@
+"""
+Historique des résultats d'analyse d'une session de surveillance.
+
+Chaque image analysée ajoute un échantillon (instant, face_status, émotion,
+identité confirmée) dans un tampon circulaire de taille fixe : un tableau
+NumPy d'enregistrements de 7 octets, les statuts étant stockés sous forme de
+codes. La mémoire par session reste constante (MONITOR_TIMELINE_SLOTS
+échantillons, soit environ 100 Ko par défaut) ; au-delà, les échantillons les
+plus anciens sont remplacés.
+
+L'historique est restitué en intervalles (encodage par plages : une entrée par
+suite d'échantillons identiques) et écrit en base par lots à la fin de la
+session.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import MonitoringInterval
+
+FACE_STATUSES = (
+    "unknown", "pending", "confirmed", "mismatch", "no_face", "multiple_faces",
+    "error_no_camera", "error_no_signatures", "error_student_not_found", "error_analysis",
+)
+EMOTIONS = (
+    "unknown", "neutral", "happy", "sad", "angry", "fear", "surprise", "disgust", "error_analysis",
+)
+_FACE_CODES = {name: code for code, name in enumerate(FACE_STATUSES)}
+_EMOTION_CODES = {name: code for code, name in enumerate(EMOTIONS)}
+
+# Instant en millisecondes depuis le début de la session (49 jours au maximum)
+SAMPLE = np.dtype([
+    ("t", np.uint32),
+    ("face", np.uint8),
+    ("emotion", np.uint8),
+    ("identity", np.bool_),
+])
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class StatusTimeline:
+    def __init__(self, capacity: Optional[int] = None, started_at: Optional[float] = None):
+        self.capacity = capacity or settings.MONITOR_TIMELINE_SLOTS
+        self.started_at = started_at if started_at is not None else time.time()
+        self._samples = np.zeros(self.capacity, dtype=SAMPLE)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def recorded(self) -> int:
+        """Nombre total d'échantillons enregistrés depuis le début de la session."""
+        return self._count
+
+    @property
+    def dropped(self) -> int:
+        """Échantillons les plus anciens remplacés faute de place."""
+        return max(0, self._count - self.capacity)
+
+    def record(self, face_status: str, emotion: str, identity_confirmed: bool, at: Optional[float] = None) -> None:
+        """Ajoute le résultat d'une analyse (statuts inconnus enregistrés comme « unknown »)."""
+        elapsed_ms = int(((at if at is not None else time.time()) - self.started_at) * 1000)
+        with self._lock:
+            sample = self._samples[self._count % self.capacity]
+            sample["t"] = max(0, elapsed_ms)
+            sample["face"] = _FACE_CODES.get(face_status, 0)
+            sample["emotion"] = _EMOTION_CODES.get(emotion, 0)
+            sample["identity"] = bool(identity_confirmed)
+            self._count += 1
+
+    def samples(self) -> np.ndarray:
+        """Copie des échantillons conservés, du plus ancien au plus récent."""
+        with self._lock:
+            if self._count <= self.capacity:
+                return self._samples[:self._count].copy()
+            split = self._count % self.capacity
+            return np.concatenate((self._samples[split:], self._samples[:split]))
+
+    def intervals(self) -> List[Dict]:
+        """
+        Suites d'échantillons identiques. Un intervalle se termine au premier
+        échantillon différent (ou au dernier échantillon pour le plus récent).
+        """
+        samples = self.samples()
+        if not len(samples):
+            return []
+
+        changed = (
+            (samples["face"][1:] != samples["face"][:-1])
+            | (samples["emotion"][1:] != samples["emotion"][:-1])
+            | (samples["identity"][1:] != samples["identity"][:-1])
+        )
+        starts = np.flatnonzero(np.concatenate(([True], changed)))
+        stops = np.append(starts[1:], len(samples))
+        times = self.started_at + samples["t"] / 1000.0
+        ends = np.append(times[starts[1:]], times[-1])
+
+        return [
+            {
+                "face_status": FACE_STATUSES[samples["face"][start]],
+                "emotion": EMOTIONS[samples["emotion"][start]],
+                "identity_confirmed": bool(samples["identity"][start]),
+                "started_at": _utc(times[start]),
+                "ended_at": _utc(end),
+                "samples": int(stop - start),
+            }
+            for start, stop, end in zip(starts.tolist(), stops.tolist(), ends.tolist())
+        ]
+
+
+def save_timeline(timeline: StatusTimeline, session_id: str, exam_id: int, student_name: Optional[str]) -> int:
+    """Écrit les intervalles de la session en base par INSERT groupés. Retourne le nombre de lignes."""
+    rows = [
+        {**interval, "session_id": session_id, "exam_id": exam_id, "student_name": student_name}
+        for interval in timeline.intervals()
+    ]
+    if not rows:
+        return 0
+
+    batch_size = settings.MONITOR_TIMELINE_FLUSH_BATCH
+    db = SessionLocal()
+    try:
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(MonitoringInterval), rows[start:start + batch_size])
+        db.commit()
+        return len(rows)
+    except Exception as e:
+        db.rollback()
+        print(f"[MONITOR] Échec de l'écriture de l'historique de la session {session_id}: {str(e)}")
+        return 0
+    finally:
+        db.close()
@@ -0,0 +1,135 @@
+"""
+Index en mémoire mot de passe d'examen → (id, actif, expiration).
+
+Au démarrage d'un examen, tous les étudiants saisissent le mot de passe dans
+les mêmes secondes : l'index évite de parcourir la table des examens à chaque
+tentative (la colonne n'était pas indexée), et un cache négatif de courte durée
+absorbe les mots de passe mal saisis. L'index est rempli au démarrage puis mis
+à jour par les routes de création, de modification et de suppression ; un mot
+de passe absent de l'index est tout de même cherché en base (examen créé par
+un autre processus) avant d'être mis en cache négatif. Les entrées positives
+sont revérifiées en base après EXAM_PASSWORD_TTL_SECONDS, pour prendre en
+compte les modifications et suppressions faites par les autres processus.
+"""
+import secrets
+import string
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Exam
+
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+PASSWORD_LENGTH = 8
+
+
+class ExamEntry(NamedTuple):
+    exam_id: int
+    is_active: bool
+    expires_at: Optional[datetime]
+    # time.monotonic() de la dernière lecture en base
+    checked_at: float = 0.0
+
+    def is_expired(self) -> bool:
+        if self.expires_at is None:
+            return False
+        expires_at = self.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at <= datetime.now(timezone.utc)
+
+
+class ExamPasswordIndex:
+    def __init__(self):
+        self._by_password: Dict[str, ExamEntry] = {}
+        self._password_by_exam: Dict[int, str] = {}
+        self._negative: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def warm(self, db: Session) -> int:
+        """Charge tous les examens ayant un mot de passe. Retourne leur nombre."""
+        rows = db.query(Exam.id, Exam.password, Exam.is_active, Exam.expires_at)\
+            .filter(Exam.password.isnot(None)).all()
+        with self._lock:
+            self._by_password.clear()
+            self._password_by_exam.clear()
+            self._negative.clear()
+            now = time.monotonic()
+            for exam_id, password, is_active, expires_at in rows:
+                self._store(exam_id, password, is_active, expires_at, now)
+        return len(rows)
+
+    def _store(self, exam_id: int, password: str, is_active: Optional[bool], expires_at: Optional[datetime],
+               checked_at: float):
+        old_password = self._password_by_exam.get(exam_id)
+        if old_password is not None and old_password != password:
+            self._by_password.pop(old_password, None)
+        self._by_password[password] = ExamEntry(exam_id, bool(is_active), expires_at, checked_at)
+        self._password_by_exam[exam_id] = password
+        self._negative.pop(password, None)
+
+    def put(self, exam: Exam) -> None:
+        """À appeler après la création ou la modification (commitée) d'un examen."""
+        if not exam.password:
+            self.remove(exam.id)
+            return
+        with self._lock:
+            self._store(exam.id, exam.password, exam.is_active, exam.expires_at, time.monotonic())
+
+    def remove(self, exam_id: int) -> None:
+        """À appeler après la suppression d'un examen, ou quand une entrée ne correspond plus à aucune ligne."""
+        with self._lock:
+            self._drop(exam_id)
+
+    def _drop(self, exam_id: int) -> None:
+        password = self._password_by_exam.pop(exam_id, None)
+        if password is not None:
+            self._by_password.pop(password, None)
+
+    def resolve(self, db: Session, password: str) -> Optional[ExamEntry]:
+        """Entrée de l'examen correspondant au mot de passe, ou None s'il est inconnu."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._by_password.get(password)
+            if entry is not None and now - entry.checked_at < settings.EXAM_PASSWORD_TTL_SECONDS:
+                return entry
+            expires = self._negative.get(password)
+            if expires is not None and expires > now:
+                return None
+
+        exam = db.query(Exam.id, Exam.password, Exam.is_active, Exam.expires_at)\
+            .filter(Exam.password == password).first()
+        with self._lock:
+            if exam is None:
+                # Examen supprimé ou mot de passe changé par un autre processus
+                if entry is not None and self._by_password.get(password) == entry:
+                    self._drop(entry.exam_id)
+                if len(self._negative) >= settings.EXAM_PASSWORD_NEGATIVE_MAX_ENTRIES:
+                    self._negative = {key: value for key, value in self._negative.items() if value > now}
+                    if len(self._negative) >= settings.EXAM_PASSWORD_NEGATIVE_MAX_ENTRIES:
+                        self._negative.clear()
+                self._negative[password] = now + settings.EXAM_PASSWORD_NEGATIVE_TTL_SECONDS
+                return None
+            self._store(*exam, now)
+            return self._by_password[password]
+
+    def is_taken(self, db: Session, password: str) -> bool:
+        with self._lock:
+            if password in self._by_password:
+                return True
+        return db.query(Exam.id).filter(Exam.password == password).first() is not None
+
+    def generate_unique_password(self, db: Session, attempts: int = 20) -> str:
+        """Mot de passe aléatoire (secrets) qui n'est utilisé par aucun autre examen."""
+        for _ in range(attempts):
+            password = ''.join(secrets.choice(PASSWORD_ALPHABET) for _ in range(PASSWORD_LENGTH))
+            if not self.is_taken(db, password):
+                return password
+        raise RuntimeError("Impossible de générer un mot de passe d'examen unique")
+
+
+exam_password_index = ExamPasswordIndex()
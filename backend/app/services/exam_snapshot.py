@@ -0,0 +1,139 @@
+"""
+Instantané publié du contenu d'un examen vu par les étudiants.
+
+Les questions ne changent pas pendant une épreuve : au lieu de recharger
+l'examen et de resérialiser ses questions pour chaque étudiant, le contenu est
+figé une fois (« publication ») en un JSON pré-sérialisé, sans l'indication des
+bonnes réponses, conservé en mémoire avec sa version compressée gzip et un
+ETag fort calculé sur son contenu. Toute modification de l'examen ou de ses
+questions invalide l'instantané, qui est republié à la demande suivante.
+
+Chaque processus de l'API a ses propres instantanés : une modification faite
+par un autre processus n'appelle pas invalidate() ici. L'instantané retient
+donc la version de l'examen à sa publication (updated_at, nombre et plus grand
+identifiant des questions et des options). Comme pour l'index des mots de passe,
+cette version n'est relue en base (une requête d'agrégat) qu'après
+EXAM_SNAPSHOT_TTL_SECONDS ; un instantané dont la version ne correspond plus
+est republié.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import distinct, func
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.models.models import Exam, Question, QuestionOption
+
+
+class ExamSnapshot(NamedTuple):
+    exam_id: int
+    teacher_id: int
+    etag: str
+    body: bytes
+    gzip_body: bytes
+    published_at: datetime
+    version: tuple
+    checked_at: float  # time.monotonic() de la dernière vérification de version
+
+
+_snapshots: Dict[int, ExamSnapshot] = {}
+_lock = threading.Lock()
+
+
+def _student_content(exam: Exam) -> dict:
+    """Contenu de l'examen sous la forme de GET /exams/{id}, sans is_correct."""
+    return {
+        "id": exam.id,
+        "title": exam.title,
+        "description": exam.description,
+        "duration_minutes": exam.duration_minutes,
+        "expires_at": exam.expires_at.isoformat() if exam.expires_at else None,
+        "questions": [
+            {
+                "id": question.id,
+                "exam_id": question.exam_id,
+                "question_text": question.text,
+                "question_type": question.question_type,
+                "points": question.points,
+                "options": [{"id": option.id, "option_text": option.text} for option in question.options],
+            }
+            for question in sorted(exam.questions, key=lambda q: q.id)
+        ],
+    }
+
+
+def _version(db: Session, exam_id: int) -> Optional[tuple]:
+    """Version courante de l'examen en base, ou None s'il n'existe pas."""
+    row = db.query(
+        Exam.updated_at,
+        func.count(distinct(Question.id)),
+        func.max(Question.id),
+        func.count(QuestionOption.id),
+        func.max(QuestionOption.id),
+    ).outerjoin(Question, Question.exam_id == Exam.id)\
+        .outerjoin(QuestionOption, QuestionOption.question_id == Question.id)\
+        .filter(Exam.id == exam_id).group_by(Exam.id).first()
+    return tuple(row) if row is not None else None
+
+
+def publish(db: Session, exam_id: int, version: Optional[tuple] = None) -> Optional[ExamSnapshot]:
+    """(Re)construit l'instantané d'un examen. Retourne None si l'examen n'existe pas."""
+    # Version lue avant le contenu : une modification intercalée fera republier
+    if version is None:
+        version = _version(db, exam_id)
+        if version is None:
+            return None
+    exam = db.query(Exam).options(selectinload(Exam.questions).selectinload(Question.options))\
+        .filter(Exam.id == exam_id).first()
+    if exam is None:
+        return None
+
+    body = json.dumps(_student_content(exam), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    snapshot = ExamSnapshot(
+        exam_id=exam.id,
+        teacher_id=exam.teacher_id,
+        etag=f'"{hashlib.sha1(body).hexdigest()}"',
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=6),
+        published_at=datetime.now(timezone.utc),
+        version=version,
+        checked_at=time.monotonic(),
+    )
+    with _lock:
+        _snapshots[exam_id] = snapshot
+    return snapshot
+
+
+def get_snapshot(db: Session, exam_id: int) -> Optional[ExamSnapshot]:
+    """Instantané en mémoire, (re)publié s'il n'existe pas encore ou si l'examen a changé depuis."""
+    now = time.monotonic()
+    with _lock:
+        snapshot = _snapshots.get(exam_id)
+    if snapshot is not None and now - snapshot.checked_at < settings.EXAM_SNAPSHOT_TTL_SECONDS:
+        return snapshot
+
+    version = _version(db, exam_id)
+    if version is None:
+        invalidate(exam_id)
+        return None
+    if snapshot is not None and snapshot.version == version:
+        snapshot = snapshot._replace(checked_at=now)
+        with _lock:
+            # Ne pas écraser une republication ou une invalidation intercalée
+            current = _snapshots.get(exam_id)
+            if current is not None and current.version == version:
+                _snapshots[exam_id] = snapshot
+        return snapshot
+    return publish(db, exam_id, version)
+
+
+def invalidate(exam_id: int) -> None:
+    """À appeler après toute modification (commitée) de l'examen ou de ses questions."""
+    with _lock:
+        _snapshots.pop(exam_id, None)
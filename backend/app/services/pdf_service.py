@@ -1,101 +1,297 @@
-from fpdf import FPDF
-from io import BytesIO
-from fpdf import FPDF
-from io import BytesIO
-from typing import List
-from app.models import Submission, Exam, Question
-
-class PDF(FPDF):
-    def __init__(self, exam_title):
-        super().__init__()
-        self.exam_title = exam_title
-
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Rapport de Résultats', 0, 1, 'C')
-        self.set_font('Arial', 'I', 12)
-        self.cell(0, 10, self.exam_title, 0, 1, 'C')
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def generate_results_pdf(exam: Exam, submissions: List[Submission]) -> bytes:
-    """
-    Génère un PDF consolidé avec les résultats de toutes les soumissions pour un examen.
-    Si aucune soumission n'est disponible, génère un PDF avec un message informatif.
-    """
-    pdf = PDF(exam_title=exam.title)
-    pdf.add_page()
-
-    # Page de résumé
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, 'Résumé des Soumissions', 0, 1, 'L')
-    pdf.ln(5)
-    
-    # Vérifier s'il y a des soumissions
-    if not submissions:
-        pdf.set_font('Arial', 'I', 12)
-        pdf.cell(0, 10, 'Aucune soumission n\'a été trouvée pour cet examen.', 0, 1, 'C')
-        pdf.ln(5)
-        pdf.set_font('Arial', '', 11)
-        pdf.cell(0, 10, 'Les résultats apparaîtront ici une fois que des étudiants auront soumis leurs réponses.', 0, 1, 'C')
-        # Générer le PDF en mémoire même s'il est vide
-        return pdf.output(dest='S').encode('latin-1')
-
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(90, 10, 'Nom de l\'étudiant', 1)
-    pdf.cell(40, 10, 'Score', 1)
-    pdf.cell(50, 10, 'Date de soumission', 1)
-    pdf.ln()
-
-    pdf.set_font('Arial', '', 12)
-    for sub in submissions:
-        pdf.cell(90, 10, sub.student_name, 1)
-        pdf.cell(40, 10, f'{sub.score} / {sub.max_score}', 1)
-        pdf.cell(50, 10, sub.submitted_at.strftime('%Y-%m-%d %H:%M'), 1)
-        pdf.ln()
-
-    # Détails par soumission
-    for sub in submissions:
-        pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, f'Détails pour : {sub.student_name}', 0, 1, 'L')
-        pdf.ln(5)
-
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, f"Score final: {sub.score} / {sub.max_score}", 0, 1)
-        pdf.ln(10)
-
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, "Détail des réponses :", 0, 1)
-        pdf.ln(5)
-
-        # Créer un mapping des questions pour un accès facile
-        questions_map = {q.id: q for q in exam.questions}
-
-        for answer in sub.answers:
-            question = questions_map.get(answer.question_id)
-            if not question:
-                continue
-
-            pdf.set_font('Arial', 'B', 11)
-            pdf.multi_cell(0, 5, f"Q: {question.text} ({answer.points_earned} / {question.points} pts)")
-            
-            pdf.set_font('Arial', '', 10)
-            correctness_text = "(Correct)" if answer.is_correct else "(Incorrect)"
-            
-            pdf.multi_cell(0, 5, f"Réponse: {answer.answer_text} {correctness_text}")
-
-            if not answer.is_correct:
-                correct_options = [opt.option_text for opt in question.options if opt.is_correct]
-                correct_answer_text = ", ".join(correct_options)
-                pdf.set_font('Arial', 'I', 10)
-                pdf.multi_cell(0, 5, f"Réponse correcte: {correct_answer_text}")
-
-            pdf.ln(5)
-
-    # Générer le PDF en mémoire
-    return pdf.output(dest='S').encode('latin-1')
+"""
+Génération en flux du rapport PDF des résultats d'un examen.
+
+Le document est produit page par page : dès qu'un lot de soumissions est rendu,
+les pages terminées sont écrites dans le flux et libérées. Les soumissions et
+leurs réponses sont lues par lots (pagination keyset), et les données des
+questions ne sont préparées qu'une seule fois.
+"""
+import zlib
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fpdf import FPDF
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models import Answer, Question, QuestionOption, Submission, User
+from app.utils.pagination import keyset_page
+
+# Nombre de soumissions lues et rendues par lot
+SUBMISSIONS_CHUNK_SIZE = 50
+
+
+def _latin1(text) -> str:
+    """Les polices standard de FPDF ne supportent que le latin-1."""
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+
+class _StreamBuffer:
+    """
+    Remplace le tampon texte de FPDF : les écritures sont accumulées jusqu'au
+    prochain `drain()`, mais `len()` renvoie le nombre total d'octets écrits
+    pour que FPDF calcule des offsets corrects dans la table xref.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._written = 0
+
+    def __iadd__(self, text: str):
+        self._parts.append(text)
+        self._written += len(text)
+        return self
+
+    def __len__(self):
+        return self._written
+
+    def drain(self) -> bytes:
+        data = ''.join(self._parts).encode('latin-1')
+        self._parts = []
+        return data
+
+
+class PDF(FPDF):
+    def __init__(self, exam_title):
+        super().__init__()
+        self.exam_title = exam_title
+
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Rapport de Résultats', 0, 1, 'C')
+        self.set_font('Arial', 'I', 12)
+        self.cell(0, 10, _latin1(self.exam_title), 0, 1, 'C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+
+class StreamingPDF(PDF):
+    """
+    PDF dont les pages terminées peuvent être écrites avant la fin du document.
+    FPDF numérote les objets de page à partir de 3 et les écrit juste après
+    l'en-tête ; on conserve cet ordre en écrivant les pages au fil de l'eau,
+    les polices, ressources et la table xref restant écrites à la fermeture.
+    """
+
+    def __init__(self, exam_title):
+        super().__init__(exam_title)
+        self.buffer = _StreamBuffer()
+        self._header_written = False
+        self._pages_written = 0
+
+    def _putheader(self):
+        if not self._header_written:
+            self._header_written = True
+            super()._putheader()
+
+    def _put_page(self, n: int):
+        """Écrit l'objet page n et son contenu, puis libère son contenu."""
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == 'P' else (self.fh_pt, self.fw_pt)
+        self._newobj()
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        if n in self.orientation_changes:
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (h_pt, w_pt))
+        self._out('/Resources 2 0 R')
+        if self.pdf_version > '1.3':
+            self._out('/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>')
+        self._out('/Contents ' + str(self.n + 1) + ' 0 R>>')
+        self._out('endobj')
+
+        content = self.pages.pop(n)
+        if self.compress:
+            content = zlib.compress(content.encode('latin-1'))
+            filter = '/Filter /FlateDecode '
+        else:
+            filter = ''
+        self._newobj()
+        self._out('<<' + filter + '/Length ' + str(len(content)) + '>>')
+        self._putstream(content)
+        self._out('endobj')
+        self._pages_written = n
+
+    def flush_pages(self) -> bytes:
+        """Écrit toutes les pages terminées (toutes sauf la page courante)."""
+        state, self.state = self.state, 1
+        try:
+            self._putheader()
+            for n in range(self._pages_written + 1, self.page):
+                self._put_page(n)
+        finally:
+            self.state = state
+        return self.buffer.drain()
+
+    def _putpages(self):
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == 'P' else (self.fh_pt, self.fw_pt)
+        for n in range(self._pages_written + 1, self.page + 1):
+            self._put_page(n)
+        # Racine des pages
+        self.offsets[1] = len(self.buffer)
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ''.join(str(3 + 2 * i) + ' 0 R ' for i in range(self.page)) + ']')
+        self._out('/Count ' + str(self.page))
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (w_pt, h_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def finish(self) -> bytes:
+        """Termine le document et retourne les derniers octets."""
+        self.close()
+        return self.buffer.drain()
+
+
+def _load_questions(db: Session, exam_id: int) -> Dict[int, Tuple[str, int, str]]:
+    """Prépare une seule fois {question_id: (texte, points, bonnes réponses)}."""
+    correct_options = defaultdict(list)
+    for question_id, text in (
+        db.query(QuestionOption.question_id, QuestionOption.text)
+        .join(Question, Question.id == QuestionOption.question_id)
+        .filter(Question.exam_id == exam_id, QuestionOption.is_correct == True)
+    ):
+        correct_options[question_id].append(text)
+
+    return {
+        question_id: (text, points, ", ".join(correct_options[question_id]))
+        for question_id, text, points in
+        db.query(Question.id, Question.text, Question.points).filter(Question.exam_id == exam_id)
+    }
+
+
+def _submission_chunks(db: Session, exam_id: int, chunk_size: int) -> Iterator[list]:
+    """Lit les soumissions par lots, triées par (submitted_at, id)."""
+    query = (
+        db.query(
+            Submission.id,
+            Submission.submitted_at,
+            Submission.score,
+            Submission.total_points_possible,
+            User.full_name
+        )
+        .outerjoin(User, User.id == Submission.student_id)
+        .filter(Submission.exam_id == exam_id)
+    )
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, Submission.submitted_at, Submission.id, cursor, chunk_size, descending=False)
+        if rows:
+            yield rows
+        if cursor is None:
+            break
+
+
+def _answers_by_submission(db: Session, submission_ids: List[int]) -> Dict[int, list]:
+    answers = defaultdict(list)
+    for row in (
+        db.query(Answer.submission_id, Answer.question_id, Answer.answer_text, Answer.points_awarded)
+        .filter(Answer.submission_id.in_(submission_ids))
+        .order_by(Answer.submission_id, Answer.id)
+    ):
+        answers[row.submission_id].append(row)
+    return answers
+
+
+def _render_submission(pdf: PDF, sub, answers: list, questions: Dict[int, Tuple[str, int, str]]):
+    student_name = _latin1(sub.full_name or f"Étudiant #{sub.id}")
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, f'Détails pour : {student_name}', 0, 1, 'L')
+    pdf.ln(5)
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, f"Score final: {sub.score} / {sub.total_points_possible}", 0, 1)
+    pdf.ln(10)
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, "Détail des réponses :", 0, 1)
+    pdf.ln(5)
+
+    for answer in answers:
+        question = questions.get(answer.question_id)
+        if not question:
+            continue
+        question_text, points, correct_text = question
+        is_correct = (answer.points_awarded or 0) > 0
+
+        pdf.set_font('Arial', 'B', 11)
+        pdf.multi_cell(0, 5, _latin1(f"Q: {question_text} ({answer.points_awarded} / {points} pts)"))
+
+        pdf.set_font('Arial', '', 10)
+        correctness_text = "(Correct)" if is_correct else "(Incorrect)"
+        pdf.multi_cell(0, 5, _latin1(f"Réponse: {answer.answer_text} {correctness_text}"))
+
+        if not is_correct:
+            pdf.set_font('Arial', 'I', 10)
+            pdf.multi_cell(0, 5, _latin1(f"Réponse correcte: {correct_text}"))
+
+        pdf.ln(5)
+
+
+def stream_results_pdf(
+    exam_id: int,
+    exam_title: str,
+    chunk_size: int = SUBMISSIONS_CHUNK_SIZE,
+    db: Optional[Session] = None
+) -> Iterator[bytes]:
+    """
+    Génère le PDF consolidé des résultats d'un examen sous forme de morceaux
+    d'octets, à passer tel quel à une StreamingResponse.
+    Si aucune soumission n'est disponible, génère un PDF avec un message informatif.
+
+    Le générateur ouvre sa propre session : il s'exécute après la fin du handler.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        pdf = StreamingPDF(exam_title=exam_title)
+        pdf.add_page()
+
+        # Page de résumé
+        pdf.set_font('Arial', 'B', 16)
+        pdf.cell(0, 10, 'Résumé des Soumissions', 0, 1, 'L')
+        pdf.ln(5)
+
+        chunks = _submission_chunks(db, exam_id, chunk_size)
+        first_chunk = next(chunks, None)
+
+        if first_chunk is None:
+            pdf.set_font('Arial', 'I', 12)
+            pdf.cell(0, 10, 'Aucune soumission n\'a été trouvée pour cet examen.', 0, 1, 'C')
+            pdf.ln(5)
+            pdf.set_font('Arial', '', 11)
+            pdf.cell(0, 10, 'Les résultats apparaîtront ici une fois que des étudiants auront soumis leurs réponses.', 0, 1, 'C')
+            yield pdf.finish()
+            return
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(90, 10, 'Nom de l\'étudiant', 1)
+        pdf.cell(40, 10, 'Score', 1)
+        pdf.cell(50, 10, 'Date de soumission', 1)
+        pdf.ln()
+
+        pdf.set_font('Arial', '', 12)
+        for chunk in chain([first_chunk], chunks):
+            for sub in chunk:
+                pdf.cell(90, 10, _latin1(sub.full_name or f"Étudiant #{sub.id}"), 1)
+                pdf.cell(40, 10, f'{sub.score} / {sub.total_points_possible}', 1)
+                pdf.cell(50, 10, sub.submitted_at.strftime('%Y-%m-%d %H:%M') if sub.submitted_at else '-', 1)
+                pdf.ln()
+            yield pdf.flush_pages()
+
+        # Détails par soumission, lot par lot
+        questions = _load_questions(db, exam_id)
+        for chunk in _submission_chunks(db, exam_id, chunk_size):
+            answers = _answers_by_submission(db, [sub.id for sub in chunk])
+            for sub in chunk:
+                _render_submission(pdf, sub, answers.get(sub.id, []), questions)
+            yield pdf.flush_pages()
+
+        yield pdf.finish()
+    finally:
+        if own_session:
+            db.close()
@@ -0,0 +1,140 @@
+"""
+Import en masse de questions (JSON ou CSV) pour un examen.
+
+Chaque ligne est validée individuellement afin de pouvoir signaler les erreurs
+ligne par ligne, puis toutes les lignes valides sont insérées en deux requêtes
+groupées (questions puis options) dans une seule transaction.
+"""
+import csv
+import io
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Question, QuestionOption
+from app.schemas.schemas import QuestionCreate, QuestionType
+
+# Colonnes attendues dans un fichier CSV d'import.
+# Les options sont séparées par '|' et les bonnes réponses préfixées par '*',
+# par exemple : "Sydney|Melbourne|*Canberra|Perth"
+CSV_COLUMNS = ("question_text", "question_type", "points", "options")
+CSV_OPTION_SEPARATOR = "|"
+CSV_CORRECT_MARKER = "*"
+
+
+def parse_csv_rows(content: bytes) -> List[Dict[str, Any]]:
+    """Convertit le contenu d'un fichier CSV en lignes au format JSON d'import."""
+    text = content.decode("utf-8-sig")
+    try:
+        dialect = csv.Sniffer().sniff(text.splitlines()[0] if text else "", delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+
+    missing = [col for col in CSV_COLUMNS if col not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans le fichier CSV: {', '.join(missing)}")
+
+    rows = []
+    for record in reader:
+        options = []
+        for raw_option in (record.get("options") or "").split(CSV_OPTION_SEPARATOR):
+            raw_option = raw_option.strip()
+            if not raw_option:
+                continue
+            is_correct = raw_option.startswith(CSV_CORRECT_MARKER)
+            options.append({
+                "option_text": raw_option.lstrip(CSV_CORRECT_MARKER).strip(),
+                "is_correct": is_correct
+            })
+        rows.append({
+            "question_text": (record.get("question_text") or "").strip(),
+            "question_type": (record.get("question_type") or "").strip(),
+            "points": (record.get("points") or "").strip() or 1,
+            "options": options
+        })
+    return rows
+
+
+def _check_options(question: QuestionCreate) -> List[str]:
+    """Règles métier sur les options, non couvertes par le schéma Pydantic."""
+    errors = []
+    if not question.text.strip():
+        errors.append("Le texte de la question est vide")
+    if question.points <= 0:
+        errors.append("Le nombre de points doit être positif")
+
+    correct_count = sum(1 for opt in question.options if opt.is_correct)
+    if question.question_type == QuestionType.TRUE_FALSE:
+        if len(question.options) != 2:
+            errors.append("Une question vrai/faux doit avoir exactement 2 options")
+        if correct_count != 1:
+            errors.append("Une question vrai/faux doit avoir exactement une bonne réponse")
+    else:
+        if len(question.options) < 2:
+            errors.append("Une question à choix multiples doit avoir au moins 2 options")
+        if correct_count < 1:
+            errors.append("Au moins une option doit être marquée comme correcte")
+    return errors
+
+
+def validate_rows(rows: List[Any]) -> Tuple[List[QuestionCreate], List[Dict[str, Any]]]:
+    """
+    Valide chaque ligne et retourne (questions valides, erreurs par ligne).
+    Les numéros de ligne commencent à 1.
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows, 1):
+        try:
+            question = QuestionCreate.model_validate(row)
+        except ValidationError as e:
+            errors.append({
+                "row": index,
+                "errors": [
+                    f"{'.'.join(str(loc) for loc in err['loc']) or 'ligne'}: {err['msg']}"
+                    for err in e.errors()
+                ]
+            })
+            continue
+
+        row_errors = _check_options(question)
+        if row_errors:
+            errors.append({"row": index, "errors": row_errors})
+        else:
+            valid.append(question)
+    return valid, errors
+
+
+def bulk_insert_questions(db: Session, exam_id: int, questions: List[QuestionCreate]) -> List[int]:
+    """
+    Insère les questions et leurs options avec deux INSERT groupés.
+    Ne fait pas de commit : l'appelant contrôle la transaction.
+    """
+    if not questions:
+        return []
+
+    question_ids = list(db.scalars(
+        insert(Question).returning(Question.id, sort_by_parameter_order=True),
+        [
+            {
+                "exam_id": exam_id,
+                "text": question.text,
+                "question_type": question.question_type.value,
+                "points": question.points
+            }
+            for question in questions
+        ]
+    ))
+
+    option_rows = [
+        {"question_id": question_id, "text": option.text, "is_correct": option.is_correct}
+        for question_id, question in zip(question_ids, questions)
+        for option in question.options
+    ]
+    if option_rows:
+        db.execute(insert(QuestionOption), option_rows)
+
+    return question_ids
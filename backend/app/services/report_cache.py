@@ -0,0 +1,127 @@
+"""
+Rapports PDF de résultats rendus en arrière-plan et mis en cache sur disque.
+
+Chaque rapport est identifié par l'id de l'examen et une version calculée à
+partir des soumissions, des questions et de la date de modification de
+l'examen : tant que ces données ne changent pas, le même fichier (et donc le
+même ETag) est servi sans nouveau rendu.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import pdf_render_duration
+from app.models.models import Exam, Question
+from app.services.pdf_service import stream_results_pdf
+from app.services.results_stats import submissions_version
+
+_executor = ThreadPoolExecutor(max_workers=settings.REPORT_RENDER_WORKERS, thread_name_prefix="report-render")
+_in_flight: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def report_version(db: Session, exam: Exam) -> str:
+    """Empreinte courte des données qui apparaissent dans le rapport."""
+    questions = db.query(func.count(Question.id), func.max(Question.id))\
+        .filter(Question.exam_id == exam.id).one()
+    raw = repr((tuple(submissions_version(db, exam.id)), tuple(questions), str(exam.updated_at), exam.title))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def report_key(exam_id: int, version: str) -> str:
+    return f"results_exam_{exam_id}_{version}"
+
+
+def report_etag(key: str) -> str:
+    return f'"{key}"'
+
+
+def report_path(key: str) -> str:
+    return os.path.join(settings.REPORTS_CACHE_DIR, f"{key}.pdf")
+
+
+def cached_report(key: str) -> Optional[str]:
+    """Chemin du rapport s'il est déjà rendu, sinon None."""
+    path = report_path(key)
+    return path if os.path.exists(path) else None
+
+
+def _render(exam_id: int, exam_title: str, key: str) -> str:
+    os.makedirs(settings.REPORTS_CACHE_DIR, exist_ok=True)
+    path = report_path(key)
+    started_at = time.time()
+    # Fichier temporaire unique, y compris entre processus (plusieurs workers uvicorn)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=settings.REPORTS_CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f, pdf_render_duration.time("results"):
+            for chunk in stream_results_pdf(exam_id=exam_id, exam_title=exam_title):
+                f.write(chunk)
+        # Remplacement atomique : un lecteur ne voit jamais un fichier partiel
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Supprimer les versions précédentes du rapport de cet examen. Un rendu lent
+    # d'une ancienne version ne doit pas supprimer un rapport plus récent : seuls
+    # les fichiers antérieurs au début de ce rendu, et dont aucun rendu n'est en
+    # cours dans ce processus, sont supprimés
+    with _lock:
+        rendering = {report_path(other) for other in _in_flight}
+    for old_path in glob.glob(os.path.join(settings.REPORTS_CACHE_DIR, f"results_exam_{exam_id}_*.pdf")):
+        if old_path == path or old_path in rendering:
+            continue
+        try:
+            if os.path.getmtime(old_path) < started_at:
+                os.remove(old_path)
+        except OSError:
+            pass
+    return path
+
+
+def ensure_report(exam_id: int, exam_title: str, key: str) -> Future:
+    """
+    Retourne un Future résolu avec le chemin du rapport. Le rendu n'est lancé
+    que si le fichier n'existe pas et qu'aucun rendu de cette version n'est en cours.
+    """
+    path = cached_report(key)
+    if path:
+        future = Future()
+        future.set_result(path)
+        return future
+
+    with _lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = _executor.submit(_render, exam_id, exam_title, key)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _forget(key))
+        return future
+
+
+def _forget(key: str):
+    with _lock:
+        _in_flight.pop(key, None)
+
+
+def invalidate_reports(exam_id: int) -> None:
+    """Supprime tous les rapports en cache d'un examen (par exemple à sa suppression)."""
+    for path in glob.glob(os.path.join(settings.REPORTS_CACHE_DIR, f"results_exam_{exam_id}_*.pdf")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def shutdown():
+    """Arrête le pool de rendu (les rendus en cours sont terminés)."""
+    _executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,222 @@
+"""
+Export tabulaire des résultats d'un examen (CSV, NDJSON, Parquet) destiné à
+l'import des notes dans un LMS.
+
+Deux granularités : une ligne par soumission, ou une ligne par réponse. Les
+lignes sont lues par lots via un curseur côté serveur (yield_per) et chaque
+lot est sérialisé puis envoyé avant de lire le suivant : la mémoire utilisée
+ne dépend pas de la taille de l'examen.
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from app.db.database import SessionLocal
+from app.models.models import Answer, Question, QuestionOption, Submission, User
+
+EXPORT_CHUNK_SIZE = 1000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+SUBMISSION_COLUMNS = [
+    "submission_id", "exam_id", "student_id", "student_name", "student_email",
+    "score", "total_points_possible", "percentage", "submitted_at",
+]
+
+ANSWER_COLUMNS = [
+    "submission_id", "exam_id", "student_id", "student_name", "submitted_at",
+    "question_id", "question_text", "question_type", "question_points",
+    "selected_option_id", "selected_option_text", "answer_text",
+    "points_awarded", "is_correct",
+]
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _submissions_query(exam_id: int) -> Select:
+    return (
+        select(
+            Submission.id, Submission.exam_id, Submission.student_id,
+            User.full_name, User.email,
+            Submission.score, Submission.total_points_possible, Submission.submitted_at,
+        )
+        .outerjoin(User, User.id == Submission.student_id)
+        .where(Submission.exam_id == exam_id)
+        .order_by(Submission.id)
+    )
+
+
+def _answers_query(exam_id: int) -> Select:
+    return (
+        select(
+            Submission.id, Submission.exam_id, Submission.student_id, User.full_name, Submission.submitted_at,
+            Question.id, Question.text, Question.question_type, Question.points,
+            Answer.selected_option_id, QuestionOption.text, Answer.answer_text,
+            Answer.points_awarded,
+        )
+        .select_from(Answer)
+        .join(Submission, Submission.id == Answer.submission_id)
+        .join(Question, Question.id == Answer.question_id)
+        .outerjoin(User, User.id == Submission.student_id)
+        .outerjoin(QuestionOption, QuestionOption.id == Answer.selected_option_id)
+        .where(Submission.exam_id == exam_id)
+        .order_by(Submission.id, Question.id, Answer.id)
+    )
+
+
+def _submission_row(row: Sequence[Any]) -> List[Any]:
+    submission_id, exam_id, student_id, name, email, score, possible, submitted_at = row
+    percentage = round(score / possible * 100, 2) if score is not None and possible else 0.0
+    return [submission_id, exam_id, student_id, name, email, score, possible, percentage, submitted_at]
+
+
+def _answer_row(row: Sequence[Any]) -> List[Any]:
+    points_awarded = row[12]
+    return list(row) + [bool(points_awarded and points_awarded > 0)]
+
+
+GRANULARITIES: Dict[str, tuple] = {
+    "submission": (_submissions_query, _submission_row, SUBMISSION_COLUMNS),
+    "answer": (_answers_query, _answer_row, ANSWER_COLUMNS),
+}
+
+
+def _row_chunks(exam_id: int, granularity: str, chunk_size: int) -> Iterator[List[List[Any]]]:
+    """Lots de lignes lus par un curseur côté serveur, dans une session propre au générateur."""
+    build_query, convert, _ = GRANULARITIES[granularity]
+    db = SessionLocal()
+    try:
+        result = db.execute(build_query(exam_id).execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            yield [convert(row) for row in partition]
+    finally:
+        db.close()
+
+
+def _format_value(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _csv_stream(columns: List[str], chunks: Iterator[List[List[Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows([_format_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_stream(columns: List[str], chunks: Iterator[List[List[Any]]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, map(_format_value, row))), default=str, ensure_ascii=False) + "\n" for row in chunk
+        ).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule dont le contenu est récupéré au fur et à mesure."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _parquet_schema(granularity: str):
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    if granularity == "submission":
+        return pa.schema([
+            ("submission_id", pa.int64()), ("exam_id", pa.int64()), ("student_id", pa.int64()),
+            ("student_name", pa.string()), ("student_email", pa.string()),
+            ("score", pa.float64()), ("total_points_possible", pa.int64()),
+            ("percentage", pa.float64()), ("submitted_at", timestamp),
+        ])
+    return pa.schema([
+        ("submission_id", pa.int64()), ("exam_id", pa.int64()), ("student_id", pa.int64()),
+        ("student_name", pa.string()), ("submitted_at", timestamp),
+        ("question_id", pa.int64()), ("question_text", pa.string()), ("question_type", pa.string()),
+        ("question_points", pa.int64()), ("selected_option_id", pa.int64()),
+        ("selected_option_text", pa.string()), ("answer_text", pa.string()),
+        ("points_awarded", pa.float64()), ("is_correct", pa.bool_()),
+    ])
+
+
+def _parquet_stream(granularity: str, columns: List[str], chunks: Iterator[List[List[Any]]]) -> Iterator[bytes]:
+    """Un groupe de lignes Parquet par lot ; les octets sont envoyés dès l'écriture du groupe."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(granularity)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pylist([dict(zip(columns, row)) for row in chunk], schema=schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_results(
+    exam_id: int,
+    fmt: str,
+    granularity: str = "submission",
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Générateur d'octets de l'export ; à passer tel quel à une StreamingResponse."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularité inconnue: {granularity}")
+    columns = GRANULARITIES[granularity][2]
+    chunks = _row_chunks(exam_id, granularity, chunk_size)
+
+    streams: Dict[str, Callable[[], Iterator[bytes]]] = {
+        "csv": lambda: _csv_stream(columns, chunks),
+        "ndjson": lambda: _ndjson_stream(columns, chunks),
+        "parquet": lambda: _parquet_stream(granularity, columns, chunks),
+    }
+    if fmt not in streams:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    return streams[fmt]()
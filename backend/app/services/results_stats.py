@@ -0,0 +1,149 @@
+"""
+Statistiques de résultats d'un examen calculées côté base de données.
+
+Les résultats par soumission et par question sont obtenus par des requêtes
+agrégées (GROUP BY) : aucune réponse n'est chargée sous forme d'objet ORM.
+Le résultat est mis en cache par examen et invalidé dès que l'ensemble des
+soumissions change (nouvelle soumission ou suppression).
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models.models import Answer, Question, Submission, User
+
+# Percentiles exposés dans la distribution des scores
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_cache: Dict[int, Tuple[Tuple[int, Optional[int]], Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _is_correct():
+    """Une réponse est considérée correcte dès qu'elle rapporte des points."""
+    return case((Answer.points_awarded > 0, 1), else_=0)
+
+
+def submissions_version(db: Session, exam_id: int) -> Tuple[int, Optional[int]]:
+    """Version légère de l'ensemble des soumissions : (nombre, plus grand id)."""
+    count, max_id = db.query(func.count(Submission.id), func.max(Submission.id))\
+        .filter(Submission.exam_id == exam_id).one()
+    return count, max_id
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Percentile par interpolation linéaire sur une liste déjà triée."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def _submission_rows(db: Session, exam_id: int) -> List[Dict[str, Any]]:
+    total = func.count(Answer.id)
+    correct = func.coalesce(func.sum(_is_correct()), 0)
+    rows = (
+        db.query(
+            Submission.id,
+            Submission.exam_id,
+            User.full_name,
+            Submission.submitted_at,
+            Submission.score,
+            Submission.total_points_possible,
+            correct.label("correct_answers"),
+            total.label("total_questions"),
+        )
+        .outerjoin(User, User.id == Submission.student_id)
+        .outerjoin(Answer, Answer.submission_id == Submission.id)
+        .filter(Submission.exam_id == exam_id)
+        .group_by(Submission.id)
+        .order_by(Submission.submitted_at, Submission.id)
+        .all()
+    )
+
+    results = []
+    for row in rows:
+        percentage = round(row.correct_answers / row.total_questions * 100, 2) if row.total_questions else 0
+        results.append({
+            "submission": {
+                "id": row.id,
+                "exam_id": row.exam_id,
+                "student_name": row.full_name,
+                "submitted_at": row.submitted_at.isoformat() if row.submitted_at else None,
+                "score": row.score,
+                "max_score": row.total_points_possible
+            },
+            "correct_answers": row.correct_answers,
+            "total_questions": row.total_questions,
+            "percentage": percentage
+        })
+    return results
+
+
+def _question_rows(db: Session, exam_id: int) -> List[Dict[str, Any]]:
+    answered = func.count(Answer.id)
+    correct = func.coalesce(func.sum(_is_correct()), 0)
+    rows = (
+        db.query(Question.id, Question.text, Question.points, answered, correct)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .filter(Question.exam_id == exam_id)
+        .group_by(Question.id)
+        .order_by(Question.id)
+        .all()
+    )
+    return [
+        {
+            "question_id": question_id,
+            "text": text,
+            "points": points,
+            "answers": answered_count,
+            "correct_answers": correct_count,
+            "success_rate": round(correct_count / answered_count * 100, 2) if answered_count else 0
+        }
+        for question_id, text, points, answered_count, correct_count in rows
+    ]
+
+
+def _exam_stats(submissions: List[Dict[str, Any]], questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    percentages = sorted(result["percentage"] for result in submissions)
+    count = len(percentages)
+    return {
+        "submissions_count": count,
+        "mean_percentage": round(sum(percentages) / count, 2) if count else 0,
+        "median_percentage": round(_percentile(percentages, 50), 2),
+        "min_percentage": percentages[0] if count else 0,
+        "max_percentage": percentages[-1] if count else 0,
+        "percentiles": {f"p{p}": round(_percentile(percentages, p), 2) for p in PERCENTILES},
+        "questions": questions
+    }
+
+
+def get_exam_results(db: Session, exam_id: int) -> Dict[str, Any]:
+    """
+    Retourne {"submissions": [...], "stats": {...}} pour un examen.
+    Recalculé uniquement si les soumissions ont changé depuis le dernier appel.
+    """
+    version = submissions_version(db, exam_id)
+    with _cache_lock:
+        cached = _cache.get(exam_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    submissions = _submission_rows(db, exam_id)
+    questions = _question_rows(db, exam_id)
+    results = {"submissions": submissions, "stats": _exam_stats(submissions, questions)}
+
+    with _cache_lock:
+        _cache[exam_id] = (version, results)
+    return results
+
+
+def invalidate_exam_results(exam_id: int) -> None:
+    """Supprime les résultats en cache d'un examen."""
+    with _cache_lock:
+        _cache.pop(exam_id, None)
@@ -0,0 +1,239 @@
+"""
+Tampon d'écriture différée (write-behind) pour les violations de sécurité.
+
+Le client anti-triche peut émettre des dizaines d'événements par seconde et par
+étudiant. Plutôt qu'une transaction SQLite par événement, les violations sont
+accumulées en mémoire puis écrites par INSERT groupés, dès qu'un lot est plein
+ou après un délai maximal.
+
+En surcharge (trop d'événements en attente), les événements de faible gravité
+sont fusionnés par (session, type) : la ligne déjà en attente voit son compteur
+`coalesced_count` incrémenté au lieu d'ajouter une nouvelle ligne. La mémoire
+reste bornée : au-delà de `hard_limit` événements en attente ou en cours
+d'écriture, tout nouvel événement est abandonné.
+
+Un lot dont l'écriture échoue est remis en file ; après `max_retries` échecs
+consécutifs, il est écrit par dichotomie et les lignes qui échouent seules
+sont abandonnées (« dead letter »), pour qu'une ligne invalide ne bloque pas
+indéfiniment le tampon. Après stop() (arrêt de l'API), les violations encore
+reçues sont écrites immédiatement, sans relancer le thread. Aucun événement n'est abandonné sans être compté
+(métrique security_violations_dropped_total).
+"""
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.metrics import violations_dropped
+from app.db.database import SessionLocal
+from app.models.models import SecurityViolation
+
+
+class ViolationBuffer:
+    def __init__(
+        self,
+        max_batch: int = settings.VIOLATION_BUFFER_MAX_BATCH,
+        flush_interval: float = settings.VIOLATION_BUFFER_FLUSH_INTERVAL,
+        max_pending: int = settings.VIOLATION_BUFFER_MAX_PENDING,
+        low_severity_types: Iterable[str] = settings.VIOLATION_LOW_SEVERITY_TYPES,
+        hard_limit: int = settings.VIOLATION_BUFFER_HARD_LIMIT,
+        max_retries: int = settings.VIOLATION_BUFFER_MAX_RETRIES
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.low_severity_types = set(low_severity_types)
+        self.hard_limit = max(hard_limit, max_pending)
+        self.max_retries = max_retries
+
+        self._pending: List[Dict[str, Any]] = []
+        # Lignes retirées de la file par le vidage en cours (comptées dans hard_limit)
+        self._in_flight = 0
+        self._failures = 0
+        # Lignes en attente pouvant absorber les événements fusionnés
+        self._coalesce_index: Dict[Tuple[Optional[str], str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        # Arrêté par stop() : add() écrit directement au lieu de relancer le thread
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Compteurs exposés pour le suivi
+        self.stats = {
+            "accepted": 0, "coalesced": 0, "dropped": 0,
+            "flushed": 0, "flush_errors": 0, "dead_lettered": 0
+        }
+
+    def start(self):
+        """Démarre le thread de vidage périodique (idempotent)."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._stopped = False
+            self._thread = threading.Thread(target=self._flush_loop, name="violation-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Arrête le thread et écrit les violations encore en attente."""
+        with self._lock:
+            self._running = False
+            self._stopped = True
+            thread, self._thread = self._thread, None
+        self._wakeup.set()
+        if thread:
+            thread.join(timeout=5)
+        self.flush()
+
+    def add(self, violations: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Ajoute des violations (dictionnaires de colonnes) au tampon.
+        Retourne le nombre d'événements acceptés (dont fusionnés) et abandonnés.
+        """
+        if not self._running and not self._stopped:
+            self.start()
+
+        accepted = coalesced = dropped = 0
+        with self._lock:
+            for violation in violations:
+                key = (violation.get("exam_session_id"), violation["violation_type"])
+                low_severity = violation["violation_type"] in self.low_severity_types
+
+                if low_severity and len(self._pending) >= self.max_pending:
+                    target = self._coalesce_index.get(key)
+                    if target is not None:
+                        info = target["additional_info"]
+                        info["coalesced_count"] = info.get("coalesced_count", 1) + 1
+                        info["last_timestamp"] = violation["timestamp"].isoformat()
+                        accepted += 1
+                        coalesced += 1
+                        continue
+
+                if len(self._pending) + self._in_flight >= self.hard_limit:
+                    dropped += 1
+                    continue
+
+                accepted += 1
+                violation.setdefault("additional_info", {})
+                violation["additional_info"] = dict(violation["additional_info"] or {})
+                self._pending.append(violation)
+                if low_severity:
+                    self._coalesce_index[key] = violation
+
+            self.stats["accepted"] += accepted
+            self.stats["coalesced"] += coalesced
+            self.stats["dropped"] += dropped
+            pending = len(self._pending)
+            stopped = self._stopped
+
+        if dropped:
+            violations_dropped.inc("overflow", amount=dropped)
+        if stopped:
+            self.flush()
+        elif pending >= self.max_batch:
+            self._wakeup.set()
+        return {"accepted": accepted, "coalesced": coalesced, "dropped": dropped}
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Écrit toutes les violations en attente par lots. Retourne le nombre de lignes écrites."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._coalesce_index = {}
+                self._in_flight = len(batch)
+            if not batch:
+                return 0
+
+            written = 0
+            db = SessionLocal()
+            try:
+                self._insert(db, batch)
+                written = len(batch)
+                self._failures = 0
+            except Exception as e:
+                db.rollback()
+                self.stats["flush_errors"] += 1
+                self._failures += 1
+                print(f"[SECURITY] Échec de l'écriture de {len(batch)} violations "
+                      f"({self._failures}/{self.max_retries}): {str(e)}")
+                if self._failures < self.max_retries:
+                    # Remettre le lot en tête de file pour le prochain essai
+                    with self._lock:
+                        self._pending = batch + self._pending
+                        # Les lignes remises en file doivent pouvoir absorber les événements fusionnés
+                        for row in batch:
+                            if row["violation_type"] in self.low_severity_types:
+                                key = (row.get("exam_session_id"), row["violation_type"])
+                                self._coalesce_index.setdefault(key, row)
+                else:
+                    written = self._insert_bisect(db, batch)
+                    self._failures = 0
+            finally:
+                db.close()
+                with self._lock:
+                    self._in_flight = 0
+            self.stats["flushed"] += written
+            return written
+
+    def _insert(self, db, rows: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(rows), self.max_batch):
+            db.execute(insert(SecurityViolation), rows[start:start + self.max_batch])
+        db.commit()
+
+    def _insert_bisect(self, db, rows: List[Dict[str, Any]]) -> int:
+        """Écrit les lignes par moitiés successives ; une ligne qui échoue seule est abandonnée."""
+        try:
+            self._insert(db, rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            if len(rows) == 1:
+                self.stats["dead_lettered"] += 1
+                violations_dropped.inc("dead_letter")
+                row = rows[0]
+                print(f"[SECURITY] Violation abandonnée ({row.get('violation_type')}, "
+                      f"session {row.get('exam_session_id')}): {str(e)}")
+                return 0
+            middle = len(rows) // 2
+            return self._insert_bisect(db, rows[:middle]) + self._insert_bisect(db, rows[middle:])
+
+    def _flush_loop(self):
+        while self._running:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def violation_row(
+    violation_type: str,
+    timestamp: datetime,
+    url: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    additional_info: Optional[dict] = None,
+    exam_session_id: Optional[str] = None,
+    exam_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Construit le dictionnaire de colonnes d'une violation pour un INSERT groupé."""
+    return {
+        "violation_type": violation_type,
+        "timestamp": timestamp,
+        "url": url,
+        "user_agent": user_agent,
+        "ip_address": ip_address,
+        "additional_info": additional_info or {},
+        "exam_session_id": exam_session_id,
+        "exam_id": exam_id
+    }
+
+
+# Instance globale du tampon de violations
+violation_buffer = ViolationBuffer()
@@ -0,0 +1,132 @@
+"""
+Pagination par curseur (keyset) sur un couple (horodatage, id).
+
+Contrairement à offset/limit, le coût d'une page ne dépend pas de sa position :
+chaque page reprend juste après la dernière ligne de la précédente grâce à un
+filtre sur (horodatage, id), qui peut utiliser un index composite.
+
+SQLite stocke les dates sous forme de texte dans des formats qui varient selon
+l'origine de la valeur (CURRENT_TIMESTAMP sans microsecondes, SQLAlchemy avec).
+Le curseur conserve donc la valeur textuelle brute de l'horodatage, et les
+comparaisons se font sur ce texte, dans l'ordre même où SQLite trie la colonne.
+"""
+import base64
+import json
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import String, and_, or_, type_coerce
+from sqlalchemy.orm import Query, Session
+
+from app.db.database import SessionLocal
+
+# Nom de l'en-tête HTTP portant le curseur de la page suivante
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+
+# Colonne ajoutée aux pages : horodatage brut de chaque ligne, pour le curseur
+CURSOR_TS_LABEL = "keyset_ts"
+
+
+def encode_cursor(timestamp: Optional[str], row_id: int) -> str:
+    """Encode la position (horodatage brut, id) d'une ligne en curseur opaque."""
+    payload = json.dumps([timestamp, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    """Décode un curseur. Lève ValueError si le curseur est invalide."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if timestamp is not None and not isinstance(timestamp, str):
+            raise ValueError(timestamp)
+        return timestamp, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+
+
+def _after(ts_column, id_column, cursor: Tuple[Optional[str], int], descending: bool):
+    """Condition 'strictement après le curseur' dans l'ordre de tri choisi."""
+    # SQLite trie les NULL en premier en ordre croissant et en dernier en ordre décroissant
+    timestamp, row_id = cursor
+    raw_ts = type_coerce(ts_column, String)
+    if timestamp is None:
+        if descending:
+            return and_(ts_column.is_(None), id_column < row_id)
+        return or_(and_(ts_column.is_(None), id_column > row_id), ts_column.isnot(None))
+    if descending:
+        return or_(
+            raw_ts < timestamp,
+            and_(raw_ts == timestamp, id_column < row_id),
+            ts_column.is_(None)
+        )
+    return or_(raw_ts > timestamp, and_(raw_ts == timestamp, id_column > row_id))
+
+
+def keyset_page(
+    query: Query,
+    ts_column,
+    id_column,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = True
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Retourne (lignes de la page, curseur de la page suivante ou None).
+    Une ligne supplémentaire est lue pour savoir s'il reste des résultats.
+
+    La valeur textuelle brute de l'horodatage est lue avec les lignes de la
+    page (colonne keyset_ts) pour construire le curseur sans autre requête.
+    Une requête sur une seule entité retourne les entités ; pour une requête
+    à plusieurs colonnes, keyset_ts reste la dernière colonne de chaque ligne.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    single_entity = query.is_single_entity
+    if cursor:
+        query = query.filter(_after(ts_column, id_column, decode_cursor(cursor), descending))
+
+    if descending:
+        query = query.order_by(ts_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(ts_column.asc(), id_column.asc())
+
+    rows = query.add_columns(type_coerce(ts_column, String).label(CURSOR_TS_LABEL)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_id = getattr(last[0] if single_entity else last, id_column.key)
+        next_cursor = encode_cursor(getattr(last, CURSOR_TS_LABEL), last_id)
+    if single_entity:
+        rows = [row[0] for row in rows]
+    return rows, next_cursor
+
+
+def stream_ndjson(
+    build_query: Callable[[Session], Query],
+    ts_column,
+    id_column,
+    serialize: Callable[[Any], dict],
+    descending: bool = True,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Générateur NDJSON (une ligne JSON par enregistrement) parcourant la requête
+    par pages keyset successives. Seul un lot est en mémoire à la fois, et la
+    session est propre au générateur car il s'exécute après la fin du handler.
+    """
+    db = SessionLocal()
+    try:
+        cursor = None
+        while True:
+            rows, cursor = keyset_page(build_query(db), ts_column, id_column, cursor, batch_size, descending)
+            if rows:
+                yield "".join(json.dumps(serialize(row), default=str) + "\n" for row in rows).encode()
+            # Libérer les objets du lot avant de lire le suivant
+            db.expunge_all()
+            if cursor is None:
+                break
+    finally:
+        db.close()
@@ -1,15 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+# Nombre d'étudiants rendus par section dans le mode parallèle
+SECTION_SIZE = 25
+
+# Style commun à tous les tableaux de réponses
+ANSWER_TABLE_BASE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),  # En-tête
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('WORDWRAP', (0, 0), (-1, -1), True),  # Retour à la ligne automatique
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+]
+
+
+def _new_document(buffer: BytesIO) -> SimpleDocTemplate:
+    return SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+                             topMargin=72, bottomMargin=72)
+
+
+def _build_styles() -> Dict[str, ParagraphStyle]:
+    styles = getSampleStyleSheet()
+    return {
+        # Style personnalisé pour le titre
+        'title': ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=20,
+            alignment=1  # Centré
+        ),
+        # Style pour les sous-titres
+        'subtitle': ParagraphStyle(
+            'Subtitle',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=12,
+            textColor=colors.HexColor('#2c3e50')
+        ),
+        # Style pour les en-têtes de tableau
+        'table_header': ParagraphStyle(
+            'TableHeader',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.white,
+            alignment=1,
+            fontName='Helvetica-Bold'
+        ),
+        # Style pour les cellules de tableau
+        'table_cell': ParagraphStyle(
+            'TableCell',
+            parent=styles['Normal'],
+            fontSize=9,
+            leading=12,
+            spaceBefore=3,
+            spaceAfter=3
+        ),
+    }
+
+
+def _summary_elements(exam_data: Dict[str, Any], width: float, styles: Dict[str, ParagraphStyle]) -> list:
+    """En-tête du document et tableau de résumé."""
+    elements = [
+        Paragraph("Rapport des Résultats d'Examen", styles['title']),
+        Paragraph(f"Examen: {exam_data['exam_title']}", styles['subtitle']),
+    ]
+
+    # Résumé des résultats
+    summary_data = [
+        ["Nombre de participants", str(exam_data['total_submissions'])],
+        ["Note moyenne", f"{exam_data['average_score']:.2f}%"],
+    ]
+
+    summary_table = Table(summary_data, colWidths=[width/2.0]*2)
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    elements.append(summary_table)
+    elements.append(Spacer(1, 20))
+    return elements
+
+
+def _submission_elements(submission: Dict[str, Any], width: float, styles: Dict[str, ParagraphStyle]) -> list:
+    """Titre et tableau des réponses d'un étudiant."""
+    # En-tête de la soumission
+    student_header = f"Étudiant: {submission['student_name']} - " \
+                   f"Note: {submission['score']}/{submission['max_score']} " \
+                   f"({submission['percentage']:.1f}%)"
+
+    # Tableau des réponses
+    answer_data = [
+        [
+            Paragraph("Question", styles['table_header']),
+            Paragraph("Réponse", styles['table_header']),
+            Paragraph("Points", styles['table_header']),
+            Paragraph("Statut", styles['table_header'])
+        ]
+    ]
+    # Couleur de chaque ligne selon le statut (correct/incorrect), calculée une
+    # seule fois et appliquée avec le reste du style en un unique setStyle
+    style_commands = list(ANSWER_TABLE_BASE_STYLE)
+
+    for i, answer in enumerate(submission['answers'], 1):
+        status = "Correct" if answer['is_correct'] else "Incorrect"
+        style_commands.append(('TEXTCOLOR', (0, i), (-1, i), colors.green if answer['is_correct'] else colors.red))
+
+        answer_data.append([
+            Paragraph(answer['question_text'], styles['table_cell']),
+            Paragraph(str(answer['answer_text']), styles['table_cell']),
+            Paragraph(f"{answer['points_earned']}/{answer['max_points']}", styles['table_cell']),
+            Paragraph(status, styles['table_cell'])
+        ])
+
+    # Créer le tableau avec les données
+    answer_table = Table(answer_data, colWidths=[
+        width * 0.45,  # Question
+        width * 0.25,  # Réponse
+        width * 0.1,   # Points
+        width * 0.2    # Statut
+    ])
+    answer_table.setStyle(TableStyle(style_commands))
+
+    return [Paragraph(student_header, styles['subtitle']), answer_table, Spacer(1, 20)]
+
 
 async def generate_exam_results_pdf(exam_data: Dict[str, Any]) -> BytesIO:
     """
     Génère un PDF avec les résultats d'un examen
-    
+
     Args:
         exam_data: Dictionnaire contenant les données de l'examen et des soumissions
             {
@@ -35,155 +176,73 @@ async def generate_exam_results_pdf(exam_data: Dict[str, Any]) -> BytesIO:
                     }
                 ]
             }
-    
+
     Returns:
         BytesIO: Un objet BytesIO contenant le PDF généré
     """
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
-                          topMargin=72, bottomMargin=72)
-    
-    styles = getSampleStyleSheet()
-    elements = []
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=20,
-        alignment=1  # Centré
-    )
-    
-    # Style pour les sous-titres
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    # Style pour le texte normal
-    normal_style = styles['Normal']
-    
-    # Style pour les en-têtes de tableau
-    table_header_style = ParagraphStyle(
-        'TableHeader',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.white,
-        alignment=1,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Style pour les cellules de tableau
-    table_cell_style = ParagraphStyle(
-        'TableCell',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=12,
-        spaceBefore=3,
-        spaceAfter=3
-    )
-    
-    # En-tête du document
-    elements.append(Paragraph("Rapport des Résultats d'Examen", title_style))
-    elements.append(Paragraph(f"Examen: {exam_data['exam_title']}", subtitle_style))
-    
-    # Résumé des résultats
-    summary_data = [
-        ["Nombre de participants", str(exam_data['total_submissions'])],
-        ["Note moyenne", f"{exam_data['average_score']:.2f}%"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[doc.width/2.0]*2)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-    
-    # Détails par étudiant
+    doc = _new_document(buffer)
+    styles = _build_styles()
+
+    elements = _summary_elements(exam_data, doc.width, styles)
     for submission in exam_data['submissions']:
-        # En-tête de la soumission
-        student_header = f"Étudiant: {submission['student_name']} - " \
-                       f"Note: {submission['score']}/{submission['max_score']} " \
-                       f"({submission['percentage']:.1f}%)"
-        
-        elements.append(Paragraph(student_header, subtitle_style))
-        
-        # Tableau des réponses
-        answer_data = [
-            [
-                Paragraph("Question", table_header_style),
-                Paragraph("Réponse", table_header_style),
-                Paragraph("Points", table_header_style),
-                Paragraph("Statut", table_header_style)
-            ]
-        ]
-        
-        for answer in submission['answers']:
-            status = "Correct" if answer['is_correct'] else "Incorrect"
-            status_color = colors.green if answer['is_correct'] else colors.red
-            
-            answer_data.append([
-                Paragraph(answer['question_text'], table_cell_style),
-                Paragraph(str(answer['answer_text']), table_cell_style),
-                Paragraph(f"{answer['points_earned']}/{answer['max_points']}", table_cell_style),
-                Paragraph(status, table_cell_style)
-            ])
-        
-        # Créer le tableau avec les données
-        answer_table = Table(answer_data, colWidths=[
-            doc.width * 0.45,  # Question
-            doc.width * 0.25,  # Réponse
-            doc.width * 0.1,   # Points
-            doc.width * 0.2    # Statut
-        ])
-        
-        # Appliquer le style au tableau
-        answer_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),  # En-tête
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('WORDWRAP', (0, 0), (-1, -1), True),  # Retour à la ligne automatique
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        
-        # Colorer les lignes en fonction du statut (correct/incorrect)
-        for i, answer in enumerate(submission['answers'], 1):
-            if answer['is_correct']:
-                answer_table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (0, i), (-1, i), colors.green),
-                ]))
-            else:
-                answer_table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (0, i), (-1, i), colors.red),
-                ]))
-        
-        elements.append(answer_table)
-        elements.append(Spacer(1, 20))
-    
+        elements.extend(_submission_elements(submission, doc.width, styles))
+
     # Générer le PDF
     doc.build(elements)
-    
+
     # Déplacer le curseur au début du buffer
     buffer.seek(0)
     return buffer
+
+
+def _render_section(submissions: List[Dict[str, Any]]) -> bytes:
+    """Rend un groupe d'étudiants en un PDF autonome (exécuté dans un processus du pool)."""
+    buffer = BytesIO()
+    doc = _new_document(buffer)
+    styles = _build_styles()
+    elements = []
+    for submission in submissions:
+        elements.extend(_submission_elements(submission, doc.width, styles))
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _render_summary(exam_data: Dict[str, Any]) -> bytes:
+    buffer = BytesIO()
+    doc = _new_document(buffer)
+    doc.build(_summary_elements(exam_data, doc.width, _build_styles()))
+    return buffer.getvalue()
+
+
+def generate_exam_results_pdf_parallel(
+    exam_data: Dict[str, Any],
+    max_workers: Optional[int] = None,
+    section_size: int = SECTION_SIZE
+) -> BytesIO:
+    """
+    Variante de generate_exam_results_pdf pour les gros examens : les étudiants
+    sont rendus par sections de `section_size` dans un pool de processus, puis
+    les sections sont concaténées dans l'ordre (pypdf). Chaque section commence
+    sur une nouvelle page.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    submissions = exam_data['submissions']
+    sections = [submissions[i:i + section_size] for i in range(0, len(submissions), section_size)]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and len(sections) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sections))) as executor:
+            rendered = list(executor.map(_render_section, sections))
+    else:
+        rendered = [_render_section(section) for section in sections]
+
+    writer = PdfWriter()
+    for part in [_render_summary(exam_data)] + rendered:
+        writer.append(PdfReader(BytesIO(part)))
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    return buffer
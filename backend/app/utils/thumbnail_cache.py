@@ -0,0 +1,116 @@
+"""
+Cache disque de miniatures JPEG pour les photos d'étudiants.
+
+Chaque miniature est identifiée par le chemin absolu de l'original, sa date de
+modification et sa taille : une photo remplacée produit une nouvelle miniature.
+Le rapport hauteur/largeur de l'original est enregistré à côté de la miniature
+(fichier .json), si bien que la génération de PDF n'a jamais à décoder les
+photos d'origine.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Dict, Iterable, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+
+# (chemin de la miniature, rapport hauteur / largeur de l'original)
+Thumbnail = Tuple[str, float]
+
+_memory: Dict[str, Thumbnail] = {}
+_lock = threading.Lock()
+
+
+def thumbnail_key(photo_path: str) -> str:
+    stat = os.stat(photo_path)
+    raw = f"{os.path.abspath(photo_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _paths(key: str) -> Tuple[str, str]:
+    base = os.path.join(settings.THUMBNAILS_CACHE_DIR, key[:2], key)
+    return f"{base}.jpg", f"{base}.json"
+
+
+@contextmanager
+def _temp_file(path: str, mode: str) -> Iterator[Tuple[IO, str]]:
+    """
+    Fichier temporaire unique à côté de `path` (plusieurs workers peuvent
+    générer la même miniature), supprimé si l'écriture échoue.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f, tmp_path
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _generate(photo_path: str, thumb_path: str, meta_path: str) -> float:
+    max_size = settings.THUMBNAIL_MAX_SIZE
+    with Image.open(photo_path) as img:
+        width, height = img.size
+        # Pour les JPEG, laisser le décodeur réduire directement (beaucoup plus rapide)
+        img.draft("RGB", (max_size, max_size))
+        img = img.convert("RGB")
+        img.thumbnail((max_size, max_size))
+
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        with _temp_file(thumb_path, "wb") as (f, tmp_path):
+            img.save(f, "JPEG", quality=settings.THUMBNAIL_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, thumb_path)
+
+    aspect = height / float(width)
+    with _temp_file(meta_path, "w") as (f, tmp_meta):
+        json.dump({"source": os.path.abspath(photo_path), "aspect": aspect}, f)
+    os.replace(tmp_meta, meta_path)
+    return aspect
+
+
+def get_thumbnail(photo_path: str) -> Optional[Thumbnail]:
+    """
+    Retourne (chemin de la miniature, rapport hauteur/largeur) pour une photo,
+    en la générant si nécessaire. Retourne None si la photo est absente ou illisible.
+    """
+    try:
+        key = thumbnail_key(photo_path)
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _memory.get(key)
+    if cached:
+        return cached
+
+    thumb_path, meta_path = _paths(key)
+    try:
+        if os.path.exists(thumb_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                aspect = float(json.load(f)["aspect"])
+        else:
+            aspect = _generate(photo_path, thumb_path, meta_path)
+    except Exception as e:
+        print(f"[THUMBNAIL] Impossible de traiter {photo_path}: {e}")
+        return None
+
+    with _lock:
+        _memory[key] = (thumb_path, aspect)
+    return thumb_path, aspect
+
+
+def get_thumbnails(photo_paths: Iterable[str]) -> Dict[str, Optional[Thumbnail]]:
+    """Génère en parallèle les miniatures manquantes d'un lot de photos."""
+    unique_paths = list(dict.fromkeys(path for path in photo_paths if path))
+    if not unique_paths:
+        return {}
+    workers = min(settings.THUMBNAIL_WORKERS, len(unique_paths))
+    # PIL libère le GIL pendant le décodage et le redimensionnement : des threads suffisent
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail") as executor:
+        return dict(zip(unique_paths, executor.map(get_thumbnail, unique_paths)))
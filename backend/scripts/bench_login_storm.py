@@ -0,0 +1,72 @@
+"""
+Réactivité de la boucle d'événements pendant une vague de connexions.
+
+Une tâche « sonde » se réveille toutes les 10 ms et mesure son retard pendant
+que N vérifications bcrypt sont lancées simultanément :
+  - directement dans la boucle (ancien comportement de /token) ;
+  - via le pool borné de app.core.password_hashing.
+
+Usage (depuis le dossier backend) :
+    python -m scripts.bench_login_storm --logins 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core import password_hashing
+from app.core.security import get_password_hash, verify_password
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def login_inline(hashed: str):
+    # Ancien /token : route async appelant bcrypt directement
+    return verify_password("motdepasse", hashed)
+
+
+async def login_pooled(hashed: str):
+    return await password_hashing.run_async(verify_password, "motdepasse", hashed)
+
+
+async def storm(login, logins: int, hashed: str):
+    stop = asyncio.Event()
+    lags: list = []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(hashed) for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    busy = sum(1 for r in results if isinstance(r, password_hashing.PasswordHashingBusy))
+    return elapsed, lags, busy
+
+
+def report(label: str, elapsed: float, lags: list, busy: int):
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{label:<28} total {elapsed:6.2f} s | retard sonde médian {statistics.median(lags_ms):7.1f} ms, "
+          f"p99 {p99:7.1f} ms, max {lags_ms[-1]:7.1f} ms | refus 503: {busy}")
+
+
+async def main(logins: int):
+    hashed = get_password_hash("motdepasse")
+    print(f"{logins} connexions simultanées\n")
+    report("bcrypt dans la boucle", *await storm(login_inline, logins, hashed))
+    report("pool borné", *await storm(login_pooled, logins, hashed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
+    password_hashing.shutdown()
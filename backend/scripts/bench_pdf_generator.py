@@ -0,0 +1,111 @@
+"""
+Compare le rendu du rapport reportlab : chemin historique (un setStyle par ligne,
+un seul doc.build) contre le rendu parallèle par sections.
+
+Usage (depuis le dossier backend) :
+    python -m scripts.bench_pdf_generator --students 500 --questions 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+from app.utils import pdf_generator
+
+
+def make_exam_data(students: int, questions: int) -> dict:
+    rng = random.Random(42)
+    submissions = []
+    for s in range(students):
+        answers = []
+        for q in range(questions):
+            is_correct = rng.random() < 0.6
+            answers.append({
+                'question_text': f"Question {q + 1} : quelle est la bonne réponse parmi les propositions ?",
+                'answer_text': f"Option {rng.randint(1, 4)}",
+                'is_correct': is_correct,
+                'points_earned': 1 if is_correct else 0,
+                'max_points': 1
+            })
+        score = sum(a['points_earned'] for a in answers)
+        submissions.append({
+            'student_name': f"Étudiant {s + 1}",
+            'submitted_at': datetime.now(),
+            'score': score,
+            'max_score': questions,
+            'percentage': score / questions * 100,
+            'answers': answers
+        })
+    return {
+        'exam_title': "Examen de référence",
+        'total_submissions': students,
+        'average_score': sum(s['percentage'] for s in submissions) / students,
+        'submissions': submissions
+    }
+
+
+def legacy_render(exam_data: dict) -> BytesIO:
+    """Reproduction du rendu d'origine : un setStyle par ligne de réponse."""
+    buffer = BytesIO()
+    doc = pdf_generator._new_document(buffer)
+    styles = pdf_generator._build_styles()
+    elements = pdf_generator._summary_elements(exam_data, doc.width, styles)
+    for submission in exam_data['submissions']:
+        elements.append(Paragraph(f"Étudiant: {submission['student_name']}", styles['subtitle']))
+        answer_data = [[Paragraph(h, styles['table_header']) for h in ("Question", "Réponse", "Points", "Statut")]]
+        for answer in submission['answers']:
+            answer_data.append([
+                Paragraph(answer['question_text'], styles['table_cell']),
+                Paragraph(str(answer['answer_text']), styles['table_cell']),
+                Paragraph(f"{answer['points_earned']}/{answer['max_points']}", styles['table_cell']),
+                Paragraph("Correct" if answer['is_correct'] else "Incorrect", styles['table_cell'])
+            ])
+        table = Table(answer_data, colWidths=[doc.width * 0.45, doc.width * 0.25, doc.width * 0.1, doc.width * 0.2])
+        table.setStyle(TableStyle(pdf_generator.ANSWER_TABLE_BASE_STYLE))
+        for i, answer in enumerate(submission['answers'], 1):
+            table.setStyle(TableStyle([
+                ('TEXTCOLOR', (0, i), (-1, i), colors.green if answer['is_correct'] else colors.red),
+            ]))
+        elements.append(table)
+        elements.append(Spacer(1, 20))
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    size = len(result.getvalue())
+    print(f"{label:<40} {elapsed:8.2f} s  {size / 1024 / 1024:6.2f} Mo")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    exam_data = make_exam_data(args.students, args.questions)
+    print(f"{args.students} étudiants x {args.questions} questions, {args.workers} processus\n")
+
+    legacy = timed("Historique (setStyle par ligne)", lambda: legacy_render(exam_data))
+    single = timed("Style précalculé, séquentiel", lambda: asyncio.run(pdf_generator.generate_exam_results_pdf(exam_data)))
+    parallel = timed(
+        "Style précalculé, sections parallèles",
+        lambda: pdf_generator.generate_exam_results_pdf_parallel(exam_data, max_workers=args.workers)
+    )
+    print(f"\nGain séquentiel : x{legacy / single:.2f}   gain parallèle : x{legacy / parallel:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Temps d'import de l'API (python -X importtime) et budget de démarrage.
+
+Importe app.main dans un processus neuf, affiche les modules les plus coûteux
+et vérifie que :
+  - l'import complet reste sous le budget (--budget-ms, médiane de --runs essais) ;
+  - aucune dépendance de surveillance (cv2, dlib, DeepFace, TensorFlow) n'est
+    chargée au démarrage : elles ne doivent l'être qu'à la première utilisation.
+Code de sortie 1 si l'une des deux conditions n'est pas respectée.
+
+Usage (depuis le dossier backend) :
+    python -m scripts.bench_startup --budget-ms 2500 --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("cv2", "face_recognition", "dlib", "deepface", "tensorflow", "keras")
+
+
+def import_profile() -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Importe app.main dans un sous-processus. Retourne (total ms, {module: (self µs, cumulé µs)})."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-2000:])
+        raise SystemExit("L'import de app.main a échoué")
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules["app.main"][1] / 1000, modules
+
+
+def top_level(modules: Dict[str, Tuple[int, int]]) -> List[Tuple[str, int]]:
+    """Coût cumulé par paquet de premier niveau (somme des temps propres)."""
+    totals: Dict[str, int] = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def main(budget_ms: float, runs: int, top: int) -> int:
+    timings = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(runs):
+        total_ms, modules = import_profile()
+        timings.append(total_ms)
+    median_ms = statistics.median(timings)
+
+    print(f"Import de app.main : médiane {median_ms:.0f} ms sur {runs} essai(s) (budget {budget_ms:.0f} ms)\n")
+    print(f"{'paquet':<28} {'temps propre':>12}")
+    for package, self_us in top_level(modules)[:top]:
+        print(f"{package:<28} {self_us / 1000:9.1f} ms")
+
+    loaded = sorted({name.split(".")[0] for name in modules} & set(LAZY_MODULES))
+    failed = False
+    if loaded:
+        print(f"\nÉCHEC: modules de surveillance chargés au démarrage : {', '.join(loaded)}")
+        failed = True
+    if median_ms > budget_ms:
+        print(f"\nÉCHEC: import en {median_ms:.0f} ms, au-delà du budget de {budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=2500.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    sys.exit(main(args.budget_ms, args.runs, args.top))
@@ -137,18 +137,20 @@ def create_exam(token):
         print(f"Réponse du serveur : {e.response.text}")
         return None
 
-def add_question_to_exam(token, exam_id, question_data):
-    """Ajoute une question à un examen existant."""
+def add_questions_to_exam(token, exam_id, questions):
+    """Ajoute toutes les questions à un examen existant en un seul appel (import en masse)."""
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.post(f"{API_BASE_URL}/exams/{exam_id}/questions", headers=headers, json=question_data)
+        response = requests.post(f"{API_BASE_URL}/exams/{exam_id}/questions/bulk", headers=headers, json=questions)
         response.raise_for_status()
-        print(f"  -> Question ajoutée : '{question_data['text']}'")
-        return True
+        result = response.json()
+        for question in questions:
+            print(f"  -> Question ajoutée : '{question['text']}'")
+        return result["created"]
     except requests.exceptions.RequestException as e:
-        print(f"Erreur lors de l'ajout de la question : {e}")
+        print(f"Erreur lors de l'ajout des questions : {e}")
         print(f"Réponse du serveur : {e.response.text}")
-        return False
+        return 0
 
 def main():
     print("--- Début du script de création d'examen ---")
@@ -170,10 +172,7 @@ def main():
     selected_questions = random.sample(questions_pool, num_questions_to_add)
 
     print(f"\nAjout de {num_questions_to_add} questions à l'examen {exam_id}...")
-    success_count = 0
-    for question in selected_questions:
-        if add_question_to_exam(token, exam_id, question):
-            success_count += 1
+    success_count = add_questions_to_exam(token, exam_id, selected_questions)
     
     print(f"\n--- Fin du script ---")
     print(f"{success_count}/{num_questions_to_add} questions ont été ajoutées avec succès.")
@@ -0,0 +1,132 @@
+"""
+Fixtures communes : l'application sur une base SQLite en mémoire, un enseignant
+authentifié, des examens de test et la vérification du nombre de requêtes SQL
+(query_budget).
+"""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import database
+from app.db.query_stats import query_budget
+
+
+@pytest.fixture(scope="session")
+def engine():
+    # Une seule connexion partagée : la base en mémoire vit le temps de la session de tests
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+    from app.models import models  # noqa: F401 (enregistre les tables)
+    database.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client(engine):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # Sans « with » : le lifespan (threads de surveillance, index, etc.) n'est pas démarré
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def teacher(db):
+    from app.core.security import get_password_hash
+    from app.models import User
+
+    user = User(
+        email=f"teacher-{uuid.uuid4().hex[:8]}@example.com",
+        hashed_password=get_password_hash("secret"),
+        full_name="Enseignant Test",
+        is_teacher=True
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def teacher_headers(teacher):
+    from app.core.security import create_access_token
+
+    token = create_access_token({"sub": teacher.email, "is_teacher": True})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def make_exam(db, teacher):
+    """
+    Fabrique d'examens : `questions` questions à choix multiples (deux options,
+    la première correcte) et `students` étudiants ayant chacun soumis une copie.
+    """
+    from app.models import Answer, Exam, Question, QuestionOption, Submission, User
+
+    def _make_exam(questions: int = 3, students: int = 0) -> Exam:
+        exam = Exam(
+            title="Examen de test",
+            teacher_id=teacher.id,
+            password=uuid.uuid4().hex[:8],
+            is_active=True
+        )
+        db.add(exam)
+        db.flush()
+        db_questions = []
+        for index in range(questions):
+            question = Question(exam_id=exam.id, text=f"Question {index}", question_type="multiple_choice", points=1)
+            question.options = [QuestionOption(text="A", is_correct=True), QuestionOption(text="B")]
+            db.add(question)
+            db_questions.append(question)
+        db.flush()
+        for index in range(students):
+            student = User(
+                email=f"student-{uuid.uuid4().hex[:8]}@example.com",
+                hashed_password="x",
+                full_name=f"Etudiant {uuid.uuid4().hex[:8]}"
+            )
+            db.add(student)
+            db.flush()
+            submission = Submission(
+                exam_id=exam.id,
+                student_id=student.id,
+                score=index % (questions + 1),
+                total_points_possible=questions,
+                submitted_at=datetime.now(timezone.utc)
+            )
+            submission.answers = [
+                Answer(question_id=question.id, answer_text="A", points_awarded=int(rank < index % (questions + 1)))
+                for rank, question in enumerate(db_questions)
+            ]
+            db.add(submission)
+        db.commit()
+        return exam
+
+    return _make_exam
+
+
+@pytest.fixture
+def max_queries():
+    """
+    query_budget comme fixture :
+
+        def test_liste(client, max_queries):
+            with max_queries(5):
+                client.get(...)
+
+    Le test échoue (avec la liste des requêtes) si le bloc en exécute davantage.
+    """
+    return query_budget
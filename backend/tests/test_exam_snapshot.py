@@ -0,0 +1,57 @@
+"""
+Instantanés du contenu des examens : ETag distinct par codage, négociation
+Accept-Encoding et revérification de la version en base limitée par un TTL.
+"""
+import gzip
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services import exam_snapshot
+
+
+@pytest.fixture
+def exam(make_exam):
+    exam = make_exam(questions=2)
+    yield exam
+    exam_snapshot.invalidate(exam.id)
+
+
+def test_gzip_and_plain_bodies_have_distinct_etags(client, teacher_headers, exam):
+    url = f"/api/exams/{exam.id}/snapshot"
+    plain = client.get(url, headers={**teacher_headers, "Accept-Encoding": "identity"})
+    compressed = client.get(url, headers={**teacher_headers, "Accept-Encoding": "gzip"})
+
+    assert plain.status_code == compressed.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert plain.headers["etag"] != compressed.headers["etag"]
+    assert compressed.headers["etag"].endswith('-gzip"')
+    assert json.loads(plain.content) == compressed.json()
+
+    revalidated = client.get(url, headers={
+        **teacher_headers, "Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]
+    })
+    assert revalidated.status_code == 304
+
+
+@pytest.mark.parametrize("accept_encoding", ["gzip;q=0", "gzip; q=0.0, identity", "*;q=0", "br"])
+def test_refused_gzip_is_not_sent(client, teacher_headers, exam, accept_encoding):
+    response = client.get(f"/api/exams/{exam.id}/snapshot",
+                          headers={**teacher_headers, "Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_version_is_rechecked_only_after_ttl(db, exam, max_queries, monkeypatch):
+    monkeypatch.setattr(settings, "EXAM_SNAPSHOT_TTL_SECONDS", 60.0)
+    first = exam_snapshot.get_snapshot(db, exam.id)
+    with max_queries(0):
+        assert exam_snapshot.get_snapshot(db, exam.id) is first
+
+    monkeypatch.setattr(settings, "EXAM_SNAPSHOT_TTL_SECONDS", 0.0)
+    with max_queries(1):
+        again = exam_snapshot.get_snapshot(db, exam.id)
+    assert again.etag == first.etag
+    assert again.checked_at > first.checked_at
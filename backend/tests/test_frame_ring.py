@@ -0,0 +1,93 @@
+"""
+Tampon circulaire d'images en mémoire partagée : lecture de la plus récente,
+image réécrite pendant sa lecture et taille maximale d'un emplacement.
+"""
+import numpy as np
+import pytest
+
+from app.security.frame_ring import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(slots=3, slot_bytes=4 * 4 * 3)
+    yield ring
+    ring.close()
+
+
+def _frame(value: int, shape=(4, 4, 3)) -> np.ndarray:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_reads_latest_frame_once(ring):
+    assert ring.read_latest() is None
+    ring.write(_frame(1), captured_at=10.0)
+    seq = ring.write(_frame(2, shape=(4, 4)), captured_at=11.0)
+
+    latest_seq, frame, captured_at = ring.read_latest()
+    assert latest_seq == seq == ring.latest_seq
+    assert frame.shape == (4, 4)
+    assert (frame == 2).all()
+    assert captured_at == 11.0
+    assert ring.read_latest(latest_seq) is None
+
+
+def test_consumer_sees_producer_frames(ring):
+    consumer = FrameRing.attach(ring.name, ring.slots, ring.slot_bytes)
+    try:
+        for value in range(5):
+            ring.write(_frame(value))
+        seq, frame, _ = consumer.read_latest()
+        assert seq == 5
+        assert (frame == 4).all()
+    finally:
+        consumer.close()
+
+
+class _RewritingData:
+    """Données du tampon dont la lecture déclenche un tour complet du producteur."""
+
+    def __init__(self, ring: FrameRing):
+        self.ring = ring
+        self.data = ring._data
+        self.rewrite = True
+
+    def __getitem__(self, key):
+        view = self.data[key]
+        if self.rewrite:
+            self.rewrite = False
+            for value in range(self.ring.slots):
+                self.ring.write(_frame(100 + value))
+        return view
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+
+def test_frame_rewritten_during_read_is_dropped(ring):
+    ring.write(_frame(1))
+    data = _RewritingData(ring)
+    ring._data = data
+    try:
+        assert ring.read_latest() is None
+        # La lecture suivante obtient l'image cohérente la plus récente
+        seq, frame, _ = ring.read_latest()
+        assert seq == 1 + ring.slots
+        assert (frame == 100 + ring.slots - 1).all()
+    finally:
+        ring._data = data.data
+
+
+def test_frame_being_written_is_not_read(ring):
+    seq = ring.write(_frame(1))
+    ring._headers[seq % ring.slots]["seq"] = -1
+    assert ring.read_latest() is None
+
+
+def test_oversized_frame_is_refused(ring):
+    ring.write(_frame(1))
+    with pytest.raises(ValueError):
+        ring.write(_frame(2, shape=(5, 5, 3)))
+    seq, frame, _ = ring.read_latest()
+    assert seq == 1
+    assert (frame == 1).all()
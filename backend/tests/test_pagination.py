@@ -0,0 +1,40 @@
+"""
+Pagination keyset : une requête par page, curseur construit à partir de
+l'horodatage brut lu avec les lignes, pour les entités comme pour les colonnes.
+"""
+import pytest
+
+from app.models import Submission, User
+from app.utils.pagination import keyset_page
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_row_with_one_query_each(db, make_exam, max_queries, descending):
+    exam = make_exam(questions=1, students=5)
+    query = db.query(Submission).filter(Submission.exam_id == exam.id)
+
+    seen, cursor = [], None
+    while True:
+        with max_queries(1):
+            rows, cursor = keyset_page(query, Submission.submitted_at, Submission.id, cursor, 2, descending)
+        assert all(isinstance(row, Submission) for row in rows)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            break
+
+    expected = [row.id for row in query.order_by(Submission.submitted_at, Submission.id)]
+    assert seen == (expected[::-1] if descending else expected)
+
+
+def test_column_queries_keep_named_columns(db, make_exam, max_queries):
+    exam = make_exam(questions=1, students=3)
+    query = db.query(Submission.id, Submission.score, User.full_name)\
+        .outerjoin(User, User.id == Submission.student_id).filter(Submission.exam_id == exam.id)
+
+    with max_queries(1):
+        rows, cursor = keyset_page(query, Submission.submitted_at, Submission.id, None, 2, descending=False)
+    rows_next, cursor_next = keyset_page(query, Submission.submitted_at, Submission.id, cursor, 2, descending=False)
+
+    assert cursor is not None and cursor_next is None
+    assert all(row.full_name.startswith("Etudiant") for row in rows + rows_next)
+    assert len({row.id for row in rows + rows_next}) == 3
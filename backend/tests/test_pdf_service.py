@@ -0,0 +1,55 @@
+"""
+Le PDF produit en flux par StreamingPDF doit rester un document valide :
+offsets de la table xref corrects et arbre des pages complet.
+"""
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+from app.services.pdf_service import stream_results_pdf
+
+
+def _read(chunks) -> PdfReader:
+    data = b"".join(chunks)
+    assert data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+    # strict : toute incohérence de la table xref lève une exception
+    return PdfReader(BytesIO(data), strict=True)
+
+
+def test_empty_exam_pdf(db, make_exam):
+    exam = make_exam(questions=2)
+
+    reader = _read(stream_results_pdf(exam.id, exam.title, db=db))
+
+    assert len(reader.pages) == 1
+    assert "Aucune soumission" in reader.pages[0].extract_text()
+
+
+@pytest.mark.parametrize("students, chunk_size", [(5, 2), (5, 50)])
+def test_streamed_pdf_pages(db, make_exam, students, chunk_size):
+    exam = make_exam(questions=3, students=students)
+    names = sorted(submission.student.full_name for submission in exam.submissions)
+
+    chunks = list(stream_results_pdf(exam.id, exam.title, chunk_size=chunk_size, db=db))
+    reader = _read(chunks)
+
+    # Page de résumé puis une page de détails par soumission
+    assert len(reader.pages) == 1 + students
+    assert len(chunks) > 1
+    summary = reader.pages[0].extract_text()
+    assert all(name in summary for name in names)
+    details = sorted(
+        name for page in reader.pages[1:] for name in names if name in page.extract_text()
+    )
+    assert details == names
+
+
+def test_long_summary_spans_pages(db, make_exam):
+    exam = make_exam(questions=1, students=60)
+
+    reader = _read(stream_results_pdf(exam.id, exam.title, chunk_size=7, db=db))
+
+    # Le résumé de 60 lignes déborde sur plusieurs pages avant les 60 pages de détails
+    assert len(reader.pages) > 61
+    assert sum("Détails pour" in page.extract_text() for page in reader.pages) == 60
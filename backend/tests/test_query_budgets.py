@@ -0,0 +1,69 @@
+"""
+Nombre maximal de requêtes SQL des routes les plus sollicitées : il ne doit pas
+dépendre du nombre d'examens, de questions ou de soumissions (pas de N+1).
+"""
+import uuid
+
+import pytest
+
+from app.core import principal_cache
+from app.models import User
+from app.services import results_stats
+
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    # Mesures à froid : principal de l'utilisateur et résultats recalculés
+    principal_cache.invalidate_user()
+    results_stats._cache.clear()
+
+
+@pytest.mark.parametrize("exams", [1, 10])
+def test_my_exams_budget(client, teacher_headers, make_exam, max_queries, exams):
+    for _ in range(exams):
+        make_exam(questions=3, students=2)
+
+    with max_queries(2):
+        response = client.get("/api/exams/me/", headers=teacher_headers)
+
+    assert response.status_code == 200
+    assert len(response.json()) == exams
+
+
+@pytest.mark.parametrize("students", [1, 25])
+def test_results_budget(client, make_exam, max_queries, students):
+    exam_id = make_exam(questions=4, students=students).id
+
+    with max_queries(4):
+        response = client.get(f"/api/exams/{exam_id}/results/")
+
+    assert response.status_code == 200
+    assert len(response.json()) == students
+
+
+@pytest.mark.parametrize("students", [1, 25])
+def test_results_stats_budget(client, make_exam, max_queries, students):
+    exam_id = make_exam(questions=4, students=students).id
+
+    with max_queries(4):
+        response = client.get(f"/api/exams/{exam_id}/results/stats")
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("questions", [2, 20])
+def test_submit_budget(client, db, make_exam, max_queries, questions):
+    exam = make_exam(questions=questions)
+    student = User(email=f"{uuid.uuid4().hex[:8]}@example.com", hashed_password="x", full_name=uuid.uuid4().hex)
+    db.add(student)
+    db.commit()
+    answers = [{"question_id": question.id, "answer_text": "A"} for question in exam.questions]
+    payload = {"student_name": student.full_name, "exam_password": exam.password, "answers": answers}
+
+    with max_queries(10):
+        response = client.post("/api/submissions/", json=payload)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["correct_answers"] == questions
+    assert result["percentage"] == 100
@@ -0,0 +1,49 @@
+"""
+Rendu des rapports en cache : fichiers temporaires et suppression des anciennes versions.
+"""
+import os
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import report_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "REPORTS_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_slow_render_keeps_newer_report(cache_dir, monkeypatch):
+    older = cache_dir / "results_exam_1_aaaa.pdf"
+    newer = cache_dir / "results_exam_1_cccc.pdf"
+    older.write_bytes(b"%PDF-old")
+    os.utime(older, (time.time() - 60, time.time() - 60))
+
+    def slow_render(exam_id, exam_title):
+        yield b"%PDF-"
+        # Une version plus récente termine son rendu pendant celui-ci
+        newer.write_bytes(b"%PDF-new")
+        yield b"slow"
+
+    monkeypatch.setattr(report_cache, "stream_results_pdf", slow_render)
+    path = report_cache._render(1, "Examen", report_cache.report_key(1, "bbbb"))
+
+    assert open(path, "rb").read() == b"%PDF-slow"
+    assert newer.exists()
+    assert not older.exists()
+    assert not list(cache_dir.glob("*.tmp"))
+
+
+def test_failed_render_leaves_no_temp_file(cache_dir, monkeypatch):
+    def broken_render(exam_id, exam_title):
+        yield b"%PDF-"
+        raise RuntimeError("rendu interrompu")
+
+    monkeypatch.setattr(report_cache, "stream_results_pdf", broken_render)
+    with pytest.raises(RuntimeError):
+        report_cache._render(1, "Examen", report_cache.report_key(1, "dddd"))
+
+    assert list(cache_dir.iterdir()) == []
@@ -0,0 +1,149 @@
+"""
+Baux des sessions de surveillance, pour les deux magasins (mémoire et SQLite).
+"""
+import pytest
+
+from app.core.config import settings
+from app.security import session_store as store_module
+from app.security.session_store import MemorySessionStore, SqliteSessionStore
+
+
+class _Clock:
+    """Remplace le module time de session_store : le temps n'avance qu'à la demande."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(store_module, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SqliteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_client_restart_after_expiry_counts_as_heartbeat(store, clock):
+    # Session d'un worker disparu : bail expiré, aucun heartbeat depuis longtemps
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="dead", touch=True)
+    clock.now += settings.MONITOR_HEARTBEAT_TIMEOUT_SECONDS + settings.SESSION_LEASE_SECONDS + 1
+    cutoff = clock.now - settings.MONITOR_HEARTBEAT_TIMEOUT_SECONDS
+    assert [r.session_id for r in store.stale("monitor", cutoff)] == ["s1"]
+
+    # L'étudiant relance /monitor/start : la session ne doit pas être récupérée aussitôt
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="alive", touch=True)
+    assert store.stale("monitor", cutoff) == []
+    assert store.get("monitor", "s1").heartbeat_at == clock.now
+
+
+def test_adoption_keeps_last_heartbeat(store, clock):
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="dead", touch=True)
+    started = clock.now
+    clock.now += settings.SESSION_LEASE_SECONDS + 1
+
+    # Reprise par le LeaseKeeper : le client n'a rien envoyé
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="alive")
+    assert store.get("monitor", "s1").heartbeat_at == started
+
+
+def test_claim_respects_live_lease(store, clock):
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="w1")
+    assert not store.claim("monitor", "s1", {"exam_id": 1}, owner="w2")
+    # Le propriétaire peut reprendre son propre bail
+    assert store.claim("monitor", "s1", {"exam_id": 2}, owner="w1")
+    record = store.get("monitor", "s1")
+    assert (record.owner, record.data) == ("w1", {"exam_id": 2})
+
+
+def test_sessions_are_keyed_by_kind(store, clock):
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="w1")
+    assert store.claim("security", "s1", {}, owner="w2")
+    assert store.release("monitor", "s1")
+    assert store.get("monitor", "s1") is None
+    assert store.get("security", "s1").owner == "w2"
+
+
+def test_renew_extends_owned_leases_and_publishes_status(store, clock):
+    store.claim("monitor", "s1", {"exam_id": 1}, owner="w1", ttl=10)
+    store.claim("monitor", "s2", {"exam_id": 1}, owner="w2", ttl=10)
+    clock.now += 5
+
+    owned = store.renew("monitor", "w1", {"s1": {"face_status": "confirmed"}, "s2": {}}, ttl=10)
+
+    assert owned == {"s1"}
+    assert store.get("monitor", "s1").lease_expires_at == clock.now + 10
+    assert store.get("monitor", "s1").status == {"face_status": "confirmed"}
+    # Le bail de w2 n'est pas touché
+    assert store.get("monitor", "s2").lease_expires_at == clock.now + 5
+    assert store.get("monitor", "s2").status == {}
+
+
+def test_released_session_is_not_renewed(store, clock):
+    store.claim("monitor", "s1", {"exam_id": 1}, owner="w1")
+    assert store.release("monitor", "s1")
+    assert not store.release("monitor", "s1")
+    assert store.renew("monitor", "w1", {"s1": {}}) == set()
+    assert not store.heartbeat("monitor", "s1")
+
+
+def test_expired_lease_can_be_taken_over(store, clock):
+    store.claim("monitor", "s1", {"exam_id": 1}, owner="w1", ttl=10)
+    assert [r.session_id for r in store.live("monitor")] == ["s1"]
+    assert store.expired("monitor") == []
+
+    clock.now += 11
+    assert store.live("monitor") == []
+    assert [r.session_id for r in store.expired("monitor")] == ["s1"]
+    assert store.claim("monitor", "s1", {"exam_id": 1}, owner="w2")
+    assert store.get("monitor", "s1").owner == "w2"
+
+
+class _FailingAdoption:
+    """Service dont la reprise de session échoue (caméra indisponible), comme FaceRecognitionService."""
+    kind = "monitor"
+
+    def __init__(self, store):
+        self.store = store
+        self.adopted = []
+
+    def local_statuses(self):
+        return {}
+
+    def stop_local(self, session_id):
+        pass
+
+    def adopt(self, record):
+        self.adopted.append(record.session_id)
+        raise RuntimeError("caméra indisponible")
+
+
+class _Recorder(_FailingAdoption):
+    kind = "security"
+
+    def adopt(self, record):
+        self.adopted.append(record.session_id)
+
+
+def test_lease_keeper_continues_after_a_failing_service(store, clock, monkeypatch):
+    monkeypatch.setattr(store_module, "session_store", store)
+    keeper = store_module.LeaseKeeper()
+    failing, recorder = _FailingAdoption(store), _Recorder(store)
+    keeper._services = [failing, recorder]
+    store.claim("monitor", "m1", {"exam_id": 1}, owner="dead", ttl=1, touch=True)
+    store.claim("security", "x1", {}, owner="dead", ttl=1, touch=True)
+    clock.now += 2
+
+    keeper.tick()
+
+    assert failing.adopted == ["m1"]
+    assert recorder.adopted == ["x1"]
+    assert store.get("security", "x1").owner == store_module.WORKER_ID
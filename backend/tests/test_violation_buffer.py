@@ -0,0 +1,58 @@
+"""
+Tampon d'écriture des violations : écriture directe après l'arrêt et fusion
+des événements dans un lot remis en file après un échec d'écriture.
+"""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import SecurityViolation
+from app.services.violation_buffer import ViolationBuffer, violation_row
+
+
+@pytest.fixture
+def session_id():
+    return uuid.uuid4().hex
+
+
+def _rows(db, session_id):
+    return db.query(SecurityViolation).filter(SecurityViolation.exam_session_id == session_id).all()
+
+
+def test_add_after_stop_writes_without_restarting(db, session_id):
+    buffer = ViolationBuffer(flush_interval=60)
+    buffer.start()
+    buffer.stop()
+
+    result = buffer.add([violation_row("tab_switch", datetime.now(timezone.utc), exam_session_id=session_id)])
+
+    assert result["accepted"] == 1
+    assert buffer._thread is None and not buffer._running
+    assert buffer.pending_count() == 0
+    assert len(_rows(db, session_id)) == 1
+
+
+def _locked(db, rows):
+    raise RuntimeError("database is locked")
+
+
+def test_requeued_batch_still_absorbs_coalesced_events(db, session_id, monkeypatch):
+    buffer = ViolationBuffer(max_pending=1, flush_interval=60, max_retries=3)
+    try:
+        buffer.add([violation_row("blur", datetime.now(timezone.utc), exam_session_id=session_id)])
+        with monkeypatch.context() as patch:
+            patch.setattr(buffer, "_insert", _locked)
+            assert buffer.flush() == 0
+        assert buffer.pending_count() == 1
+
+        # File pleine : le nouvel événement est fusionné dans la ligne remise en file
+        result = buffer.add([violation_row("blur", datetime.now(timezone.utc), exam_session_id=session_id)])
+        assert result["coalesced"] == 1
+        assert buffer.pending_count() == 1
+    finally:
+        buffer.stop()
+
+    rows = _rows(db, session_id)
+    assert len(rows) == 1
+    assert rows[0].additional_info["coalesced_count"] == 2
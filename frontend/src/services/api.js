@@ -216,9 +216,17 @@ export const examService = {
   // Télécharger les résultats au format PDF
   downloadResultsPdf: async (examId) => {
     try {
-      const response = await api.get(`${API_ENDPOINTS.SUBMISSIONS}/exam/${examId}/results-pdf`, {
+      // Le rapport est généré en arrière-plan : réessayer tant que le serveur répond 202
+      let response = await api.get(`${API_ENDPOINTS.SUBMISSIONS}/exam/${examId}/results-pdf`, {
         responseType: 'blob',
       });
+      while (response.status === 202) {
+        const retryAfter = parseInt(response.headers['retry-after'] || '2', 10);
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        response = await api.get(`${API_ENDPOINTS.SUBMISSIONS}/exam/${examId}/results-pdf`, {
+          responseType: 'blob',
+        });
+      }
       
       // Créer une URL pour le blob et déclencher le téléchargement
       const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -311,8 +319,17 @@ export const submissionService = {
   // Récupérer toutes les soumissions d'un examen
   getExamSubmissions: async (examId) => {
     try {
-      const response = await api.get(`${API_ENDPOINTS.SUBMISSIONS}/exam/${examId}`);
-      return response.data;
+      // La liste est paginée par curseur : suivre l'en-tête X-Next-Cursor
+      const submissions = [];
+      let cursor = null;
+      do {
+        const response = await api.get(`${API_ENDPOINTS.SUBMISSIONS}/exam/${examId}`, {
+          params: cursor ? { cursor } : {},
+        });
+        submissions.push(...response.data);
+        cursor = response.headers['x-next-cursor'] || null;
+      } while (cursor);
+      return submissions;
     } catch (error) {
       return handleApiError(error);
     }
@@ -184,29 +184,20 @@ export const submissionService = {
     try {
       console.log('getExamByPasswordAndStudent appelé avec:', { password, studentName });
       
-      // Vérifier simultanément le mot de passe et le nom de l'étudiant
-      const verifyResponse = await api.post('/exams/verify-access', { 
-        password, 
-        student_name: studentName 
-      });
-      
-      // Accéder aux données de la réponse
-      const verifyData = verifyResponse.data;
-      console.log('Accès vérifié, ID de l\'examen:', verifyData.exam_id);
-      
-      // Récupérer les détails de l'examen avec l'ID
-      const examResponse = await api.get(`/exams/${verifyData.exam_id}`, {
-        headers: {
-          'Authorization': `Bearer ${verifyData.access_token}`
-        }
+      // Mot de passe, nom de l'étudiant, jeton et contenu de l'examen en un seul appel
+      const launchResponse = await api.post('/exams/launch', {
+        password,
+        student_name: studentName
       });
       
-      console.log('Détails de l\'examen récupérés:', examResponse.data);
+      const launchData = launchResponse.data;
+      console.log('Accès vérifié, ID de l\'examen:', launchData.exam_id);
       
-      // Ajouter le token d'accès aux données de l'examen pour l'utiliser plus tard
+      // Ajouter le token d'accès et la session de surveillance aux données de l'examen
       return {
-        ...examResponse.data,
-        access_token: verifyData.access_token
+        ...launchData.exam,
+        access_token: launchData.access_token,
+        monitoring_session_id: launchData.monitoring_session_id
       };
     } catch (error) {
       console.error('Erreur lors de la récupération de l\'examen:', error);